@@ -0,0 +1,71 @@
+import os
+import asyncio
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, TypeVar
+from urllib.parse import urlsplit
+
+T = TypeVar("T")
+
+# Default number of pages scraped at the same time in one batch
+BATCH_CONCURRENCY = int(os.environ.get("SCRAPER_BATCH_CONCURRENCY", 10))
+# Maximum number of concurrent requests to the same host in one batch
+BATCH_PER_HOST = int(os.environ.get("SCRAPER_BATCH_PER_HOST", 4))
+
+
+def host_of(url: str) -> str:
+    """Return the lower-cased host of a URL, or the URL itself when it has none"""
+    return (urlsplit(url).hostname or url).lower()
+
+
+def interleave_by_host(items: list[T], url_of: Callable[[T], str]) -> list[tuple[int, T]]:
+    """
+    Order items round-robin across hosts, keeping each host's own order
+
+    Parameters:
+        items: Items to schedule
+        url_of: Function returning the URL of an item
+
+    Returns:
+        List of (original index, item) pairs, interleaved by host
+    """
+    queues: dict[str, deque] = defaultdict(deque)
+    for index, item in enumerate(items):
+        queues[host_of(url_of(item))].append((index, item))
+    ordered = []
+    while queues:
+        for host in list(queues):
+            ordered.append(queues[host].popleft())
+            if not queues[host]:
+                del queues[host]
+    return ordered
+
+
+async def run_bounded(
+    items: list[T],
+    worker: Callable[[int, T], Awaitable[None]],
+    url_of: Callable[[T], str],
+    concurrency: int = BATCH_CONCURRENCY,
+    per_host: int = BATCH_PER_HOST,
+) -> None:
+    """
+    Run worker(index, item) for every item with bounded, host-fair concurrency
+
+    A task first takes a slot for its host and only then a global slot, so a
+    batch dominated by one host cannot hold every global slot while waiting.
+
+    Parameters:
+        items: Items to process
+        worker: Coroutine function called with the item's original index and the item
+        url_of: Function returning the URL of an item, used for per-host limits
+        concurrency: Maximum number of workers running at once
+        per_host: Maximum number of workers running at once for the same host
+    """
+    global_slots = asyncio.Semaphore(max(1, concurrency))
+    host_slots: dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(max(1, per_host)))
+
+    async def run_one(index: int, item: T) -> None:
+        async with host_slots[host_of(url_of(item))]:
+            async with global_slots:
+                await worker(index, item)
+
+    await asyncio.gather(*(run_one(index, item) for index, item in interleave_by_host(items, url_of)))
@@ -0,0 +1,58 @@
+"""
+Measure conversion time saved by output budgets and main-content mode
+
+For each corpus page and output format, reports CPU time of a full
+conversion and of budgeted conversions, together with the output size.
+A budget without main_content stops parsing as soon as it is filled, so the
+saving grows with page size.
+
+Run from the repository root:
+    python benchmarks/bench_budget.py
+    python benchmarks/bench_budget.py --budgets 2000 8000 --format links
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import corpus, spa_page  # noqa: E402
+from budget import OutputBudget  # noqa: E402
+from engine import convert_document  # noqa: E402
+
+
+def timed(html: str, output_format: str, budget: OutputBudget | None, repeat: int) -> tuple[float, int]:
+    """Average CPU seconds per conversion and the output length"""
+    output = convert_document(html, output_format, budget)  # warm up
+    start = time.process_time()
+    for _ in range(repeat):
+        convert_document(html, output_format, budget)
+    return (time.process_time() - start) / repeat, len(output)
+
+
+def main(args) -> None:
+    pages = corpus()
+    pages["spa-20mb"] = spa_page(2, 20_000_000)
+    variants = [("full", None)]
+    variants += [(f"{chars} chars", OutputBudget(max_chars=chars)) for chars in args.budgets]
+    variants.append(("main content", OutputBudget(main_content=True)))
+    variants += [(f"main + {chars}", OutputBudget(max_chars=chars, main_content=True)) for chars in args.budgets]
+
+    print(f"{args.format}: CPU ms per page (output chars)")
+    print(f"  {'page':>12}" + "".join(f"{label:>22}" for label, _ in variants))
+    for name, html in pages.items():
+        repeat = 1 if len(html) > 1_000_000 else args.repeat
+        cells = []
+        for _, budget in variants:
+            seconds, size = timed(html, args.format, budget, repeat)
+            cells.append(f"{seconds * 1000:10.2f} ({size:>8})")
+        print(f"  {name:>12}" + "".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[4000, 16000])
+    parser.add_argument("--format", default="Markdown", choices=["Markdown", "links"])
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
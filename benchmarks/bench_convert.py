@@ -0,0 +1,70 @@
+"""
+Compare the single-parse conversion engine with the legacy markdownify pipeline
+
+Reports CPU time and peak RSS per page for each engine, measured in a fresh
+child process per engine, and checks that both engines produce the golden
+outputs committed under benchmarks/golden/ (see benchmarks/golden.py).
+
+Run from the repository root:
+    python benchmarks/bench_convert.py
+    python benchmarks/bench_convert.py --check   # golden check only
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import corpus  # noqa: E402
+from benchmarks.golden import check  # noqa: E402
+
+
+def _measure(engine_name: str, output_format: str, repeat: int, queue) -> None:
+    import convert
+    import engine
+
+    convert_fn = convert.get_content if engine_name == "legacy" else engine.convert_document
+    pages = corpus()
+    results = {}
+    for name, html in pages.items():
+        convert_fn(html, output_format)  # warm up
+        start = time.process_time()
+        for _ in range(repeat):
+            convert_fn(html, output_format)
+        results[name] = (time.process_time() - start) / repeat
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((results, peak_kb))
+
+
+def measure(engine_name: str, output_format: str, repeat: int) -> tuple[dict, int]:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(engine_name, output_format, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main(args) -> None:
+    if check() and args.check:
+        sys.exit(1)
+    if args.check:
+        return
+    for output_format in ("Markdown", "links"):
+        legacy, legacy_rss = measure("legacy", output_format, args.repeat)
+        tree, tree_rss = measure("tree", output_format, args.repeat)
+        print(f"\n{output_format}: CPU ms per page (legacy -> tree)")
+        for name in legacy:
+            print(f"  {name:>12}: {legacy[name] * 1000:9.2f} -> {tree[name] * 1000:9.2f}  ({legacy[name] / tree[name]:.2f}x)")
+        print(f"  peak RSS: {legacy_rss / 1024:.1f} MB -> {tree_rss / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="Only run the golden check")
+    main(parser.parse_args())
@@ -0,0 +1,152 @@
+"""
+Site crawl time against page-by-page scraping, and seen-URL memory
+
+Crawls a generated site (every stub page links to --child-links children)
+to --depth and --pages in two ways:
+
+    serial   what an agent does without the crawl tool: scrape a page for its links,
+             then each new link in turn, one scrape_and_convert call at a time
+    crawler  crawl_with_ai_selectors: async frontier, --concurrency workers, per-host limits
+
+The stub proxy's --latency stands in for the proxy round trip; an agent also
+pays a model round trip per tool call, which is not counted here. The
+crawler's rate on the single stub host is capped by --host-delay. The second
+table compares the memory of a set and of the Bloom filter holding --seen
+URLs.
+
+Run from the repository root:
+    python benchmarks/bench_crawl.py
+    python benchmarks/bench_crawl.py --pages 200 --depth 3 --latency 0.2 --seen 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure the crawl's own limits, not the per-domain limiter shared with single scrapes
+os.environ.setdefault("SCRAPER_DOMAIN_RATE", "0")
+
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+from benchmarks.report import write_json  # noqa: E402
+
+SEED = "http://example.test/"
+
+
+class _Context:
+    """Stands in for the FastMCP Context of a tool call"""
+    session_id = "bench"
+    request_context = None
+
+    def __init__(self):
+        self.progress = 0
+
+    async def report_progress(self, progress, total=None, message=None) -> None:
+        self.progress = progress
+
+
+async def crawl_serial(server, config: dict, depth: int, pages: int) -> int:
+    """Breadth-first crawl with one tool call at a time, returns the pages scraped"""
+    frontier, seen, scraped = [(SEED, 0)], {SEED}, 0
+    while frontier and scraped < pages:
+        url, level = frontier.pop(0)
+        await server.scrape_and_convert(url, "", "Markdown", None, config)
+        scraped += 1
+        if level < depth:
+            for link in json.loads(await server.scrape_and_convert(url, "", "links-json", None, config)):
+                if link["internal"] and link["url"] not in seen:
+                    seen.add(link["url"])
+                    frontier.append((link["url"], level + 1))
+    return scraped
+
+
+async def run_crawls(args) -> list[dict]:
+    import server
+    from cache import CacheSettings, ResponseCache
+    from crawl import crawl_settings
+
+    crawl_settings.host_delay = args.host_delay
+    results = []
+    for mode in ("serial", "crawler"):
+        # Every mode starts cold; the serial links call is answered by the response cache
+        server.response_cache = ResponseCache(CacheSettings(ttl=600))
+        server.conversion_cache.clear()
+        server.revalidation_store.clear()
+        settings = StubSettings(latency=args.latency, body_size=args.body_size, child_links=args.child_links)
+        async with StubProxy(settings) as stub:
+            config = {"default_proxy_url": stub.url, "default_proxy_login": "user", "default_proxy_password": "secret"}
+            started = time.perf_counter()
+            if mode == "serial":
+                pages = await crawl_serial(server, config, args.depth, args.pages)
+            else:
+                async def session_config(ctx):
+                    return config
+
+                server.session_config = session_config
+                crawled = await server.crawl_with_ai_selectors.fn(
+                    SEED, "", _Context(), max_depth=args.depth, max_pages=args.pages, concurrency=args.concurrency,
+                )
+                pages = sum(result.ok for result in crawled)
+            elapsed = time.perf_counter() - started
+            results.append({"mode": mode, "pages": pages, "seconds": elapsed, "upstream_requests": stub.requests})
+    return results
+
+
+def measure_seen(count: int) -> list[dict]:
+    from crawl import BloomFilter
+
+    urls = [f"https://example.com/section/{index % 97}/page-{index}" for index in range(count)]
+    results = []
+    for kind in ("set", "bloom"):
+        seen = set() if kind == "set" else BloomFilter(count)
+        started = time.perf_counter()
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+        elapsed = time.perf_counter() - started
+        # Memory in a second pass: tracing allocations slows the first one down
+        tracemalloc.start()
+        seen = set() if kind == "set" else BloomFilter(count)
+        for url in urls:
+            # Copies, as crawled URLs are new strings that only the set keeps alive
+            seen.add(url[:])
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results.append({"structure": kind, "urls": count, "memory_mb": memory / 1e6, "seconds": elapsed})
+        del seen
+    return results
+
+
+def main(args) -> None:
+    crawls = asyncio.run(run_crawls(args))
+    print(f"{'mode':<8} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'requests':>8}")
+    for result in crawls:
+        print(
+            f"{result['mode']:<8} {result['pages']:>6} {result['seconds']:>8.2f} "
+            f"{result['pages'] / result['seconds']:>8.1f} {result['upstream_requests']:>8}"
+        )
+    seen = []
+    print(f"\n{'structure':<9} {'URLs':>9} {'memory MB':>10} {'seconds':>8}")
+    for count in args.seen:
+        for result in measure_seen(count):
+            seen.append(result)
+            print(f"{result['structure']:<9} {count:>9} {result['memory_mb']:>10.1f} {result['seconds']:>8.2f}")
+    write_json(args.json, "crawl", vars(args), {"crawls": crawls, "seen": seen})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60, help="Page budget of the crawl")
+    parser.add_argument("--depth", type=int, default=3, help="Links followed from the seed")
+    parser.add_argument("--child-links", type=int, default=5, help="Links from every page to child pages")
+    parser.add_argument("--concurrency", type=int, default=8, help="Pages fetched at once by the crawler")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub proxy latency in seconds")
+    parser.add_argument("--host-delay", type=float, default=0.1, help="Crawler's minimum seconds between requests to the host")
+    parser.add_argument("--body-size", type=int, default=20_000, help="Approximate page size in bytes")
+    parser.add_argument("--seen", type=int, nargs="+", default=[100_000], help="URL counts for the seen-set comparison")
+    parser.add_argument("--json", help="Write a JSON report to this path, - for stdout")
+    main(parser.parse_args())
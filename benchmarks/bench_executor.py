@@ -0,0 +1,62 @@
+"""
+Benchmark event-loop lag and throughput of large-page conversions per executor mode
+
+Run from the repository root:
+    python benchmarks/bench_executor.py --pages 16 --page-size 3000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_proxy import make_html  # noqa: E402
+from executor import ContentExecutor, ExecutorSettings  # noqa: E402
+
+
+async def measure_lag(stop: asyncio.Event, interval: float, samples: list[float]) -> None:
+    """Record how late the event loop wakes up a sleeping task"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def run(label: str, settings: ExecutorSettings, html: str, pages: int, output_format: str) -> None:
+    executor = ContentExecutor(settings)
+    # Warm up pools so worker start-up is not counted
+    await executor.get_content("<html><body><p>warm</p></body></html>", output_format)
+
+    stop = asyncio.Event()
+    samples: list[float] = []
+    ticker = asyncio.create_task(measure_lag(stop, 0.005, samples))
+    start = time.perf_counter()
+    await asyncio.gather(*(executor.get_content(html, output_format) for _ in range(pages)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    executor.shutdown()
+
+    samples.sort()
+    worst = samples[-1] * 1000 if samples else 0.0
+    p99 = samples[int(len(samples) * 0.99) - 1] * 1000 if samples else 0.0
+    print(f"{label:>8}: {pages / elapsed:6.2f} pages/s  loop lag p99 {p99:8.2f} ms  max {worst:8.2f} ms")
+
+
+async def main(args) -> None:
+    html = make_html(args.page_size)
+    print(f"{args.pages} concurrent {args.output_format} conversions of {len(html) / 1e6:.1f} MB pages")
+    await run("inline", ExecutorSettings(threads=0, processes=0), html, args.pages, args.output_format)
+    await run("thread", ExecutorSettings(threads=args.workers, processes=0), html, args.pages, args.output_format)
+    await run("process", ExecutorSettings(threads=args.workers, processes=args.workers), html, args.pages, args.output_format)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=16)
+    parser.add_argument("--page-size", type=int, default=3_000_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--output-format", default="Markdown")
+    asyncio.run(main(parser.parse_args()))
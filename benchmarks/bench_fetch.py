@@ -0,0 +1,143 @@
+"""
+Fetch latency and transferred bytes with compression and adaptive render waits
+
+Scrapes --pages pages from each of --static-hosts server-rendered sites and
+--app-hosts client-side apps through the unlocker stub, the sites in
+parallel and each site's pages in turn. The stub holds every request for
+--render-delay seconds per X-Wait-Second it asks for, and app hosts answer
+an unrendered shell when the request asks for no wait. Modes:
+
+    identity    no content coding, X-Wait-Second fixed at --render-wait (the unlocker's old pinned headers)
+    compressed  negotiated content coding, fixed render wait
+    adaptive    negotiated content coding, no render wait until a site's page comes back as a shell
+
+Reports the time per scrape, body bytes on the wire, unlocker requests and
+app shells returned instead of content. A second table decodes a page whose
+charset is declared only by its <meta> tag, with the UTF-8 fallback used
+before and with the BOM / Content-Type / <meta> prescan.
+
+Run from the repository root:
+    python benchmarks/bench_fetch.py
+    python benchmarks/bench_fetch.py --static-hosts 20 --app-hosts 2 --pages 10 --render-delay 0.1 --page article-2
+"""
+import argparse
+import asyncio
+import codecs
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure the fetch itself, not the per-domain limiter
+os.environ.setdefault("SCRAPER_DOMAIN_RATE", "0")
+
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+from benchmarks.report import write_json  # noqa: E402
+
+MODES = ("identity", "compressed", "adaptive")
+
+
+async def run_mode(mode: str, args) -> dict:
+    import server
+    from cache import CacheSettings, ConversionCache, ConversionCacheSettings, ResponseCache
+    from fetching import fetch_settings, render_waits, supported_encodings
+    from revalidate import RevalidationSettings, RevalidationStore
+
+    # Every scrape goes to the stub
+    server.response_cache = ResponseCache(CacheSettings(ttl=0))
+    server.conversion_cache = ConversionCache(ConversionCacheSettings(ttl=0))
+    server.revalidation_store = RevalidationStore(RevalidationSettings(ttl=0))
+    fetch_settings.accept_encoding = "identity" if mode == "identity" else supported_encodings()
+    fetch_settings.adaptive = mode == "adaptive"
+    fetch_settings.render_wait = args.render_wait
+    render_waits.clear()
+    settings = StubSettings(
+        latency=args.latency, page=args.page, compress=True, render_delay=args.render_delay, app_prefix="app-",
+    )
+    hosts = [f"site-{index}.test" for index in range(args.static_hosts)] + [f"app-{index}.test" for index in range(args.app_hosts)]
+    timings = []
+    shells = 0
+    async with StubProxy(settings) as stub:
+        config = {"unlocker_proxy_url": stub.url, "unlocker_proxy_login": "user", "unlocker_proxy_password": "secret"}
+
+        async def scrape_site(host: str) -> None:
+            nonlocal shells
+            for index in range(args.pages):
+                started = time.perf_counter()
+                result = await server.scrape_and_convert(f"http://{host}/page/{index}", "Unlocker", "Markdown", None, config)
+                timings.append(time.perf_counter() - started)
+                # A shell converts to its title alone
+                shells += len(result) < 100
+
+        started = time.perf_counter()
+        await asyncio.gather(*(scrape_site(host) for host in hosts))
+        elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "accept_encoding": fetch_settings.accept_encoding,
+        "scrapes": len(timings),
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": statistics.median(timings) * 1000,
+        "seconds": elapsed,
+        "wire_mb": stub.body_bytes / 1e6,
+        "requests": stub.requests,
+        "shells": shells,
+    }
+
+
+def measure_decoding(args) -> list[dict]:
+    from fetching import FetchStats, body_charset
+
+    text = "<html><head><meta charset=\"windows-1252\"><title>Café</title></head><body>" + (
+        "<p>Résumé of the naïve café’s “crème brûlée” — déjà vu.</p>\n" * (args.decode_size // 60)
+    ) + "</body></html>"
+    data = text.encode("cp1252")
+    results = []
+    for strategy in ("utf-8 fallback", "prescan"):
+        started = time.perf_counter()
+        for _ in range(args.decode_runs):
+            charset = "utf-8" if strategy == "utf-8 fallback" else body_charset(None, data, FetchStats())
+            decoded = codecs.getincrementaldecoder(charset)(errors="replace").decode(data, final=True)
+        elapsed = (time.perf_counter() - started) / args.decode_runs
+        results.append({
+            "strategy": strategy, "charset": charset, "mb": len(data) / 1e6, "ms": elapsed * 1000,
+            "replacements": decoded.count("�"), "correct": decoded == text,
+        })
+    return results
+
+
+async def main(args) -> None:
+    results = []
+    print(f"{'mode':<11} {'scrapes':>7} {'mean ms':>8} {'p50 ms':>7} {'seconds':>8} {'wire MB':>8} {'requests':>8} {'shells':>6}")
+    for mode in MODES:
+        result = await run_mode(mode, args)
+        results.append(result)
+        print(
+            f"{mode:<11} {result['scrapes']:>7} {result['mean_ms']:>8.1f} {result['p50_ms']:>7.1f} {result['seconds']:>8.2f} "
+            f"{result['wire_mb']:>8.2f} {result['requests']:>8} {result['shells']:>6}"
+        )
+    decoding = measure_decoding(args)
+    print(f"\n{'decoding':<15} {'charset':>8} {'MB':>6} {'ms':>7} {'U+FFFD':>7} {'correct':>7}")
+    for result in decoding:
+        print(
+            f"{result['strategy']:<15} {result['charset']:>8} {result['mb']:>6.2f} {result['ms']:>7.2f} "
+            f"{result['replacements']:>7} {str(result['correct']):>7}"
+        )
+    write_json(args.json, "fetch", vars(args), {"modes": results, "decoding": decoding})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--static-hosts", type=int, default=8, help="Server-rendered sites scraped")
+    parser.add_argument("--app-hosts", type=int, default=2, help="Client-side app sites scraped, they need a render wait")
+    parser.add_argument("--pages", type=int, default=5, help="Pages scraped per site")
+    parser.add_argument("--page", default="article-0", help="Corpus page served for every URL")
+    parser.add_argument("--render-wait", type=int, default=10, help="X-Wait-Second of rendered fetches")
+    parser.add_argument("--render-delay", type=float, default=0.05, help="Stub seconds per X-Wait-Second, scales the unlocker's hold")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub proxy latency in seconds")
+    parser.add_argument("--decode-size", type=int, default=1_000_000, help="Approximate size of the decoded page in bytes")
+    parser.add_argument("--decode-runs", type=int, default=20, help="Decodes timed per strategy")
+    parser.add_argument("--json", help="Write a JSON report to this path, - for stdout")
+    asyncio.run(main(parser.parse_args()))
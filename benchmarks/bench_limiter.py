@@ -0,0 +1,105 @@
+"""
+Upstream load and failure latency with the per-domain limiter and circuit breaker
+
+Sends waves of fetches through scrape_with_retry to a stub proxy that is
+failing for a while (an outage) and then recovers, with the limiter off and
+on. Reports upstream requests, failures and how quickly failures return.
+Also checks that two limiters sharing a SQLite state backend agree on an open
+circuit.
+
+Run from the repository root:
+    python benchmarks/bench_limiter.py
+    python benchmarks/bench_limiter.py --waves 6 --fetches 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_outage(limited: bool, args) -> None:
+    import server
+    from retry import RetryPolicy, RetrySettings
+    from limiter import DomainLimiter, LimiterSettings
+
+    server.retry_policy = RetryPolicy(RetrySettings(base_wait=0.05, max_wait=0.2))
+    server.domain_limiter = DomainLimiter(LimiterSettings(
+        rate=50 if limited else 0, burst=50, breaker_min_requests=10, breaker_window=10, breaker_cooldown=args.cooldown,
+    ))
+
+    async with StubProxy(StubSettings(latency=0.02, error_rate=1.0, error_status=503, body_size=2000)) as stub:
+        config = server.ProxyConfig(proxy_url=stub.url, login="user", password="secret")
+        for wave in range(args.waves):
+            if wave == args.waves // 2:
+                # The outage ends halfway through
+                stub.settings.error_rate = 0.0
+            stub.requests = 0
+            latencies = []
+            failures = 0
+
+            async def one(index: int) -> None:
+                nonlocal failures
+                started = time.perf_counter()
+                try:
+                    await server.scrape_with_retry(f"http://example.test/{wave}/{index}", config)
+                except Exception:
+                    failures += 1
+                latencies.append(time.perf_counter() - started)
+
+            await asyncio.gather(*(one(index) for index in range(args.fetches)))
+            print(
+                f"  {'limiter' if limited else 'no limiter':>10} wave {wave}: failed {failures:>4}  upstream {stub.requests:>4}"
+                f"  p50 {percentile(latencies, 0.5):6.3f}s  p99 {percentile(latencies, 0.99):6.3f}s"
+            )
+            await asyncio.sleep(args.pause)
+        print(f"  stats: {server.domain_limiter.stats}")
+    await server.session_pool.close()
+
+
+async def check_shared_state() -> None:
+    from limiter import DomainLimiter, LimiterSettings, CircuitOpenError
+    from shared import SQLiteState
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings = LimiterSettings(sync_interval=0, breaker_min_requests=5)
+        # Two workers, each with its own connection to the same state file
+        path = os.path.join(directory, "state.sqlite")
+        first, second = DomainLimiter(settings, SQLiteState(path)), DomainLimiter(settings, SQLiteState(path))
+        await second.acquire("http://shared.test/")
+        for _ in range(5):
+            domain = await first.acquire("http://shared.test/")
+            first.record(domain, 503, 0.01, failed=True)
+        await first.sync()  # Publishes the open circuit
+        await second.sync()  # Picks up the shared state
+        try:
+            await second.acquire("http://shared.test/")
+        except CircuitOpenError as e:
+            print(f"  shared state: OK ({e})")
+        else:
+            print("  shared state: FAILED, second worker did not see the open circuit")
+
+
+async def main(args) -> None:
+    for limited in (False, True):
+        await run_outage(limited, args)
+    await check_shared_state()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--waves", type=int, default=4)
+    parser.add_argument("--fetches", type=int, default=100)
+    parser.add_argument("--pause", type=float, default=1.0, help="Seconds between waves")
+    parser.add_argument("--cooldown", type=float, default=1.5, help="Circuit breaker cooldown in seconds")
+    asyncio.run(main(parser.parse_args()))
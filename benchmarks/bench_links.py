@@ -0,0 +1,121 @@
+"""
+Compare link extraction implementations on link-heavy pages
+
+Each page is processed in a fresh child process per implementation, and CPU
+time and peak RSS growth over the process baseline are reported:
+
+    xpath      the previous extraction: full parse, //a[@href], only "/" paths joined, no dedup
+    tree       full parse, then links.LinkCollector (resolve, normalize, dedupe)
+    iterparse  the links engine: one incremental pass that releases the tree behind each anchor
+
+The pages are sitemap-like link lists (benchmarks/corpus.py) with every link
+repeated --repeat times, and single-page-app dumps of --sizes MB.
+
+Run from the repository root:
+    python benchmarks/bench_links.py
+    python benchmarks/bench_links.py --links 5000 50000 --sizes 5 20 --repeat 3 --json links.json
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import link_heavy_page, spa_page  # noqa: E402
+from benchmarks.report import write_json  # noqa: E402
+
+PAGE_URL = "https://example.com/docs/index.html"
+IMPLEMENTATIONS = ("xpath", "tree", "iterparse")
+
+
+def build_page(kind: str, size: int, repeat: int) -> str:
+    if kind == "links":
+        html = link_heavy_page(1, size)
+        if repeat > 1:
+            # Repeat the list, as navigation and footers repeat links on real pages
+            head, _, rest = html.partition("<ul>")
+            items, _, tail = rest.partition("</ul>")
+            html = head + "<ul>" + items * repeat + "</ul>" + tail
+        return html
+    return spa_page(1, size * 1_000_000)
+
+
+def xpath_links(html: str) -> list[str]:
+    """The extraction before the links engine, kept as the baseline"""
+    from lxml.html import fromstring
+
+    links = []
+    for link in fromstring(html).xpath("descendant-or-self::a[@href]"):
+        href = link.get("href")
+        text = link.text_content().strip()
+        if href and text and not href.startswith("#") and not href.startswith("javascript:"):
+            if href.startswith("/"):
+                href = PAGE_URL.rstrip("/") + href
+            links.append(f"[{text}] {href}")
+    return links
+
+
+def run(implementation: str, html: str) -> int:
+    """Extract the links of html, returns the number of links output"""
+    if implementation == "xpath":
+        return len(xpath_links(html))
+    if implementation == "tree":
+        from lxml.html import fromstring
+        from links import LinkCollector
+
+        collector = LinkCollector("links", PAGE_URL)
+        collector.add_tree(fromstring(html))
+        return len(collector.render().splitlines())
+    import engine
+
+    return len(engine.convert_document(html, "links", url=PAGE_URL).splitlines())
+
+
+def _measure(implementation: str, kind: str, size: int, repeat: int, queue) -> None:
+    # Build the page before taking the baseline, so only extraction memory is counted
+    html = build_page(kind, size, repeat)
+    run(implementation, "<html><body><a href='/'>warm up</a></body></html>")
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.process_time()
+    count = run(implementation, html)
+    elapsed = time.process_time() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak_kb - baseline_kb) / 1024, count, len(html)))
+
+
+def measure(implementation: str, kind: str, size: int, repeat: int) -> tuple[float, float, int, int]:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(implementation, kind, size, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main(args) -> None:
+    pages = [("links", count) for count in args.links] + [("spa", size) for size in args.sizes]
+    results = []
+    print(f"{'page':<14} {'MB':>6} {'implementation':<10} {'CPU s':>7} {'peak RSS MB':>11} {'links out':>9}")
+    for kind, size in pages:
+        label = f"{kind}-{size}" + ("" if kind == "spa" else f"x{args.repeat}")
+        for implementation in IMPLEMENTATIONS:
+            elapsed, rss_mb, count, length = measure(implementation, kind, size, args.repeat)
+            results.append({
+                "page": label, "bytes": length, "implementation": implementation,
+                "cpu_s": elapsed, "peak_rss_growth_mb": rss_mb, "links": count,
+            })
+            print(f"{label:<14} {length / 1e6:>6.1f} {implementation:<10} {elapsed:>7.3f} {rss_mb:>11.1f} {count:>9}")
+    write_json(args.json, "links", vars(args), results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, nargs="+", default=[5000, 50000], help="Links per sitemap-like page")
+    parser.add_argument("--repeat", type=int, default=2, help="Times each link appears on the sitemap-like pages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20], help="Single-page-app dump sizes in MB")
+    parser.add_argument("--json", help="Write a JSON report to this path, - for stdout")
+    main(parser.parse_args())
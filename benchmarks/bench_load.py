@@ -0,0 +1,227 @@
+"""
+End-to-end MCP load generator against the streamable HTTP app
+
+Starts the stub proxy in this process and server.py as a child process
+pointed at it, then runs --users concurrent MCP clients. Each client
+initializes its own session (with the proxy config in ?config=) and calls
+parse_with_ai_selectors in a loop for --duration seconds. Reports
+throughput, p50/p95/p99 tool call latency, errors, and the server's peak RSS
+(summed over its worker processes).
+
+Run from the repository root:
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --users 50 --duration 30 --format links --page article-0 --json load.json
+    python benchmarks/bench_load.py --server-url http://127.0.0.1:8081/mcp --server-pid 1234  # an already running server
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.report import latency_summary, peak_rss_mb, write_json  # noqa: E402
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MCP_HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def encode_config(proxy_url: str) -> str:
+    config = {"default_proxy_url": proxy_url, "default_proxy_login": "bench", "default_proxy_password": "bench"}
+    return base64.b64encode(json.dumps(config).encode()).decode()
+
+
+async def read_message(response: aiohttp.ClientResponse) -> dict | None:
+    """The JSON-RPC response in a plain JSON or server-sent events reply"""
+    if response.content_type == "application/json":
+        return await response.json()
+    if response.content_type != "text/event-stream":
+        return None
+    async for line in response.content:
+        if line.startswith(b"data:"):
+            message = json.loads(line[5:])
+            if "result" in message or "error" in message:
+                return message
+    return None
+
+
+class McpClient:
+    """Minimal streamable HTTP MCP client: one session, sequential requests"""
+
+    def __init__(self, http: aiohttp.ClientSession, url: str):
+        self.http = http
+        self.url = url
+        self.session_id: str | None = None
+        self._next_id = 0
+
+    async def request(self, method: str, params: dict | None = None, notify: bool = False) -> dict | None:
+        message = {"jsonrpc": "2.0", "method": method, "params": params or {}}
+        if not notify:
+            self._next_id += 1
+            message["id"] = self._next_id
+        headers = dict(MCP_HEADERS)
+        if self.session_id:
+            headers["mcp-session-id"] = self.session_id
+        async with self.http.post(self.url, json=message, headers=headers) as response:
+            if response.status >= 400:
+                raise RuntimeError(f"HTTP {response.status}: {(await response.text())[:200]}")
+            self.session_id = response.headers.get("mcp-session-id", self.session_id)
+            return None if notify else await read_message(response)
+
+    async def initialize(self) -> None:
+        await self.request("initialize", {
+            "protocolVersion": "2025-03-26",
+            "capabilities": {},
+            "clientInfo": {"name": "bench_load", "version": "1.0"},
+        })
+        await self.request("notifications/initialized", notify=True)
+
+    async def call_tool(self, name: str, arguments: dict) -> dict:
+        reply = await self.request("tools/call", {"name": name, "arguments": arguments})
+        if reply is None or "error" in reply:
+            raise RuntimeError(f"Tool call failed: {reply}")
+        return reply["result"]
+
+    async def close(self) -> None:
+        if self.session_id:
+            async with self.http.delete(self.url, headers={"mcp-session-id": self.session_id}):
+                pass
+
+
+async def wait_ready(http: aiohttp.ClientSession, base_url: str, process: subprocess.Popen | None, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            async with http.get(base_url + "/metrics") as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+async def user(http: aiohttp.ClientSession, url: str, args, deadline: float, latencies: list[float], errors: list[str], counter: list[int]) -> None:
+    client = McpClient(http, url)
+    try:
+        await client.initialize()
+    except Exception as e:
+        errors.append(f"initialize: {e}")
+        return
+    while time.monotonic() < deadline:
+        counter[0] += 1
+        index = counter[0] % args.url_pool if args.url_pool else counter[0]
+        arguments = {"url": f"http://example.test/page/{index}", "render": "", "output_format": args.format}
+        if args.max_output:
+            arguments["max_output"] = args.max_output
+        started = time.perf_counter()
+        try:
+            result = await client.call_tool("parse_with_ai_selectors", arguments)
+            if result.get("isError"):
+                errors.append(str(result.get("content"))[:200])
+        except Exception as e:
+            errors.append(str(e)[:200])
+        latencies.append(time.perf_counter() - started)
+    try:
+        await client.close()
+    except aiohttp.ClientError:
+        pass
+
+
+async def main(args) -> dict:
+    stub_settings = StubSettings(
+        latency=args.latency, error_rate=args.error_rate, body_size=args.body_size, page=args.page,
+    )
+    process = None
+    async with StubProxy(stub_settings) as stub, aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=0), timeout=aiohttp.ClientTimeout(total=300),
+    ) as http:
+        if args.server_url:
+            mcp_url = args.server_url
+            pid = args.server_pid
+        else:
+            port = free_port()
+            env = dict(os.environ, PORT=str(port))
+            env.setdefault("SCRAPER_LOG_LEVEL", "WARNING")
+            # Every call targets the same stub domain, so the per-domain limiter is off unless asked for
+            env.setdefault("SCRAPER_DOMAIN_RATE", "0")
+            process = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py")], cwd=ROOT, env=env)
+            mcp_url = f"http://127.0.0.1:{port}/mcp"
+            pid = process.pid
+        base_url = mcp_url.rsplit("/", 1)[0]
+        try:
+            await wait_ready(http, base_url, process)
+            url = f"{mcp_url}?config={encode_config(stub.url)}"
+            latencies: list[float] = []
+            errors: list[str] = []
+            counter = [0]
+            started = time.monotonic()
+            deadline = started + args.duration
+            await asyncio.gather(*(user(http, url, args, deadline, latencies, errors, counter) for _ in range(args.users)))
+            elapsed = time.monotonic() - started
+            server_rss = peak_rss_mb(pid, children=True) if pid else 0.0
+        finally:
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    results = {
+        "calls": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_s": latency_summary(latencies),
+        "upstream_requests": stub.requests,
+        "server_peak_rss_mb": server_rss,
+        "client_peak_rss_mb": peak_rss_mb(),
+        "sample_errors": sorted(set(errors))[:5],
+    }
+    summary = results["latency_s"]
+    print(
+        f"{args.users} users, {args.format}, {elapsed:.1f}s: {results['calls']} calls ({results['errors']} errors), "
+        f"{results['throughput_rps']:.1f} calls/s, p50 {summary['p50'] * 1000:.0f}ms p95 {summary['p95'] * 1000:.0f}ms "
+        f"p99 {summary['p99'] * 1000:.0f}ms, server peak RSS {server_rss:.0f}MB, upstream {stub.requests}"
+    )
+    for error in results["sample_errors"]:
+        print(f"  error: {error}")
+    write_json(args.json, "load", {key: value for key, value in vars(args).items() if key != "json"}, results)
+    return results
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Concurrent MCP sessions")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load")
+    parser.add_argument("--format", default="Markdown", choices=("html", "links", "links-json", "Markdown"))
+    parser.add_argument("--max-output", type=int, default=0, help="max_output passed to the tool, 0 for none")
+    parser.add_argument("--url-pool", type=int, default=0, help="Cycle through this many URLs to exercise the caches, 0 makes every URL distinct")
+    parser.add_argument("--page", help="Corpus page served by the stub (small, article-0, links, spa-5mb, ...)")
+    parser.add_argument("--body-size", type=int, default=20_000, help="Generated page size when --page is not given")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub proxy latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub responses that fail with 503")
+    parser.add_argument("--server-url", help="MCP endpoint of an already running server instead of starting server.py")
+    parser.add_argument("--server-pid", type=int, help="Pid of the --server-url server, for its peak RSS")
+    parser.add_argument("--json", help="Write a JSON report to this path, - for stdout")
+    return parser
+
+
+if __name__ == "__main__":
+    asyncio.run(main(build_parser().parse_args()))
@@ -0,0 +1,92 @@
+"""
+Microbenchmarks of the HTML processing functions on the page corpus
+
+Times clean_html, strip_html and extract_links_with_text from convert.py, and
+get_content per output format for both the legacy pipeline and the
+single-parse engine, on every corpus page. clean_html[new Cleaner] builds its
+Cleaner per call, as clean_html did before cleaners were shared, and the
+[profile] cases time each cleaning profile. Reports the median and best time
+per call over --repeat runs.
+
+Run from the repository root:
+    python benchmarks/bench_micro.py
+    python benchmarks/bench_micro.py --pages small,article-0 --repeat 20 --json micro.json
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert  # noqa: E402
+import engine  # noqa: E402
+from budget import OutputBudget  # noqa: E402
+from benchmarks.corpus import corpus  # noqa: E402
+from benchmarks.report import write_json  # noqa: E402
+
+FORMATS = ("html", "links", "Markdown")
+
+
+def cases() -> dict:
+    """Named functions of one HTML argument"""
+    functions = {
+        "clean_html": convert.clean_html,
+        "clean_html[new Cleaner]": lambda html: convert.build_cleaner().clean_html(html),
+        "strip_html": convert.strip_html,
+        "extract_links_with_text": convert.extract_links_with_text,
+    }
+    for profile in convert.CLEANING_PROFILES:
+        if profile != "default":
+            functions[f"strip_html[{profile}]"] = lambda html, p=profile: convert.strip_html(html, p)
+            functions[f"get_content[engine,Markdown,{profile}]"] = (
+                lambda html, p=profile: engine.convert_document(html, "Markdown", OutputBudget(profile=p))
+            )
+    for output_format in FORMATS:
+        functions[f"get_content[legacy,{output_format}]"] = lambda html, f=output_format: convert.get_content(html, f)
+        functions[f"get_content[engine,{output_format}]"] = lambda html, f=output_format: engine.convert_document(html, f)
+    return functions
+
+
+def measure(function, html: str, repeat: int) -> list[float]:
+    function(html)  # Warm up caches and lazy initialization
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(html)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(args) -> None:
+    pages = corpus()
+    if args.pages:
+        pages = {name: pages[name] for name in args.pages.split(",")}
+    functions = cases()
+    if args.functions:
+        functions = {name: function for name, function in functions.items() if any(part in name for part in args.functions.split(","))}
+
+    results = []
+    print(f"{'function':<44} {'page':<10} {'KB':>7} {'median ms':>10} {'best ms':>9}")
+    for page_name, html in pages.items():
+        # The 5 MB page takes seconds per call in the legacy pipeline, keep its run short
+        repeat = max(1, args.repeat // 5) if len(html) > 1_000_000 else args.repeat
+        for function_name, function in functions.items():
+            timings = measure(function, html, repeat)
+            median, best = statistics.median(timings), min(timings)
+            results.append({
+                "function": function_name, "page": page_name, "bytes": len(html),
+                "repeat": repeat, "median_s": median, "best_s": best,
+            })
+            print(f"{function_name:<44} {page_name:<10} {len(html) / 1024:>7.0f} {median * 1000:>10.2f} {best * 1000:>9.2f}")
+    write_json(args.json, "micro", vars(args), results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="Timed calls per function and page")
+    parser.add_argument("--pages", help="Comma separated corpus pages, default all")
+    parser.add_argument("--functions", help="Comma separated substrings selecting functions, default all")
+    parser.add_argument("--json", help="Write a JSON report to this path, - for stdout")
+    main(parser.parse_args())
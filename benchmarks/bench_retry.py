@@ -0,0 +1,92 @@
+"""
+Tail latency and proxy cost of the retry policy under injected faults
+
+Runs many fetches through scrape_with_retry against the stub proxy for a set
+of fault scenarios, comparing the previous fixed policy (3 attempts with
+4-5 s waits on every failure), the classified retry policy, and the policy
+with hedged requests. Reports p50/p95/p99 latency, failures and upstream
+requests per fetch.
+
+Run from the repository root:
+    python benchmarks/bench_retry.py
+    python benchmarks/bench_retry.py --fetches 100 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tenacity import retry, stop_after_attempt, wait_exponential  # noqa: E402
+
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+
+SCENARIOS = {
+    "dead url (404)": StubSettings(latency=0.02, error_rate=1.0, error_status=404, body_size=2000),
+    "flaky (20% 503)": StubSettings(latency=0.02, error_rate=0.2, error_status=503, body_size=2000),
+    "rate limited (429)": StubSettings(latency=0.02, error_rate=0.3, error_status=429, retry_after="1", body_size=2000),
+    "slow tail (5% +2s)": StubSettings(latency=0.02, slow_rate=0.05, slow_latency=2.0, body_size=2000),
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_scenario(name: str, settings: StubSettings, policy: str, args) -> None:
+    import server
+    from retry import RetryPolicy, RetrySettings
+    from limiter import DomainLimiter, LimiterSettings
+
+    legacy = retry(reraise=True, stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=5))(server.scrape_once)
+    server.retry_policy = RetryPolicy(RetrySettings(hedge=policy == "hedged", hedge_min_delay=0.1))
+    # Measure the retry policy alone, without the per-domain limiter
+    server.domain_limiter = DomainLimiter(LimiterSettings(rate=0))
+    fetch = legacy if policy == "legacy" else server.scrape_with_retry
+
+    async with StubProxy(settings) as stub:
+        config = server.ProxyConfig(proxy_url=stub.url, login="user", password="secret")
+        if policy == "hedged":
+            # Calibrate the latency quantile before measuring
+            for index in range(30):
+                try:
+                    await server.scrape_with_retry(f"http://example.test/warm/{index}", config)
+                except Exception:
+                    pass
+            stub.requests = 0
+        latencies = []
+        failures = 0
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def one(index: int) -> None:
+            nonlocal failures
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    await fetch(f"http://example.test/{index}", config)
+                except Exception:
+                    failures += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one(index) for index in range(args.fetches)))
+        print(
+            f"  {name:>20} {policy:>10}: p50 {percentile(latencies, 0.5):6.2f}s  p95 {percentile(latencies, 0.95):6.2f}s"
+            f"  p99 {percentile(latencies, 0.99):6.2f}s  failed {failures:>4}  upstream/fetch {stub.requests / args.fetches:.2f}"
+        )
+    await server.session_pool.close()
+
+
+async def main(args) -> None:
+    for name, settings in SCENARIOS.items():
+        for policy in ("legacy", "classified", "hedged"):
+            await run_scenario(name, settings, policy, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fetches", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
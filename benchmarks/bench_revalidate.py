@@ -0,0 +1,108 @@
+"""
+Cost of recrawling monitored pages with and without revalidation
+
+Scrapes --urls pages for --rounds rounds through scrape_and_convert against
+the stub proxy, with the response and conversion caches disabled so that
+every round is a recrawl after those caches expired. Between rounds each page
+changes with probability --change-rate. Modes:
+
+    full        no revalidation: every round transfers and converts every page
+    hash-only   the stub sends no validators: bodies are transferred, unchanged ones are not converted again
+    revalidate  conditional requests: unchanged pages are answered with 304 and not converted again
+    diff        like revalidate, with the Markdown-diff output format
+
+Reports the time per scrape, body bytes transferred, conversions run and the
+mean output size.
+
+Run from the repository root:
+    python benchmarks/bench_revalidate.py
+    python benchmarks/bench_revalidate.py --urls 50 --rounds 20 --change-rate 0.05 --page article-1
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+from benchmarks.report import write_json  # noqa: E402
+
+MODES = ("full", "hash-only", "revalidate", "diff")
+
+
+async def run_mode(mode: str, args) -> dict:
+    import server
+    from cache import CacheSettings, ConversionCache, ConversionCacheSettings, ResponseCache
+    from limiter import DomainLimiter, LimiterSettings
+    from revalidate import RevalidationSettings, RevalidationStore
+
+    server.response_cache = ResponseCache(CacheSettings(ttl=0))
+    server.conversion_cache = ConversionCache(ConversionCacheSettings(ttl=0))
+    server.revalidation_store = RevalidationStore(RevalidationSettings(ttl=0 if mode == "full" else 3600))
+    server.domain_limiter = DomainLimiter(LimiterSettings(rate=0))
+    conversions = 0
+    get_content = server.content_executor.get_content
+
+    async def counted_get_content(*a, **kw):
+        nonlocal conversions
+        conversions += 1
+        return await get_content(*a, **kw)
+
+    server.content_executor.get_content = counted_get_content
+    output_format = "Markdown-diff" if mode == "diff" else "Markdown"
+    settings = StubSettings(
+        latency=args.latency, page=args.page, validators=mode in ("revalidate", "diff"), change_rate=args.change_rate,
+    )
+    timings, sizes = [], []
+    try:
+        async with StubProxy(settings) as stub:
+            config = {"default_proxy_url": stub.url, "default_proxy_login": "user", "default_proxy_password": "secret"}
+
+            async def scrape(url: str) -> None:
+                started = time.perf_counter()
+                result = await server.scrape_and_convert(url, "", output_format, None, config)
+                timings.append(time.perf_counter() - started)
+                sizes.append(len(result))
+
+            for _ in range(args.rounds):
+                await asyncio.gather(*(scrape(f"http://example.test/page/{index}") for index in range(args.urls)))
+            body_bytes = stub.body_bytes
+    finally:
+        server.content_executor.get_content = get_content
+    return {
+        "mode": mode,
+        "scrapes": len(timings),
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": statistics.median(timings) * 1000,
+        "body_mb": body_bytes / 1e6,
+        "conversions": conversions,
+        "mean_output_chars": statistics.mean(sizes),
+        "not_modified": server.revalidation_store.stats.not_modified,
+    }
+
+
+async def main(args) -> None:
+    results = []
+    print(f"{'mode':<11} {'scrapes':>7} {'mean ms':>8} {'p50 ms':>7} {'body MB':>8} {'conversions':>11} {'304s':>5} {'output chars':>12}")
+    for mode in MODES:
+        result = await run_mode(mode, args)
+        results.append(result)
+        print(
+            f"{mode:<11} {result['scrapes']:>7} {result['mean_ms']:>8.2f} {result['p50_ms']:>7.2f} {result['body_mb']:>8.2f} "
+            f"{result['conversions']:>11} {result['not_modified']:>5} {result['mean_output_chars']:>12.0f}"
+        )
+    write_json(args.json, "revalidate", vars(args), results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=20, help="Pages recrawled every round")
+    parser.add_argument("--rounds", type=int, default=10, help="Recrawl rounds")
+    parser.add_argument("--change-rate", type=float, default=0.1, help="Probability that a page changed since the last round")
+    parser.add_argument("--page", default="article-0", help="Corpus page served for every URL")
+    parser.add_argument("--latency", type=float, default=0.01, help="Stub proxy latency in seconds")
+    parser.add_argument("--json", help="Write a JSON report to this path, - for stdout")
+    asyncio.run(main(parser.parse_args()))
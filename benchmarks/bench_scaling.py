@@ -0,0 +1,80 @@
+"""
+Throughput scaling of multi-worker mode with the number of worker processes
+
+Runs the bench_load.py scenario once per worker count (SCRAPER_WORKERS) and
+reports throughput, p99 and scaling efficiency relative to one worker. The
+default scenario converts distinct news-article pages to Markdown, so the
+server is CPU bound and throughput should grow close to linearly up to the
+number of cores. The stub proxy and load generator share this process; on
+small machines they compete with the workers for CPU.
+
+Run from the repository root:
+    python benchmarks/bench_scaling.py
+    python benchmarks/bench_scaling.py --workers 1,2,4,8 --users 64 --duration 20 --json scaling.json
+    python benchmarks/bench_scaling.py --shared-state redis   # shared state in the local Redis stand-in
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import bench_load  # noqa: E402
+from benchmarks.report import write_json  # noqa: E402
+from benchmarks.resp_standin import RespStandin  # noqa: E402
+
+
+async def main(args) -> None:
+    counts = [int(count) for count in args.workers.split(",")]
+    results = []
+    standin = None
+    if args.shared_state == "redis":
+        standin = RespStandin()
+        await standin.start()
+    try:
+        for count in counts:
+            os.environ["SCRAPER_WORKERS"] = str(count)
+            with tempfile.TemporaryDirectory() as directory:
+                if standin is not None:
+                    os.environ["SCRAPER_SHARED_STATE"] = standin.url
+                else:
+                    # A fresh state file per run, so no run starts with a warm shared cache
+                    os.environ["SCRAPER_SHARED_STATE"] = os.path.join(directory, "state.sqlite")
+                load_args = bench_load.build_parser().parse_args([
+                    "--users", str(args.users), "--duration", str(args.duration),
+                    "--format", args.format, "--page", args.page, "--latency", str(args.latency),
+                ])
+                result = await bench_load.main(load_args)
+            results.append({"workers": count, **result})
+    finally:
+        if standin is not None:
+            await standin.stop()
+
+    base = results[0]["throughput_rps"] / counts[0] if results[0]["throughput_rps"] else 0.0
+    print(f"\n{'workers':>7} {'calls/s':>9} {'p99 ms':>8} {'efficiency':>10} {'peak RSS MB':>11}")
+    for result in results:
+        efficiency = result["throughput_rps"] / (result["workers"] * base) if base else 0.0
+        result["efficiency"] = efficiency
+        print(
+            f"{result['workers']:>7} {result['throughput_rps']:>9.1f} {result['latency_s']['p99'] * 1000:>8.0f}"
+            f" {efficiency:>10.0%} {result['server_peak_rss_mb']:>11.0f}"
+        )
+    print(f"cores: {os.cpu_count()}")
+    write_json(args.json, "scaling", {key: value for key, value in vars(args).items() if key != "json"}, results)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    default_workers = ",".join(str(count) for count in (1, 2, 4, 8) if count <= max(2, os.cpu_count() or 1))
+    parser.add_argument("--workers", default=default_workers, help="Comma separated worker counts")
+    parser.add_argument("--users", type=int, default=32, help="Concurrent MCP sessions")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load per worker count")
+    parser.add_argument("--format", default="Markdown", choices=("html", "links", "links-json", "Markdown"))
+    parser.add_argument("--page", default="article-0", help="Corpus page served by the stub")
+    parser.add_argument("--latency", type=float, default=0.01, help="Stub proxy latency in seconds")
+    parser.add_argument("--shared-state", default="sqlite", choices=("sqlite", "redis"))
+    parser.add_argument("--json", help="Write a JSON report to this path, - for stdout")
+    asyncio.run(main(parser.parse_args()))
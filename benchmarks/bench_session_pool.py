@@ -0,0 +1,80 @@
+"""
+Benchmark pooled proxy sessions against a new session per request
+
+Run from the repository root:
+    python benchmarks/bench_session_pool.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+from pool import SessionPool  # noqa: E402
+
+
+async def fetch_per_call(url: str, proxy: str) -> str:
+    """Previous behaviour: a fresh ClientSession and TCPConnector for every request"""
+    async with aiohttp.ClientSession(
+        headers={"X-Render-Type": "html", "X-Wait-Second": "10"},
+        timeout=aiohttp.ClientTimeout(total=120),
+        connector=aiohttp.TCPConnector(),
+        max_field_size=32768,
+    ) as session:
+        async with session.get(url, proxy=proxy, proxy_auth=aiohttp.BasicAuth("user", "pass"), ssl=False) as response:
+            return await response.text()
+
+
+async def run(label: str, fetch, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await fetch(f"http://target.test/page/{i}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "mode": label,
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(args) -> None:
+    async with StubProxy(StubSettings(latency=args.latency, body_size=args.body_size)) as stub:
+        results = [await run("per-call", lambda url: fetch_per_call(url, stub.url), args.requests, args.concurrency)]
+
+        pool = SessionPool()
+
+        async def fetch_pooled(url: str) -> str:
+            session = await pool.get(stub.url, "user", "")
+            async with session.get(url, proxy=stub.url, proxy_auth=aiohttp.BasicAuth("user", "pass"), ssl=False) as response:
+                return await response.text()
+
+        results.append(await run("pooled", fetch_pooled, args.requests, args.concurrency))
+        await pool.close()
+
+    for result in results:
+        print(f"{result['mode']:>9}: {result['rps']:8.1f} req/s  p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub proxy latency in seconds")
+    parser.add_argument("--body-size", type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
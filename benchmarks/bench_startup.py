@@ -0,0 +1,141 @@
+"""
+Cold start: module import time and time to the first tool call
+
+Imports server in fresh interpreters under -X importtime and reports the
+median total import time and the slowest modules imported at load. Then
+starts the server --runs times per entry point and measures, from process
+start:
+
+    listening     the port accepts connections
+    initialized   an MCP session is initialized
+    first call    the first parse_with_ai_selectors call through the stub proxy returned
+
+Entry points: "script" runs python server.py, "module" python -m server
+(which, unlike a script, loads server from its cached bytecode).
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --entries module --json startup.json
+"""
+import argparse
+import asyncio
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_load import McpClient, encode_config, free_port  # noqa: E402
+from benchmarks.report import write_json  # noqa: E402
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRIES = {
+    "script": [sys.executable, os.path.join(ROOT, "server.py")],
+    "module": [sys.executable, "-m", "server"],
+}
+re_importtime = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(runs: int) -> tuple[float, list[tuple[str, float]]]:
+    """Median seconds to import server, and the median cumulative seconds of each module imported at load"""
+    totals, modules = [], defaultdict(list)
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import server"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stderr
+        for match in re_importtime.finditer(output):
+            cumulative, indent, name = int(match.group(2)) / 1e6, len(match.group(3)), match.group(4)
+            if name == "server":
+                totals.append(cumulative)
+            elif indent == 3:
+                # Imported by server itself (or first by it)
+                modules[name].append(cumulative)
+    slowest = sorted(((name, statistics.median(values)) for name, values in modules.items()), key=lambda item: -item[1])
+    return statistics.median(totals), slowest
+
+
+async def wait_listening(port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return
+        except OSError:
+            await asyncio.sleep(0.005)
+    raise RuntimeError("Server did not start listening")
+
+
+async def start_once(entry: str, stub_url: str) -> dict:
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), SCRAPER_DOMAIN_RATE="0")
+    env.setdefault("SCRAPER_LOG_LEVEL", "WARNING")
+    started = time.perf_counter()
+    process = subprocess.Popen(ENTRIES[entry], cwd=ROOT, env=env)
+    try:
+        await wait_listening(port, process)
+        listening = time.perf_counter() - started
+        async with aiohttp.ClientSession() as http:
+            client = McpClient(http, f"http://127.0.0.1:{port}/mcp?config={encode_config(stub_url)}")
+            await client.initialize()
+            initialized = time.perf_counter() - started
+            result = await client.call_tool(
+                "parse_with_ai_selectors", {"url": "http://example.test/", "render": "", "output_format": "Markdown"},
+            )
+            first_call = time.perf_counter() - started
+            if result.get("isError"):
+                raise RuntimeError(f"First call failed: {result}")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {"listening": listening, "initialized": initialized, "first_call": first_call}
+
+
+async def measure_starts(entries: list[str], runs: int) -> list[dict]:
+    results = []
+    async with StubProxy(StubSettings(page="article-0")) as stub:
+        for entry in entries:
+            samples = [await start_once(entry, stub.url) for _ in range(runs)]
+            results.append({"entry": entry, **{
+                stage: statistics.median(sample[stage] for sample in samples)
+                for stage in ("listening", "initialized", "first_call")
+            }})
+    return results
+
+
+def main(args) -> None:
+    total, slowest = import_times(args.runs)
+    print(f"import server: {total * 1000:.0f} ms (median of {args.runs})")
+    for name, seconds in slowest[:args.top]:
+        print(f"  {name:<32} {seconds * 1000:>7.1f} ms")
+    starts = asyncio.run(measure_starts(args.entries, args.runs))
+    print(f"\n{'entry':<8} {'listening ms':>12} {'initialized ms':>14} {'first call ms':>13}")
+    for result in starts:
+        print(
+            f"{result['entry']:<8} {result['listening'] * 1000:>12.0f} {result['initialized'] * 1000:>14.0f} "
+            f"{result['first_call'] * 1000:>13.0f}"
+        )
+    write_json(args.json, "startup", vars(args), {
+        "import_s": total, "slowest_imports_s": dict(slowest[:args.top]), "starts": starts,
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--entries", nargs="+", choices=list(ENTRIES), default=list(ENTRIES), help="Entry points to start")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imported modules listed")
+    parser.add_argument("--json", help="Write a JSON report to this path, - for stdout")
+    main(parser.parse_args())
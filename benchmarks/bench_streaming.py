@@ -0,0 +1,93 @@
+"""
+Compare peak memory of streaming conversion with the single-parse engine
+
+Each page size is converted in a fresh child process per engine, feeding the
+streaming converter in network-sized chunks, and the peak RSS growth over the
+process baseline is reported. Streaming output is checked against the
+single-parse engine first.
+
+Run from the repository root:
+    python benchmarks/bench_streaming.py
+    python benchmarks/bench_streaming.py --sizes 5 20 50 --format links
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import corpus, spa_page  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _stream(html: str, output_format: str) -> str:
+    from streaming import StreamingConverter
+
+    converter = StreamingConverter(output_format, max_bytes=0)
+    for start in range(0, len(html), CHUNK_SIZE):
+        converter.feed(html[start:start + CHUNK_SIZE])
+    return converter.close()
+
+
+def _measure(engine_name: str, output_format: str, size_mb: int, queue) -> None:
+    import engine
+
+    # Build the page before taking the baseline, so only conversion memory is counted
+    html = spa_page(1, size_mb * 1_000_000)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.process_time()
+    if engine_name == "streaming":
+        _stream(html, output_format)
+    else:
+        engine.convert_document(html, output_format)
+    elapsed = time.process_time() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, peak_kb - baseline_kb))
+
+
+def measure(engine_name: str, output_format: str, size_mb: int) -> tuple[float, int]:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(engine_name, output_format, size_mb, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def check() -> int:
+    """Streaming output must match the single-parse engine on the corpus"""
+    import engine
+
+    failures = 0
+    for name, html in corpus().items():
+        for output_format in ("Markdown", "links"):
+            if _stream(html, output_format) != engine.convert_document(html, output_format):
+                failures += 1
+                print(f"MISMATCH {name} {output_format}")
+    print(f"parity: {failures} mismatches")
+    return failures
+
+
+def main(args) -> None:
+    if check():
+        sys.exit(1)
+    print(f"\n{args.format}: CPU s / peak RSS growth (tree -> streaming)")
+    for size_mb in args.sizes:
+        tree_time, tree_kb = measure("tree", args.format, size_mb)
+        stream_time, stream_kb = measure("streaming", args.format, size_mb)
+        print(
+            f"  {size_mb:>4} MB: {tree_time:6.2f}s {tree_kb / 1024:7.1f} MB"
+            f" -> {stream_time:6.2f}s {stream_kb / 1024:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--format", default="Markdown", choices=["Markdown", "links"])
+    main(parser.parse_args())
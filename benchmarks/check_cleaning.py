@@ -0,0 +1,137 @@
+"""
+Correctness checks for HTML cleaning, strip_html and the cleaning profiles
+
+Converts small hand-written pages and checks what each step keeps and drops:
+footer and hidden elements, empty elements, whitespace outside and inside pre
+blocks, and the aggressive, article-only and keep-forms profiles, for
+strip_html and for both conversion engines. Also checks that the shared
+cleaners give identical results when used from many threads at once.
+
+Run from the repository root:
+    python benchmarks/check_cleaning.py
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert  # noqa: E402
+import engine  # noqa: E402
+from budget import OutputBudget  # noqa: E402
+from benchmarks.corpus import corpus  # noqa: E402
+
+PAGE = """<html><body>
+<header class="site-header">Site name</header>
+<nav>Home | About</nav>
+<div class="cookie-banner">We use cookies</div>
+<main>
+  <article>
+    <h1 style="color: red">Title</h1>
+    <p>First    paragraph
+       with   spaces <i></i> <b>bold</b></p>
+    <div><span></span><em></em></div>
+    <pre>keep   this
+    indentation</pre>
+    <p>line one<br>
+    line two</p>
+    <table><tr><td>a</td><td></td><td>c</td></tr></table>
+    <div class="overflow-hidden">Layout wrapper text</div>
+    <div class="visually-hidden">Hidden text</div>
+    <p hidden>Hidden attribute text</p>
+    <div class="share-buttons">Share this</div>
+    <form><label>Email</label><input name="email"></form>
+    <img src="photo.jpg" alt="Photo">
+  </article>
+</main>
+<aside>Sidebar links</aside>
+<div id="page-footer">Footer text</div>
+<footer>Copyright</footer>
+</body></html>"""
+
+# (profile, texts that must appear, texts that must not appear) in the Markdown of PAGE
+EXPECTATIONS = [
+    ("default",
+     ["Site name", "We use cookies", "First paragraph with spaces **bold**", "keep   this\n    indentation",
+      "line one  \n", "| a |  | c |", "Layout wrapper text", "Share this", "Sidebar links", "![Photo]"],
+     ["Home | About", "Hidden text", "Footer text", "Copyright", "Email", "color"]),
+    ("aggressive",
+     ["Title", "First paragraph with spaces **bold**", "Layout wrapper text"],
+     ["Site name", "We use cookies", "Hidden attribute text", "Share this", "Sidebar links", "![Photo]"]),
+    ("article-only",
+     ["Title", "Share this", "![Photo]"],
+     ["Site name", "We use cookies", "Sidebar links", "Footer text"]),
+    ("keep-forms",
+     ["Title", "Email"],
+     ["Home | About", "Footer text"]),
+]
+
+
+def check_profiles() -> int:
+    failures = 0
+    for profile, present, absent in EXPECTATIONS:
+        outputs = {
+            "legacy": convert.get_content(PAGE, "Markdown", profile),
+            "engine": engine.convert_document(PAGE, "Markdown", OutputBudget(profile=profile)),
+        }
+        if outputs["legacy"] != outputs["engine"]:
+            failures += 1
+            print(f"FAIL {profile}: legacy and engine output differ")
+        for text in present:
+            if text not in outputs["engine"]:
+                failures += 1
+                print(f"FAIL {profile}: missing {text!r}")
+        for text in absent:
+            if text in outputs["engine"]:
+                failures += 1
+                print(f"FAIL {profile}: kept {text!r}")
+    return failures
+
+
+def check_strip_html() -> int:
+    failures = 0
+    stripped = convert.strip_html(PAGE)
+    for text, expected in (
+        ("<span>", False),  # Empty elements are removed
+        ("<em>", False),  # Including ones emptied by removing their children
+        ("<i>", False),
+        ("<br>", True),  # Line breaks and table cells are kept when empty
+        ("<td></td>", True),
+        ("style=", False),
+        ("First paragraph with spaces", True),  # Whitespace collapses outside pre
+        ("keep   this\n    indentation", True),
+        ("overflow-hidden", True),  # Layout classes are not hidden elements
+        ("visually-hidden", False),
+        ("page-footer", False),
+    ):
+        if (text in stripped) != expected:
+            failures += 1
+            print(f"FAIL strip_html: {text!r} {'missing' if expected else 'kept'}")
+    return failures
+
+
+def check_threads() -> int:
+    """Shared cleaners hold no per-call state, so concurrent use must match sequential use"""
+    pages = list(corpus().values())[:6]
+    expected = [convert.strip_html(html, profile) for html in pages for profile in convert.CLEANING_PROFILES]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(4):
+            got = list(pool.map(
+                lambda args: convert.strip_html(*args),
+                [(html, profile) for html in pages for profile in convert.CLEANING_PROFILES],
+            ))
+            if got != expected:
+                print("FAIL threads: concurrent output differs from sequential output")
+                return 1
+    return 0
+
+
+def main() -> None:
+    failures = check_profiles() + check_strip_html() + check_threads()
+    print(f"cleaning checks: {failures} failures")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Correctness checks for decoding response bodies
+
+Serves a page whose charset is declared only by its <meta> tag from a
+local server, in small chunks, and reads it with server.read_body through
+a pooled session (aiohttp's own decompression off), buffered and streamed
+into the Markdown converter. Checks that:
+
+    identity         the page decodes with the <meta> charset when the first chunk ends before the tag
+    gzip             the same for a gzip coded body, whose first chunk may be the gzip header alone
+    deflate / raw    zlib wrapped and raw deflate bodies decode
+    stacked          a body coded gzip then deflate decodes
+    unsupported      a coding this process cannot decode fails with ContentDecodingError
+    corrupt          a body that does not decompress fails with ContentDecodingError
+
+Run from the repository root:
+    python benchmarks/check_decoding.py
+"""
+import asyncio
+import gzip
+import os
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web  # noqa: E402
+
+import server  # noqa: E402
+from fetching import ContentDecodingError  # noqa: E402
+from pool import session_pool  # noqa: E402
+from streaming import StreamingConverter  # noqa: E402
+
+TEXT = "<html><head><title>Café</title><meta charset=\"windows-1252\"></head><body>" + (
+    "<p>Résumé of the naïve café’s “crème brûlée” — déjà vu.</p>\n" * 400
+) + "</body></html>"
+DATA = TEXT.encode("cp1252")
+# Bytes written before the rest of the body, short of the <meta> tag
+FIRST_WRITE = 16
+
+
+def _raw_deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+# Path: (Content-Encoding, coded body)
+BODIES = {
+    "identity": ("", DATA),
+    "gzip": ("gzip", gzip.compress(DATA)),
+    "deflate": ("deflate", zlib.compress(DATA)),
+    "raw-deflate": ("deflate", _raw_deflate(DATA)),
+    "stacked": ("gzip, deflate", zlib.compress(gzip.compress(DATA))),
+    "unsupported": ("compress", DATA),
+    "corrupt": ("gzip", b"\x1f\x8b" + b"junk" * 64),
+}
+
+
+async def handle(request: web.Request) -> web.StreamResponse:
+    coding, body = BODIES[request.match_info["name"]]
+    response = web.StreamResponse(headers={"Content-Type": "text/html", **({"Content-Encoding": coding} if coding else {})})
+    await response.prepare(request)
+    try:
+        await response.write(body[:FIRST_WRITE])
+        # Let the first bytes reach the client as a chunk of their own
+        await asyncio.sleep(0.05)
+        await response.write(body[FIRST_WRITE:])
+        await response.write_eof()
+    except ConnectionResetError:
+        # The client gave up on a body it could not decode
+        pass
+    return response
+
+
+async def read(base: str, name: str, streamed: bool) -> str:
+    session = await session_pool.get("check", "check")
+    async with session.get(f"{base}/{name}") as response:
+        if not streamed:
+            return await server.read_body(response)
+        converter = StreamingConverter("Markdown", max_bytes=0)
+
+        async def consume(text: str) -> bool:
+            converter.feed(text)
+            return converter.exhausted
+
+        await server.read_body(response, consume)
+        return converter.close()
+
+
+async def check(base: str, name: str) -> list[str]:
+    errors = []
+    for streamed in (False, True):
+        mode = "streamed" if streamed else "buffered"
+        try:
+            result = await read(base, name, streamed)
+        except ContentDecodingError as e:
+            if name not in ("unsupported", "corrupt"):
+                errors.append(f"{mode}: {e}")
+            continue
+        if name in ("unsupported", "corrupt"):
+            errors.append(f"{mode}: no ContentDecodingError")
+        elif "�" in result or "crème brûlée" not in result:
+            errors.append(f"{mode}: decoded with replacement characters")
+    return errors
+
+
+async def main() -> None:
+    app = web.Application()
+    app.router.add_get("/{name}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    failed = 0
+    try:
+        for name in BODIES:
+            errors = await check(base, name)
+            failed += bool(errors)
+            print(f"{name:<12} {'ok' if not errors else '; '.join(errors)}")
+    finally:
+        await session_pool.close()
+        await runner.cleanup()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Concurrency check for per-session proxy configuration
+
+Starts the full ASGI app (session config middleware included) on a local
+port and opens many MCP sessions at once, each with its own proxy login in
+its ?config= parameter. Every session calls the scrape tool several times
+concurrently; the stub proxy echoes the login each fetch authenticated
+with, so any request that ran with another session's credentials is
+reported. Also reports how many times configs were actually decoded. The
+per-domain limiter is disabled, since every fetch goes to one stub domain.
+
+Run from the repository root:
+    python benchmarks/check_sessions.py --sessions 50 --calls 4
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import socket
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn  # noqa: E402
+from fastmcp import Client  # noqa: E402
+from fastmcp.client.transports import StreamableHttpTransport  # noqa: E402
+
+from benchmarks.stub_proxy import StubProxy, StubSettings  # noqa: E402
+
+re_login = re.compile(r"proxy-login: (\S+) ")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def encode_config(proxy_url: str, login: str) -> str:
+    config = {"default_proxy_url": proxy_url, "default_proxy_login": login, "default_proxy_password": "secret"}
+    return base64.b64encode(json.dumps(config).encode()).decode()
+
+
+async def run_session(server_url: str, proxy_url: str, index: int, calls: int) -> tuple[int, int]:
+    """Run one session and return the numbers of calls that used foreign credentials and that failed"""
+    login = f"user{index}"
+    transport = StreamableHttpTransport(f"{server_url}/mcp?config={encode_config(proxy_url, login)}")
+    async with Client(transport) as client:
+        results = await asyncio.gather(*(
+            client.call_tool("parse_with_ai_selectors", {
+                "url": f"http://example.test/{login}/{call}", "render": "", "output_format": "html",
+            })
+            for call in range(calls)
+        ))
+    mismatches = failures = 0
+    for result in results:
+        match = re_login.search(result.content[0].text)
+        if match is None:
+            failures += 1
+        elif match.group(1) != login:
+            mismatches += 1
+    return mismatches, failures
+
+
+async def main(args) -> None:
+    os.environ.setdefault("SCRAPER_DOMAIN_RATE", "0")
+    import server
+    from sessions import session_configs
+
+    async with StubProxy(StubSettings(body_size=2000, echo_auth=True, latency=0.005)) as stub:
+        port = free_port()
+        config = uvicorn.Config(server.build_app(), host="127.0.0.1", port=port, log_level="warning")
+        uvicorn_server = uvicorn.Server(config)
+        serve = asyncio.create_task(uvicorn_server.serve())
+        while not uvicorn_server.started:
+            await asyncio.sleep(0.05)
+        try:
+            outcomes = await asyncio.gather(*(
+                run_session(f"http://127.0.0.1:{port}", stub.url, index, args.calls)
+                for index in range(args.sessions)
+            ))
+        finally:
+            uvicorn_server.should_exit = True
+            await serve
+
+    total = args.sessions * args.calls
+    mismatches = sum(outcome[0] for outcome in outcomes)
+    failures = sum(outcome[1] for outcome in outcomes)
+    print(
+        f"{args.sessions} sessions x {args.calls} calls: {mismatches} of {total} used another session's credentials,"
+        f" {failures} failed"
+    )
+    print(f"config decodes: {session_configs.stats.decodes}, session hits: {session_configs.stats.hits}")
+    if mismatches or failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
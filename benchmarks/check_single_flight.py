@@ -0,0 +1,129 @@
+"""
+Correctness checks for the single-flight deduplication of the response cache
+
+Starts a slow fetch through ResponseCache.get_or_fetch, joins it from more
+callers and then cancels callers in turn, as when a client disconnects or
+a batch is torn down. Checks that:
+
+    leader cancelled     the joiners still get the page, from the one fetch
+    joiner cancelled     the leader still gets the page
+    all cancelled        the fetch itself is cancelled
+    fetch failed         every caller gets the fetch's exception, not CancelledError
+    batch item cancelled the other items of a gather with return_exceptions complete
+
+Run from the repository root:
+    python benchmarks/check_single_flight.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import CacheSettings, ResponseCache  # noqa: E402
+
+URL = "http://example.test/page"
+
+
+class _Fetch:
+    """Slow upstream fetch counting its calls and cancellations"""
+
+    def __init__(self, delay: float = 0.05, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return "<html>page</html>"
+
+
+async def _start(cache: ResponseCache, fetch: _Fetch, count: int) -> list[asyncio.Task]:
+    tasks = []
+    for _ in range(count):
+        tasks.append(asyncio.create_task(cache.get_or_fetch(URL, "", fetch)))
+        # Let each caller reach the single flight before the next one
+        await asyncio.sleep(0)
+    return tasks
+
+
+async def leader_cancelled() -> list[str]:
+    cache, fetch = ResponseCache(CacheSettings(ttl=60)), _Fetch()
+    leader, *joiners = await _start(cache, fetch, 3)
+    leader.cancel()
+    results = await asyncio.gather(*joiners, return_exceptions=True)
+    errors = []
+    if results != ["<html>page</html>"] * 2:
+        errors.append(f"joiners got {results!r}")
+    if fetch.calls != 1 or fetch.cancelled:
+        errors.append(f"{fetch.calls} fetches, {fetch.cancelled} cancelled")
+    return errors
+
+
+async def joiner_cancelled() -> list[str]:
+    cache, fetch = ResponseCache(CacheSettings(ttl=60)), _Fetch()
+    leader, joiner = await _start(cache, fetch, 2)
+    joiner.cancel()
+    result = await leader
+    return [] if result == "<html>page</html>" and fetch.calls == 1 else [f"leader got {result!r}"]
+
+
+async def all_cancelled() -> list[str]:
+    cache, fetch = ResponseCache(CacheSettings(ttl=60)), _Fetch()
+    tasks = await _start(cache, fetch, 3)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.sleep(0)
+    errors = [] if fetch.cancelled == 1 else [f"fetch cancelled {fetch.cancelled} times"]
+    # A new caller starts a new fetch instead of joining the cancelled one
+    if await cache.get_or_fetch(URL, "", fetch) != "<html>page</html>" or fetch.calls != 2:
+        errors.append("no fresh fetch after every caller left")
+    return errors
+
+
+async def fetch_failed() -> list[str]:
+    cache, fetch = ResponseCache(CacheSettings(ttl=60)), _Fetch(error=RuntimeError("upstream failed"))
+    results = await asyncio.gather(*await _start(cache, fetch, 3), return_exceptions=True)
+    if all(isinstance(result, RuntimeError) for result in results) and fetch.calls == 1:
+        return []
+    return [f"callers got {results!r}"]
+
+
+async def batch_item_cancelled() -> list[str]:
+    cache, fetch = ResponseCache(CacheSettings(ttl=60)), _Fetch()
+
+    async def item() -> str:
+        try:
+            return await cache.get_or_fetch(URL, "", fetch)
+        except Exception as e:
+            return f"error: {e}"
+
+    tasks = [asyncio.create_task(item()) for _ in range(4)]
+    await asyncio.sleep(0.01)
+    # The first item, which leads the fetch, goes away
+    tasks[0].cancel()
+    results = await asyncio.gather(*tasks[1:], return_exceptions=True)
+    return [] if results == ["<html>page</html>"] * 3 else [f"items got {results!r}"]
+
+
+async def main() -> None:
+    failed = 0
+    for check in (leader_cancelled, joiner_cancelled, all_cancelled, fetch_failed, batch_item_cancelled):
+        errors = await check()
+        failed += bool(errors)
+        print(f"{check.__name__:<22} {'ok' if not errors else '; '.join(errors)}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
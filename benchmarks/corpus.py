@@ -0,0 +1,148 @@
+"""
+Synthetic page corpus used by the conversion benchmarks and parity checks
+
+Pages are generated deterministically, so results are comparable between runs.
+"""
+import random
+
+WORDS = (
+    "proxy network data scraping agent markdown render unlocker page content "
+    "server request response latency cache session browser market report news "
+    "article analysis global release update feature product customer service"
+).split()
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(2, 5)):
+        sentence = _sentence(rng)
+        roll = rng.random()
+        if roll < 0.2:
+            sentence = f'<a href="/{rng.choice(WORDS)}/{rng.randint(1, 999)}">{sentence}</a>'
+        elif roll < 0.3:
+            sentence = f"<strong>{sentence}</strong>"
+        elif roll < 0.4:
+            sentence = f"<em>{sentence}</em> <code>x_{rng.randint(1, 9)} * 2</code>"
+        parts.append(sentence)
+    return "<p>\n  " + "\n  ".join(parts) + "\n</p>"
+
+
+def _list(rng: random.Random, tag: str = "ul", depth: int = 0) -> str:
+    items = []
+    for _ in range(rng.randint(2, 5)):
+        item = _sentence(rng, 6)
+        if depth < 2 and rng.random() < 0.2:
+            item += _list(rng, rng.choice(("ul", "ol")), depth + 1)
+        items.append(f"<li>{item}</li>")
+    return f"<{tag}>\n" + "\n".join(items) + f"\n</{tag}>"
+
+
+def _table(rng: random.Random) -> str:
+    head = "".join(f"<th>{rng.choice(WORDS)}</th>" for _ in range(4))
+    rows = "".join(
+        "<tr>" + "".join(f"<td>{rng.randint(1, 1000)}</td>" for _ in range(4)) + "</tr>\n"
+        for _ in range(rng.randint(3, 8))
+    )
+    return f"<table>\n<thead><tr>{head}</tr></thead>\n<tbody>\n{rows}</tbody>\n</table>"
+
+
+def _chrome(rng: random.Random) -> tuple[str, str]:
+    nav = "<nav><ul>" + "".join(f'<li><a href="/{w}">{w}</a></li>' for w in rng.sample(WORDS, 8)) + "</ul></nav>"
+    footer = '<footer><p>Copyright</p><a href="/privacy">Privacy</a></footer>'
+    return nav, footer
+
+
+def article_page(seed: int = 0, sections: int = 8) -> str:
+    """A news-article style page with navigation, body text, lists, a table and code"""
+    rng = random.Random(seed)
+    nav, footer = _chrome(rng)
+    body = [f"<h1>{_sentence(rng, 6)}</h1>"]
+    for index in range(sections):
+        body.append(f"<h{2 + index % 3}>{_sentence(rng, 4)}</h{2 + index % 3}>")
+        body.extend(_paragraph(rng) for _ in range(rng.randint(2, 4)))
+        roll = rng.random()
+        if roll < 0.3:
+            body.append(_list(rng, rng.choice(("ul", "ol"))))
+        elif roll < 0.45:
+            body.append(_table(rng))
+        elif roll < 0.55:
+            body.append(f"<pre><code>def f(x):\n    return x * 2  # {rng.choice(WORDS)}\n</code></pre>")
+        elif roll < 0.65:
+            body.append(f"<blockquote><p>{_sentence(rng)}</p></blockquote>")
+        elif roll < 0.75:
+            body.append(f'<figure><img src="/img/{index}.png" alt="{rng.choice(WORDS)}"><figcaption>{_sentence(rng, 5)}</figcaption></figure>')
+        else:
+            body.append(f'<div class="related" style="color: red"><span>{_sentence(rng, 5)}</span><br><a href="https://example.com/{index}">more</a></div>')
+    return (
+        "<!DOCTYPE html><html><head><title>Article</title>"
+        '<meta charset="utf-8"><style>body { margin: 0 }</style>'
+        "<script>window.x = 1;</script></head>\n<body>\n"
+        + nav + "\n<main><article>\n" + "\n".join(body) + "\n</article></main>\n"
+        + '<div class="hidden">tracking</div>\n' + footer + "\n</body></html>"
+    )
+
+
+def small_page(seed: int = 0) -> str:
+    """A small landing page"""
+    rng = random.Random(seed)
+    return (
+        "<html><head><title>Home</title></head><body>"
+        f"<h1>{_sentence(rng, 3)}</h1>{_paragraph(rng)}{_list(rng)}"
+        '<p><a href="/about">About</a> | <a href="#top">Top</a> | <a href="javascript:void(0)">Menu</a></p>'
+        "</body></html>"
+    )
+
+
+def spa_page(seed: int = 0, size: int = 5_000_000) -> str:
+    """A large single-page-app dump: deep div soup with inline scripts and many links"""
+    rng = random.Random(seed)
+    chunks = []
+    total = 0
+    index = 0
+    while total < size:
+        card = (
+            f'<div class="card" data-id="{index}"><div class="card-body">'
+            f'<h3><a href="/item/{index}">{_sentence(rng, 4)}</a></h3>'
+            f"<div><span>{_sentence(rng)}</span></div>"
+            f'<script type="application/json">{{"id": {index}, "w": "{rng.choice(WORDS)}"}}</script>'
+            f'<svg width="10" height="10"><path d="M0 0L10 10"/></svg>'
+            "</div></div>\n"
+        )
+        chunks.append(card)
+        total += len(card)
+        index += 1
+    return "<!DOCTYPE html><html><head><title>App</title></head><body><div id=\"root\">\n" + "".join(chunks) + "</div></body></html>"
+
+
+def shell_page(seed: int = 0, bundle_size: int = 2_000) -> str:
+    """The unrendered shell of a client-side app: an empty root element and its script bundle"""
+    rng = random.Random(seed)
+    bundle = "".join(f"var {rng.choice(WORDS)}{index}={index};" for index in range(bundle_size // 12))
+    return (
+        '<!DOCTYPE html><html><head><title>App</title><script src="/static/app.js" defer></script></head>'
+        '<body><div id="root"></div><noscript>You need to enable JavaScript to run this app.</noscript>'
+        f"<script>{bundle}</script></body></html>"
+    )
+
+
+def link_heavy_page(seed: int = 0, links: int = 5000) -> str:
+    """A sitemap-like page dominated by links"""
+    rng = random.Random(seed)
+    items = "".join(
+        f'<li><a href="{rng.choice(("/", "./", "../", "https://other.example/"))}{rng.choice(WORDS)}/{i}">{_sentence(rng, 3)}</a></li>\n'
+        for i in range(links)
+    )
+    return f'<html><head><base href="https://example.com/docs/"></head><body><ul>\n{items}</ul></body></html>'
+
+
+def corpus() -> dict[str, str]:
+    """Named representative pages"""
+    pages = {"small": small_page(1)}
+    pages.update({f"article-{seed}": article_page(seed) for seed in range(5)})
+    pages["links"] = link_heavy_page(1)
+    pages["spa-5mb"] = spa_page(1)
+    return pages
@@ -0,0 +1,110 @@
+"""
+Golden conversion outputs: write them from a git revision, compare the tree against them
+
+The golden pages are the corpus pages, with the 5 MB SPA dump cut to
+200 KB to keep the files small. Each is converted to Markdown and links and
+stored under benchmarks/golden/. Outputs are written from the conversion of
+a given revision (its convert.get_content, or server.get_content before
+convert.py existed), so the reference does not move with the code; a
+deliberate output change is accepted by writing them from the revision that
+makes it.
+
+Run from the repository root:
+    python benchmarks/golden.py --write 278142e   # outputs of the baseline commit
+    python benchmarks/golden.py --write HEAD
+    python benchmarks/golden.py                   # compare both engines of the tree
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(ROOT, "benchmarks", "golden")
+FORMATS = {"Markdown": "md", "links": "txt"}
+
+sys.path.insert(0, ROOT)
+
+
+def golden_pages() -> dict[str, str]:
+    from benchmarks.corpus import corpus, spa_page
+
+    pages = corpus()
+    del pages["spa-5mb"]
+    pages["spa-200k"] = spa_page(1, size=200_000)
+    return pages
+
+
+def golden_path(name: str, output_format: str) -> str:
+    return os.path.join(GOLDEN_DIR, f"{name}.{output_format}.{FORMATS[output_format]}")
+
+
+# Run inside the extracted revision: converts the pages read from stdin with that revision's pipeline
+_CONVERT_AT_REVISION = """
+import json, sys, warnings
+warnings.simplefilter("ignore")
+sys.path.insert(0, ".")
+try:
+    from convert import get_content
+except ImportError:
+    from server import get_content
+pages = json.load(sys.stdin)
+json.dump({name: {fmt: get_content(html, fmt) for fmt in sys.argv[1:]} for name, html in pages.items()}, sys.stdout)
+"""
+
+
+def convert_at(revision: str, pages: dict[str, str]) -> dict[str, dict[str, str]]:
+    """Outputs of every page and format converted by the code of a git revision"""
+    with tempfile.TemporaryDirectory() as directory:
+        archive = subprocess.run(["git", "archive", revision], cwd=ROOT, capture_output=True, check=True).stdout
+        archive_path = os.path.join(directory, "tree.tar")
+        with open(archive_path, "wb") as f:
+            f.write(archive)
+        with tarfile.open(archive_path) as tar:
+            tar.extractall(directory, filter="data")
+        result = subprocess.run(
+            [sys.executable, "-c", _CONVERT_AT_REVISION, *FORMATS], cwd=directory,
+            input=json.dumps(pages), capture_output=True, text=True, check=True,
+        )
+    return json.loads(result.stdout)
+
+
+def write(revision: str) -> None:
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    outputs = convert_at(revision, golden_pages())
+    for name, formats in outputs.items():
+        for output_format, output in formats.items():
+            with open(golden_path(name, output_format), "w", encoding="utf-8", newline="") as f:
+                f.write(output)
+    print(f"wrote {sum(map(len, outputs.values()))} golden outputs from {revision}")
+
+
+def check() -> int:
+    """Compare the legacy and single-parse engines of the tree with the golden outputs, returns the mismatches"""
+    import convert
+    import engine
+
+    failures = 0
+    for name, html in golden_pages().items():
+        for output_format in FORMATS:
+            with open(golden_path(name, output_format), encoding="utf-8", newline="") as f:
+                expected = f.read()
+            for engine_name, convert_fn in (("legacy", convert.get_content), ("tree", engine.convert_document)):
+                if convert_fn(html, output_format) != expected:
+                    failures += 1
+                    print(f"MISMATCH {engine_name} {name} {output_format}")
+    print(f"golden: {failures} mismatches")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--write", metavar="REVISION", help="Write the golden outputs converted by this git revision")
+    args = parser.parse_args()
+    if args.write:
+        write(args.write)
+    elif check():
+        sys.exit(1)
@@ -0,0 +1,89 @@
+"""
+Shared result reporting for the benchmarks: percentiles, peak RSS and JSON output
+
+JSON reports carry the benchmark name, the run's parameters, environment
+details and the measured results, so runs can be compared over time, e.g.
+by diffing two reports or loading them into a dashboard.
+"""
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, 0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(values: list[float]) -> dict:
+    """Count, mean and p50/p95/p99 of latencies in seconds"""
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+    }
+
+
+def peak_rss_mb(pid: int | None = None, children: bool = False) -> float:
+    """
+    Peak resident set size in MB of this process, or of another process by pid (Linux)
+
+    With children, the peaks of all its descendant processes (e.g. server
+    workers) are added, an upper bound of the group's combined peak.
+    """
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    total = 0.0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    total = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        return 0.0
+    if children:
+        for child in child_pids(pid):
+            total += peak_rss_mb(child, children=True)
+    return total
+
+
+def child_pids(pid: int) -> list[int]:
+    """Direct children of a process (Linux)"""
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def write_json(path: str | None, name: str, parameters: dict, results) -> None:
+    """Write a benchmark report to path, "-" writes to stdout, None does nothing"""
+    if not path:
+        return
+    report = {
+        "benchmark": name,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parameters": parameters,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if path == "-":
+        print(text)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
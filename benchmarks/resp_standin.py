@@ -0,0 +1,123 @@
+"""
+Local stand-in for a Redis server, for exercising the redis:// shared state backend
+
+Implements the commands RedisState uses (PING, AUTH, SELECT, GET, MGET, SET
+with EX/PX, DEL) in memory, with expiry. Not for production use.
+
+Run from the repository root:
+    python benchmarks/resp_standin.py --port 6390
+    SCRAPER_WORKERS=4 SCRAPER_SHARED_STATE=redis://127.0.0.1:6390/0 python server.py
+"""
+import asyncio
+import time
+
+
+class RespStandin:
+    """
+    Minimal asyncio server speaking the Redis protocol
+
+    Usage:
+        async with RespStandin() as standin:
+            ...  # standin.url is a redis:// URL
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.commands = 0
+        self._data: dict[bytes, tuple[bytes, float]] = {}
+        self._server: asyncio.AbstractServer | None = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    def _get(self, key: bytes) -> bytes | None:
+        found = self._data.get(key)
+        if found is None:
+            return None
+        value, expires = found
+        if expires and expires <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    @staticmethod
+    def _bulk(value: bytes | None) -> bytes:
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def execute(self, args: list[bytes]) -> bytes:
+        self.commands += 1
+        command = args[0].upper()
+        if command in (b"PING", b"AUTH", b"SELECT"):
+            return b"+OK\r\n" if command != b"PING" else b"+PONG\r\n"
+        if command == b"GET":
+            return self._bulk(self._get(args[1]))
+        if command == b"MGET":
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(self._bulk(self._get(key)) for key in args[1:])
+        if command == b"SET":
+            expires = 0.0
+            options = [arg.upper() for arg in args[3:]]
+            if b"PX" in options:
+                expires = time.time() + int(args[3 + options.index(b"PX") + 1]) / 1000
+            elif b"EX" in options:
+                expires = time.time() + int(args[3 + options.index(b"EX") + 1])
+            self._data[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = sum(1 for key in args[1:] if self._data.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command '%s'\r\n" % command
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.startswith(b"*"):
+                    writer.write(b"-ERR protocol error\r\n")
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self.execute(args))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "RespStandin":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the Redis stand-in in the foreground")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    async def main() -> None:
+        standin = RespStandin(port=args.port)
+        await standin.start()
+        print(f"Redis stand-in listening on {standin.url}")
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
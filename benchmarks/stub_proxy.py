@@ -0,0 +1,216 @@
+"""
+Local stub of the HTTP proxy / unlocker, used by the benchmarks
+
+The stub answers every proxied GET itself instead of forwarding it, so the
+benchmarks measure this server's own overhead without touching the network.
+"""
+import base64
+import asyncio
+import gzip
+import random
+import zlib
+from dataclasses import dataclass
+from email.utils import formatdate
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+
+@dataclass
+class StubSettings:
+    """Stub proxy behaviour"""
+    latency: float = 0.0  # Seconds to sleep before answering
+    error_rate: float = 0.0  # Fraction of requests answered with error_status
+    error_status: int = 503  # Status code used for injected errors
+    body_size: int = 20_000  # Approximate size of the returned HTML body in bytes
+    echo_auth: bool = False  # Prepend the proxy login the request authenticated with to the body
+    slow_rate: float = 0.0  # Fraction of requests delayed by slow_latency, simulating a latency tail
+    slow_latency: float = 2.0  # Extra seconds for slow requests
+    retry_after: str | None = None  # Retry-After header sent with injected errors
+    page: str | None = None  # Serve this benchmarks.corpus page instead of a generated body_size page
+    validators: bool = False  # Send ETag and Last-Modified, answer matching conditional requests with 304
+    change_rate: float = 0.0  # Fraction of requests for which the page gets a new revision before it is served
+    child_links: int = 0  # Links from every page to this many child pages below its path, an endless site to crawl
+    compress: bool = False  # Send bodies gzip or deflate coded when the request accepts it
+    render_delay: float = 0.0  # Extra seconds per X-Wait-Second the request asks for, the unlocker holding the page
+    app_prefix: str = ""  # Hosts starting with this serve an app shell unless the request asks for a render wait
+    charset: str = ""  # Encode bodies in this charset, declared only by a <meta> tag
+
+
+def make_html(body_size: int) -> str:
+    """Build a simple HTML page of roughly body_size bytes"""
+    paragraph = "<p>Lorem ipsum dolor sit amet, <a href=\"/item\">consectetur</a> adipiscing elit.</p>\n"
+    count = max(1, body_size // len(paragraph))
+    return "<html><head><title>stub</title></head><body>" + paragraph * count + "</body></html>"
+
+
+def corpus_page(name: str) -> str:
+    """A named page of the benchmark corpus"""
+    from benchmarks.corpus import corpus
+
+    pages = corpus()
+    if name not in pages:
+        raise ValueError(f"Unknown corpus page {name!r}, expected one of {', '.join(pages)}")
+    return pages[name]
+
+
+class StubProxy:
+    """
+    Minimal aiohttp server that behaves like the proxy for plain http:// targets
+
+    Usage:
+        async with StubProxy(StubSettings(latency=0.01)) as stub:
+            ...  # stub.url is the proxy URL
+    """
+
+    def __init__(self, settings: StubSettings | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings or StubSettings()
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.body_bytes = 0  # Body bytes sent after content coding, 304 answers send none
+        self.shells = 0  # App shells served
+        self._revisions: dict[str, int] = {}  # Revision of each requested URL
+        self._body = corpus_page(self.settings.page) if self.settings.page else make_html(self.settings.body_size)
+        self._runner: web.AppRunner | None = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.settings.latency:
+            await asyncio.sleep(self.settings.latency)
+        if self.settings.slow_rate and random.random() < self.settings.slow_rate:
+            await asyncio.sleep(self.settings.slow_latency)
+        if self.settings.error_rate and random.random() < self.settings.error_rate:
+            headers = {"Retry-After": self.settings.retry_after} if self.settings.retry_after else None
+            return web.Response(status=self.settings.error_status, text="stub error", headers=headers)
+        body = self._body
+        headers = None
+        if self.settings.validators or self.settings.change_rate:
+            revision = self._revisions.get(request.raw_path, 0)
+            if self.settings.change_rate and random.random() < self.settings.change_rate:
+                revision = self._revisions[request.raw_path] = revision + 1
+            if revision:
+                # One changed block per revision, the rest of the page stays the same
+                body = body.replace("</body>", f"<p>Revision {revision} of this page.</p></body>", 1)
+            if self.settings.validators:
+                headers = {
+                    "ETag": f'"r{revision}"',
+                    "Last-Modified": formatdate(1_700_000_000 + revision, usegmt=True),
+                }
+                if request.headers.get("If-None-Match") == headers["ETag"]:
+                    return web.Response(status=304, headers=headers)
+        if self.settings.child_links:
+            path = urlsplit(request.raw_path).path.rstrip("/")
+            children = "".join(f'<li><a href="{path}/{index}">Child {index}</a></li>' for index in range(self.settings.child_links))
+            body = body.replace("</body>", f"<ul>{children}</ul></body>", 1)
+        if self.settings.render_delay or self.settings.app_prefix:
+            wait = int(request.headers.get("X-Wait-Second") or 0)
+            if self.settings.render_delay and wait:
+                await asyncio.sleep(wait * self.settings.render_delay)
+            if self.settings.app_prefix and not wait and request.host.startswith(self.settings.app_prefix):
+                from benchmarks.corpus import shell_page
+
+                body = shell_page()
+                self.shells += 1
+        if self.settings.echo_auth:
+            body = f"<!-- proxy-login: {self._login(request)} -->" + body
+        charset = "utf-8"
+        if self.settings.charset:
+            charset = self.settings.charset
+            body = body.replace("<head>", f'<head><meta charset="{charset}">', 1)
+        data = body.encode(charset)
+        if self.settings.compress:
+            data, coding = self._encode(data, request.headers.get("Accept-Encoding", ""))
+            if coding:
+                headers = {**(headers or {}), "Content-Encoding": coding}
+        self.body_bytes += len(data)
+        response = web.Response(body=data, headers=headers)
+        # Without the charset parameter when the body declares it itself
+        response.content_type = "text/html"
+        if not self.settings.charset:
+            response.charset = charset
+        return response
+
+    @staticmethod
+    def _encode(data: bytes, accept_encoding: str) -> tuple[bytes, str]:
+        """Apply the first content coding of Accept-Encoding the stub supports"""
+        for coding in accept_encoding.replace(" ", "").split(","):
+            coding = coding.partition(";")[0].lower()
+            if coding == "gzip":
+                return gzip.compress(data, 6), coding
+            if coding == "deflate":
+                return zlib.compress(data, 6), coding
+        return data, ""
+
+    @staticmethod
+    def _login(request: web.Request) -> str:
+        header = request.headers.get("Proxy-Authorization", "")
+        if not header.startswith("Basic "):
+            return ""
+        return base64.b64decode(header[6:]).decode("utf-8").split(":", 1)[0]
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Resolve the real port when an ephemeral port was requested
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "StubProxy":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    parser = argparse.ArgumentParser(description="Run the stub proxy in the foreground")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--body-size", type=int, default=20_000)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--page", help="Serve a corpus page (small, article-0, links, spa-5mb, ...) instead of --body-size")
+    parser.add_argument("--validators", action="store_true", help="Send ETag/Last-Modified and answer 304 to matching conditional requests")
+    parser.add_argument("--change-rate", type=float, default=0.0, help="Fraction of requests that change the page")
+    parser.add_argument("--child-links", type=int, default=0, help="Links from every page to child pages below it")
+    parser.add_argument("--compress", action="store_true", help="Send gzip or deflate coded bodies when accepted")
+    parser.add_argument("--render-delay", type=float, default=0.0, help="Extra seconds per X-Wait-Second asked for")
+    parser.add_argument("--app-prefix", default="", help="Hosts starting with this serve an app shell without a render wait")
+    parser.add_argument("--charset", default="", help="Encode bodies in this charset, declared by a <meta> tag only")
+    args = parser.parse_args()
+
+    async def main() -> None:
+        settings = StubSettings(
+            args.latency, args.error_rate, args.error_status, args.body_size,
+            slow_rate=args.slow_rate, slow_latency=args.slow_latency, page=args.page,
+            validators=args.validators, change_rate=args.change_rate, child_links=args.child_links,
+            compress=args.compress, render_delay=args.render_delay, app_prefix=args.app_prefix, charset=args.charset,
+        )
+        stub = StubProxy(settings, port=args.port)
+        await stub.start()
+        print(f"Stub proxy listening on {stub.url}")
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+import re
+from dataclasses import dataclass
+
+from lxml import etree
+
+# Rough characters per token for English text, used to turn token budgets into character budgets
+CHARS_PER_TOKEN = 4
+# Appended when output was cut to fit the budget
+TRUNCATION_MARKER = "\n\n[... truncated]"
+
+# Elements that can hold the main content of a page
+CANDIDATE_TAGS = frozenset(("body", "main", "article", "section", "div"))
+# Headings are kept together with the block they introduce
+re_heading = re.compile(r"h\d$")
+# A child container becomes the main content when it keeps this share of its parent's score
+MAIN_SHARE = 0.7
+
+
+@dataclass(frozen=True)
+class OutputBudget:
+    """Limits applied while converting a page"""
+    max_chars: int = 0  # Maximum output size in characters, 0 means unlimited
+    main_content: bool = False  # Keep only the densest content block and drop boilerplate
+    profile: str = "default"  # Cleaning profile applied before Markdown conversion, see convert.CLEANING_PROFILES
+    link_scope: str = "all"  # Links kept in links output: "all", "internal" or "external"
+
+    @classmethod
+    def from_params(
+        cls, max_output: int = 0, unit: str = "chars", main_content: bool = False, profile: str = "default",
+        link_scope: str = "all",
+    ) -> "OutputBudget | None":
+        """Build a budget from tool parameters, None when nothing is limited"""
+        max_chars = max_output * CHARS_PER_TOKEN if unit == "tokens" else max_output
+        if not max_chars and not main_content and profile == "default" and link_scope == "all":
+            return None
+        return cls(max_chars=max_chars, main_content=main_content, profile=profile, link_scope=link_scope)
+
+    @property
+    def key(self) -> str:
+        """Cache key suffix distinguishing outputs produced under different budgets"""
+        return f"|{self.max_chars}|{int(self.main_content)}|{self.profile}|{self.link_scope}"
+
+
+@dataclass
+class _Stats:
+    text: int = 0  # Characters of text outside links
+    links: int = 0  # Characters of link text
+    tags: int = 1  # Elements in the subtree, including the element itself
+
+    @property
+    def score(self) -> float:
+        """Text weighted by how little of it is link text"""
+        total = self.text + self.links
+        return self.text * self.text / total if total else 0.0
+
+    @property
+    def density(self) -> float:
+        """Non-link text per element"""
+        return self.text / self.tags
+
+
+def block_stats(root) -> dict:
+    """
+    Text statistics of every element under root, computed in one bottom-up pass
+
+    Returns:
+        Mapping of element to _Stats
+    """
+    stats = {}
+    for _, el in etree.iterwalk(root, events=("end",)):
+        if not isinstance(el.tag, str):
+            continue
+        own = len((el.text or "").strip())
+        current = _Stats()
+        for child in el:
+            if isinstance(child.tag, str):
+                child_stats = stats[child]
+                current.text += child_stats.text
+                current.links += child_stats.links
+                current.tags += child_stats.tags
+            own += len((child.tail or "").strip())
+        if el.tag == "a":
+            current.links += current.text + own
+            current.text = 0
+        else:
+            current.text += own
+        stats[el] = current
+    return stats
+
+
+def main_content_root(root, stats: dict):
+    """
+    Find the smallest container that still holds most of the page's content
+
+    Starting at body, descend into the best scoring child container while it
+    keeps at least MAIN_SHARE of the current container's score.
+    """
+    body = root.find("body") if root.tag == "html" else None
+    current = body if body is not None else root
+    while True:
+        children = [child for child in current if child.tag in CANDIDATE_TAGS]
+        if not children:
+            return current
+        best = max(children, key=lambda child: stats[child].score)
+        if stats[best].score < MAIN_SHARE * stats[current].score:
+            return current
+        current = best
+
+
+def select_blocks(root, stats: dict, max_chars: int) -> None:
+    """
+    Drop the lowest density children of root until the rest fits max_chars
+
+    Blocks are ranked by text density and kept greedily while their text
+    fits the budget; a heading is kept when the block it introduces is.
+    The kept blocks stay in document order.
+    """
+    blocks = [child for child in root if isinstance(child.tag, str)]
+    sizes = {block: stats[block].text + stats[block].links for block in blocks}
+    if sum(sizes.values()) <= max_chars:
+        return
+    headings = [block for block in blocks if re_heading.match(block.tag)]
+    content = [block for block in blocks if not re_heading.match(block.tag)]
+    kept = set()
+    used = 0
+    for block in sorted(content, key=lambda block: stats[block].density, reverse=True):
+        # The densest block is always kept, the emitter cuts it when it alone exceeds the budget
+        if used + sizes[block] <= max_chars or not kept:
+            kept.add(block)
+            used += sizes[block]
+    for heading in headings:
+        following = heading.getnext()
+        if following in kept and used + sizes[heading] <= max_chars:
+            kept.add(heading)
+            used += sizes[heading]
+    for block in blocks:
+        if block not in kept:
+            block.drop_tree()
+
+
+def truncate(text: str, max_chars: int, separator: str = "\n\n") -> str:
+    """
+    Cut text to max_chars at the last separator that fits, marking the cut
+
+    Falls back to the last whitespace when no separator is found in the
+    second half of the allowed range.
+    """
+    if not max_chars or len(text) <= max_chars:
+        return text
+    limit = max(0, max_chars - len(TRUNCATION_MARKER))
+    cut = text.rfind(separator, 0, limit + 1)
+    if cut < limit // 2:
+        cut = max(text.rfind(" ", 0, limit + 1), text.rfind("\n", 0, limit + 1))
+    if cut <= 0:
+        cut = limit
+    return text[:cut].rstrip() + TRUNCATION_MARKER
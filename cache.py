@@ -0,0 +1,434 @@
+import os
+import time
+import asyncio
+import zlib
+import struct
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from logs import get_logger
+from shared import SharedState, SharedStateError, shared_state
+
+logger = get_logger("cache")
+
+
+@dataclass
+class CacheSettings:
+    """Response cache settings, read from environment variables by default"""
+    ttl: float = float(os.environ.get("SCRAPER_CACHE_TTL", 300))  # Entry lifetime in seconds, 0 disables the cache
+    max_bytes: int = int(os.environ.get("SCRAPER_CACHE_MAX_BYTES", 128 * 1024 * 1024))  # In-memory byte budget
+    disk_dir: str = os.environ.get("SCRAPER_CACHE_DIR", "")  # On-disk tier directory, empty disables it
+    shared_max_bytes: int = int(os.environ.get("SCRAPER_CACHE_SHARED_MAX_BYTES", 4 * 1024 * 1024))  # Largest page put in the shared state
+
+
+@dataclass
+class ConversionCacheSettings:
+    """Converted output cache settings, read from environment variables by default"""
+    ttl: float = float(os.environ.get("SCRAPER_CONVERT_CACHE_TTL", 600))  # Entry lifetime in seconds, 0 disables the cache
+    max_bytes: int = int(os.environ.get("SCRAPER_CONVERT_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # In-memory byte budget
+
+
+@dataclass
+class CacheStats:
+    """Cache counters"""
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    shared: int = 0  # Requests served by joining an in-flight fetch
+    remote_hits: int = 0  # Pages another worker put in the shared state
+    derived: int = 0  # Outputs stored from the parse done to convert another format
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        answered = self.hits + self.disk_hits + self.shared + self.remote_hits
+        total = answered + self.misses
+        return answered / total if total else 0.0
+
+
+@dataclass
+class _Entry:
+    value: object
+    size: int
+    expires: float
+
+
+class LRUStore:
+    """In-memory LRU of strings, or of objects of a given size, with per-entry TTL and a total byte budget"""
+
+    def __init__(self, max_bytes: int, stats: CacheStats):
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, key: str, value, ttl: float, size: int | None = None) -> None:
+        """Store value, whose size defaults to its length"""
+        if size is None:
+            size = len(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, size, time.monotonic() + ttl)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+
+class _Flight:
+    """A running call of SingleFlight and the number of callers awaiting it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls for the same key into one running call
+
+    The call runs as its own task, awaited by every caller through a shield,
+    so a caller that is cancelled (e.g. its client disconnected) leaves the
+    call running for the others. The call is cancelled only once no caller
+    awaits it any more.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, _Flight] = {}
+
+    def joinable(self, key: str) -> bool:
+        return key in self._inflight
+
+    def _done(self, key: str, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    async def run(self, key: str, func: Callable[[], Awaitable[str]]) -> str:
+        """
+        Await func() once per key, concurrent callers share its result or exception
+
+        Parameters:
+            key: Deduplication key
+            func: Coroutine function producing the value
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda task: self._done(key, flight))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Every caller went away, nobody needs the value
+                self._done(key, flight)
+                flight.task.cancel()
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 hex digest of a page body"""
+    return hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL for cache keys
+
+    Lower-cases scheme and host, drops default ports and the fragment, and
+    sorts query parameters so equivalent URLs share one entry.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    if parts.username or parts.password:
+        host = f"{parts.username or ''}:{parts.password or ''}@{host}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def cache_key(url: str, render: str) -> str:
+    """Hash of (normalized URL, render mode), safe to use as a filename"""
+    return hashlib.sha256(f"{render}\n{normalize_url(url)}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of fetched HTML keyed by (normalized URL, render mode)
+
+    The memory tier is an LRU bounded by a byte budget; the optional disk
+    tier stores one file per key and uses the file mtime for expiry. With a
+    shared state backend, pages up to shared_max_bytes are also stored
+    compressed there, so a page fetched by one worker serves the others.
+    Concurrent requests for the same key share a single upstream fetch.
+    """
+
+    def __init__(self, settings: CacheSettings | None = None, shared: SharedState | None = None):
+        self.settings = settings or CacheSettings()
+        self.stats = CacheStats()
+        self.shared = shared
+        self._memory = LRUStore(self.settings.max_bytes, self.stats)
+        self._flights = SingleFlight()
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.ttl > 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._memory.size_bytes
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.settings.disk_dir, key[:2], f"{key}.html")
+
+    def _read_disk(self, key: str) -> tuple[str, float] | None:
+        path = self._disk_path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age >= self.settings.ttl:
+                os.remove(path)
+                self.stats.expirations += 1
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read(), self.settings.ttl - age
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, value: str) -> None:
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file and rename so readers never see partial content
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to write disk cache entry", extra={"error": str(e)})
+
+    def _read_shared(self, key: str) -> tuple[str, float] | None:
+        try:
+            data = self.shared.get("response", key)
+        except SharedStateError as e:
+            logger.warning("Failed to read shared cache entry", extra={"error": str(e)})
+            return None
+        if data is None:
+            return None
+        # Expiry time, then the compressed page
+        (expires,) = struct.unpack("!d", data[:8])
+        remaining = expires - time.time()
+        if remaining <= 0:
+            return None
+        return zlib.decompress(data[8:]).decode("utf-8"), remaining
+
+    def _write_shared(self, key: str, value: str) -> None:
+        data = struct.pack("!d", time.time() + self.settings.ttl) + zlib.compress(value.encode("utf-8"), 1)
+        try:
+            self.shared.set("response", key, data, self.settings.ttl)
+        except SharedStateError as e:
+            logger.warning("Failed to write shared cache entry", extra={"error": str(e)})
+
+    async def get(self, url: str, render: str = "") -> str | None:
+        """Return a cached page from memory, the shared state or disk, or None"""
+        if not self.enabled:
+            return None
+        key = cache_key(url, render)
+        value = self._memory.get(key)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+        if self.shared is not None:
+            found = await asyncio.to_thread(self._read_shared, key)
+            if found is not None:
+                value, remaining = found
+                self._memory.put(key, value, remaining)
+                self.stats.remote_hits += 1
+                return value
+        if self.settings.disk_dir:
+            found = await asyncio.to_thread(self._read_disk, key)
+            if found is not None:
+                value, remaining = found
+                self._memory.put(key, value, remaining)
+                self.stats.disk_hits += 1
+                return value
+        return None
+
+    async def put(self, url: str, render: str, value: str) -> None:
+        """Store a page in both tiers"""
+        if not self.enabled or not value:
+            return
+        key = cache_key(url, render)
+        self._memory.put(key, value, self.settings.ttl)
+        if self.shared is not None and len(value) <= self.settings.shared_max_bytes:
+            await asyncio.to_thread(self._write_shared, key, value)
+        if self.settings.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, value)
+
+    async def get_or_fetch(self, url: str, render: str, fetch: Callable[[], Awaitable[str]]) -> str:
+        """
+        Return the cached page, or fetch it once for all concurrent callers
+
+        Parameters:
+            url: Page URL
+            render: Render mode selector, part of the cache key
+            fetch: Coroutine function performing the upstream fetch
+
+        Returns:
+            Page content; empty results are returned but never cached
+        """
+        if not self.enabled:
+            return await fetch()
+        value = await self.get(url, render)
+        if value is not None:
+            return value
+
+        key = cache_key(url, render)
+        if self._flights.joinable(key):
+            # Another request is already fetching this page, wait for its result
+            self.stats.shared += 1
+        else:
+            self.stats.misses += 1
+
+        async def fetch_and_store() -> str:
+            value = await fetch()
+            await self.put(url, render, value)
+            return value
+
+        return await self._flights.run(key, fetch_and_store)
+
+    def clear(self) -> None:
+        """Drop every in-memory entry"""
+        self._memory.clear()
+
+
+class ConversionCache:
+    """
+    Cache of converted output keyed by (content hash, output_format)
+
+    Sits behind the response cache: the same page body is converted to a
+    given format once, whichever agent asked for it first, and later
+    requests for that format reuse the result. Concurrent conversions of the
+    same body and format are deduplicated. Outputs derived while converting
+    another format (the links collected from the tree parsed for Markdown)
+    are stored with put, so the other format costs no parse of its own.
+    """
+
+    def __init__(self, settings: ConversionCacheSettings | None = None):
+        self.settings = settings or ConversionCacheSettings()
+        self.stats = CacheStats()
+        self._memory = LRUStore(self.settings.max_bytes, self.stats)
+        self._flights = SingleFlight()
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.ttl > 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._memory.size_bytes
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    async def get_or_convert(
+        self, content: str, output_format: str, convert: Callable[[], Awaitable[str]], variant: str = "",
+        digest: str | None = None,
+    ) -> str:
+        """
+        Return the cached conversion of content, or run convert once for all concurrent callers
+
+        Parameters:
+            content: Page body the conversion is derived from
+            output_format: Output format, part of the cache key
+            convert: Coroutine function performing the conversion
+            variant: Extra cache key part for conversion options, such as an output budget
+            digest: content_hash(content) when the caller already computed it
+
+        Returns:
+            Converted content; empty results are returned but never cached
+        """
+        if not self.enabled or (output_format == "html" and not variant):
+            return await convert()
+        key = self._key(content, output_format, variant, digest)
+        value = self._memory.get(key)
+        if value is not None:
+            self.stats.hits += 1
+            return value
+        if self._flights.joinable(key):
+            self.stats.shared += 1
+        else:
+            self.stats.misses += 1
+
+        async def convert_and_store() -> str:
+            value = await convert()
+            if value:
+                self._memory.put(key, value, self.settings.ttl)
+            return value
+
+        return await self._flights.run(key, convert_and_store)
+
+    @staticmethod
+    def _key(content: str, output_format: str, variant: str = "", digest: str | None = None) -> str:
+        return f"{output_format}{variant}:{digest or content_hash(content)}"
+
+    def contains(self, content: str, output_format: str, variant: str = "", digest: str | None = None) -> bool:
+        """Whether a live conversion of content to output_format is cached, without counting a lookup"""
+        return self.enabled and self._memory.get(self._key(content, output_format, variant, digest)) is not None
+
+    def put(self, content: str, output_format: str, value: str, variant: str = "", digest: str | None = None) -> None:
+        """Store a conversion of content produced as a by-product of another one"""
+        if not self.enabled or not value:
+            return
+        self._memory.put(self._key(content, output_format, variant, digest), value, self.settings.ttl)
+        self.stats.derived += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._memory.clear()
+
+
+# Shared response cache instance for the whole process
+response_cache = ResponseCache(shared=shared_state)
+
+# Shared converted output cache instance for the whole process
+conversion_cache = ConversionCache()
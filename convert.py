@@ -0,0 +1,247 @@
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from lxml import etree
+from lxml.html import defs, fromstring, tostring
+
+import metrics
+from links import LINK_FORMATS, LinkCollector
+
+if TYPE_CHECKING:
+    from lxml.html.clean import Cleaner
+
+# Elements removed with their content by the default cleaning
+KILL_TAGS = frozenset(("nav", "svg", "footer", "noscript", "script", "form"))
+# Attributes kept by cleaning, idx marks elements for selectors
+SAFE_ATTRS = frozenset(defs.safe_attrs) | {"idx"}
+
+
+@dataclass(frozen=True)
+class CleaningProfile:
+    """Which parts of a page survive cleaning"""
+    kill_tags: frozenset  # Elements removed together with their content
+    boilerplate: bool = False  # Also remove hidden elements and elements whose class or id names boilerplate
+    article_only: bool = False  # Keep only the page's main or article element when it has one
+
+
+CLEANING_PROFILES = {
+    "default": CleaningProfile(KILL_TAGS),
+    # Text only: page chrome, widgets and media go as well
+    "aggressive": CleaningProfile(
+        KILL_TAGS | {"header", "aside", "iframe", "button", "input", "select", "textarea", "dialog", "template",
+                     "img", "picture", "video", "audio", "canvas"},
+        boilerplate=True,
+    ),
+    "article-only": CleaningProfile(KILL_TAGS, article_only=True),
+    "keep-forms": CleaningProfile(KILL_TAGS - {"form"}),
+}
+
+# Class or id words marking footers and hidden elements, which strip_tree removes; overflow-hidden is layout
+re_footer_hidden = re.compile(r"(?:^|[\s_-])(?<!overflow-)(?<!overflow-x-)(?<!overflow-y-)(?:footer|hidden)(?:$|[\s_-])")
+# Class and id words that mark boilerplate for the aggressive profile
+re_boilerplate = re.compile(
+    r"(?:^|[\s_-])(?:nav|navbar|menu|sidebar|banner|cookies?|consent|ads?|advert|advertisement|promo|share|social"
+    r"|related|comments?|breadcrumbs?|popup|modal|newsletter|subscribe)(?:$|[\s_-])",
+    re.IGNORECASE,
+)
+# Elements that mean something even when empty, kept by strip_tree
+KEEP_EMPTY = frozenset(("br", "hr", "td", "th"))
+re_spaces = re.compile(r"\s{2,}")
+xpath_hidden = etree.XPath("descendant::*[@hidden or @aria-hidden='true']")
+xpath_main = etree.XPath("descendant-or-self::*[self::main or @role='main'][1]")
+xpath_article = etree.XPath("descendant-or-self::article[1]")
+
+
+def build_cleaner(profile: CleaningProfile = CLEANING_PROFILES["default"]) -> "Cleaner":
+    """Build the lxml Cleaner for a cleaning profile"""
+    # Loaded with the first Cleaner (or by warm_up) rather than at import
+    from lxml.html.clean import Cleaner
+
+    return Cleaner(
+        scripts=True,
+        kill_tags=profile.kill_tags,
+        style=True,
+        remove_tags=[],
+        safe_attrs=SAFE_ATTRS,
+        inline_style=True,
+        links=True,
+        meta=False,
+        embedded=True,
+        frames=False,
+        forms=False,
+        annoying_tags=False,
+        page_structure=False,
+        javascript=True,
+        comments=True,
+    )
+
+
+# Cleaners are built on first use and configured once; calling one does not modify it, so they are shared by all threads
+_cleaners: dict[str, "Cleaner"] = {}
+
+
+def get_cleaner(profile: str = "default") -> "Cleaner":
+    """Shared Cleaner of a cleaning profile"""
+    cleaner = _cleaners.get(profile)
+    if cleaner is None:
+        # Threads racing on the first use build the same cleaner, all of them get the one stored first
+        cleaner = _cleaners.setdefault(profile, build_cleaner(CLEANING_PROFILES[profile]))
+    return cleaner
+
+
+def clean_tree(tree, profile: str = "default"):
+    """
+    Clean a parsed HTML tree in place with a cleaning profile
+
+    Parameters:
+        tree: Parsed lxml HTML element
+        profile: Name of a CLEANING_PROFILES entry
+
+    Returns:
+        The cleaned root: tree itself, or for the article-only profile the page's
+        main or article element when it has one
+    """
+    settings = CLEANING_PROFILES[profile]
+    # Both steps look at attributes and tags that cleaning removes, so they run first
+    if settings.boilerplate:
+        # Collected first, since removing while walking the tree would skip elements
+        doomed = xpath_hidden(tree)
+        for el in tree.iterdescendants(etree.Element):
+            if re_boilerplate.search(el.get("class", "")) or re_boilerplate.search(el.get("id", "")):
+                doomed.append(el)
+        for el in doomed:
+            # Elements inside an already removed subtree are gone with it
+            if el.getparent() is not None:
+                el.drop_tree()
+    root = tree
+    if settings.article_only:
+        roots = xpath_main(tree) or xpath_article(tree)
+        if roots:
+            root = roots[0]
+    # A root the cleaner would unwrap (e.g. main) is renamed to div instead
+    get_cleaner(profile)(root)
+    return root
+
+
+def is_footer_or_hidden(el) -> bool:
+    """Whether an element's class or id marks it as a footer or hidden"""
+    return bool(re_footer_hidden.search(el.get("class", "")) or re_footer_hidden.search(el.get("id", "")))
+
+
+def strip_tree(root) -> None:
+    """
+    Simplify a cleaned tree in place, in one walk over its elements
+
+    Removes style attributes, footer and hidden elements and empty elements,
+    and collapses whitespace runs in text outside pre blocks to one space.
+    Children are visited before their parents, so an element emptied by
+    removing its children is removed as well. The element list is built
+    before anything is removed, so removing never disturbs the walk.
+    """
+    elements = list(root.iter(etree.Element))
+    preformatted = {el for pre in root.iter("pre") for el in pre.iterdescendants()}
+    for el in reversed(elements):
+        el.attrib.pop("style", None)
+        if el is not root:
+            attrib = el.attrib
+            if attrib and is_footer_or_hidden(el):
+                el.drop_tree()
+                continue
+            if (
+                (not attrib or (len(attrib) == 1 and "idx" in attrib))  # Only an idx attribute, if any
+                and el.tag not in KEEP_EMPTY
+                and not len(el)
+                and (not el.text or not el.text.strip())
+                and (not el.tail or not el.tail.strip())
+            ):
+                el.drop_tree()
+                continue
+        if el in preformatted:
+            continue
+        # Text merged in by removed children is collapsed here, since they were visited first
+        if el.text and el.tag != "pre":
+            el.text = re_spaces.sub(" ", el.text)
+        if el.tail:
+            el.tail = re_spaces.sub(" ", el.tail)
+
+
+def clean_html(html: str, profile: str = "default") -> str:
+    """Clean HTML string"""
+    return tostring(clean_tree(fromstring(html), profile), encoding="unicode")
+
+
+def strip_html(thor_mcp_html: str, profile: str = "default") -> str:
+    """Simplify HTML string, remove unnecessary elements, attributes and redundant content"""
+    thor_mcp_root = clean_tree(fromstring(thor_mcp_html), profile)
+    strip_tree(thor_mcp_root)
+    return tostring(thor_mcp_root, encoding="unicode")
+
+
+def extract_links_with_text(thor_mcp_html: str, thor_mcp_base_url: str | None = None) -> list[str]:
+    """
+    Extract links with display text from HTML
+    
+    Parameters:
+        thor_mcp_html (str): Input HTML string
+        thor_mcp_base_url (str | None): Page URL that relative URLs are resolved against, together with <base href>
+                            If None, relative URLs remain relative unless the page has a <base href>
+    
+    Returns:
+        list[str]: List of unique links in format [display text] URL
+    """
+    # Use lxml's fromstring function to parse HTML string into XML tree structure
+    thor_mcp_html_tree = fromstring(thor_mcp_html)
+    return extract_links_from_tree(thor_mcp_html_tree, thor_mcp_base_url)
+
+
+def extract_links_from_tree(thor_mcp_html_tree, thor_mcp_base_url: str | None = None, max_chars: int = 0) -> list[str]:
+    """
+    Extract links with display text from an already parsed HTML tree
+
+    Parameters:
+        thor_mcp_html_tree: Parsed lxml HTML element, links and <base href> are read from its subtree
+        thor_mcp_base_url (str | None): Page URL that relative URLs are resolved against
+        max_chars (int): Stop once the joined links reach this many characters, 0 means no limit
+
+    Returns:
+        list[str]: List of unique links in format [display text] URL, see links.LinkCollector
+    """
+    thor_mcp_collector = LinkCollector("links", thor_mcp_base_url or "", max_chars=max_chars)
+    thor_mcp_collector.add_tree(thor_mcp_html_tree)
+    return [f"[{text}] {url}" for url, text, _ in thor_mcp_collector.links]
+
+
+def get_content(
+    thor_mcp_content: str, thor_mcp_output_format: str, profile: str = "default", url: str = "", link_scope: str = "all",
+) -> str:
+    """
+    Extract content from response and convert to appropriate format
+    
+    Parameters:
+        thor_mcp_content: Response content string
+        thor_mcp_output_format: Output format ("html", "links", "links-json", or other formats converted to markdown) 
+        profile: Cleaning profile applied before Markdown conversion
+        url: Page URL that links are resolved against
+        link_scope: Links kept in links formats: "all", "internal" or "external"
+    
+    Returns:
+        Formatted content string
+    """
+    
+    if thor_mcp_output_format == "html": 
+        return thor_mcp_content
+    if thor_mcp_output_format in LINK_FORMATS:
+        with metrics.stage_seconds.time(stage="links", format=thor_mcp_output_format):
+            thor_mcp_collector = LinkCollector(thor_mcp_output_format, url, link_scope)
+            thor_mcp_collector.add_tree(fromstring(thor_mcp_content))
+        return thor_mcp_collector.render()
+    
+    with metrics.stage_seconds.time(stage="strip", format=thor_mcp_output_format):
+        thor_mcp_stripped_html = strip_html(thor_mcp_content, profile)  # Simplify HTML content
+    # Only this legacy pipeline needs markdownify and BeautifulSoup, load them on its first use
+    from markdownify import markdownify
+
+    with metrics.stage_seconds.time(stage="markdown", format=thor_mcp_output_format):
+        return markdownify(thor_mcp_stripped_html) 
+    # For other formats, return original content string
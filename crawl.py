@@ -0,0 +1,237 @@
+import os
+import re
+import math
+import time
+import asyncio
+import fnmatch
+import hashlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from urllib.parse import urlsplit
+
+from batch import host_of
+from links import normalize_url
+
+
+@dataclass
+class CrawlSettings:
+    """Site crawl settings, read from environment variables by default"""
+    concurrency: int = int(os.environ.get("SCRAPER_CRAWL_CONCURRENCY", 8))  # Default number of pages fetched at once
+    per_host: int = int(os.environ.get("SCRAPER_CRAWL_PER_HOST", 4))  # Maximum concurrent requests to the same host
+    host_delay: float = float(os.environ.get("SCRAPER_CRAWL_HOST_DELAY", 0.1))  # Minimum seconds between request starts on the same host
+    max_pages: int = int(os.environ.get("SCRAPER_CRAWL_MAX_PAGES", 500))  # Largest page budget a crawl may ask for
+    bloom_after: int = int(os.environ.get("SCRAPER_CRAWL_BLOOM_AFTER", 10000))  # Page budgets above this track seen URLs in a Bloom filter
+    bloom_error_rate: float = 0.001  # False positive rate of the Bloom filter at its capacity
+    links_per_page: int = 50  # Expected new links per page, sizes the Bloom filter
+
+
+@dataclass
+class CrawlStats:
+    """Crawl counters"""
+    crawls: int = 0
+    pages: int = 0  # Pages fetched, successfully or not
+    failed: int = 0
+    duplicates: int = 0  # Links skipped because their URL was already seen
+    filtered: int = 0  # Links skipped by include/exclude patterns or file type
+
+
+# Links to files that are not HTML pages are never fetched
+SKIP_EXTENSIONS = frozenset((
+    "7z", "avi", "bmp", "css", "csv", "dmg", "doc", "docx", "exe", "gif", "gz", "ico", "jpeg", "jpg", "js",
+    "json", "mov", "mp3", "mp4", "pdf", "png", "ppt", "pptx", "rar", "svg", "tar", "tgz", "wav", "webm",
+    "webp", "woff", "woff2", "xls", "xlsx", "xml", "zip",
+))
+
+
+class BloomFilter:
+    """
+    Fixed-size set of strings with no false negatives and a bounded false positive rate
+
+    Sized for capacity items at error_rate; uses the bits of one BLAKE2b
+    digest per item with double hashing, so a million URLs take about
+    1.8 MB at 0.1% instead of tens of MB in a set.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _positions(self, item: str) -> list[int]:
+        value = int.from_bytes(hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=16).digest(), "little")
+        first, second, size = value & 0xFFFFFFFFFFFFFFFF, (value >> 64) | 1, self.size
+        return [(first + index * second) % size for index in range(self.hashes)]
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, item: str) -> None:
+        bits = self._bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+
+def compile_patterns(patterns: list[str] | None) -> re.Pattern | None:
+    """
+    One regular expression matching any of the URL glob patterns
+
+    Patterns use shell wildcards (* ? [...]) and are matched against the
+    whole URL, e.g. "*/blog/*" or "https://docs.example.com/*".
+
+    Returns:
+        The compiled expression, None when there are no patterns
+    """
+    patterns = [pattern.strip() for pattern in patterns or () if pattern.strip()]
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns))
+
+
+def is_page_url(url: str) -> bool:
+    """Whether an absolute URL is an http(s) URL that is not a known non-HTML file type"""
+    if url.partition("://")[0] not in ("http", "https"):
+        return False
+    path = urlsplit(url).path
+    name = path.rpartition("/")[2]
+    return "." not in name or name.rpartition(".")[2].lower() not in SKIP_EXTENSIONS
+
+
+class Crawler:
+    """
+    Breadth-first crawl from a seed URL within a depth and page budget
+
+    URLs wait in an asyncio queue and are fetched by a fixed set of worker
+    tasks. Each host gets at most per_host requests at once and request
+    starts on the same host are spaced by host_delay. The links of pages
+    less than max_depth links away from the seed are queued when their URL
+    was not seen before and passes the include and exclude patterns; once
+    max_pages URLs were queued no more are, so the queue never outgrows the
+    budget. Seen URLs are kept in a set, or in a BloomFilter for page
+    budgets above bloom_after (a false positive then skips a page that was
+    never crawled).
+
+    Usage:
+        crawler = Crawler(process, max_depth=2, max_pages=50)
+        await crawler.run("https://example.com/")
+    """
+
+    def __init__(
+        self,
+        process: Callable[[str, int], Awaitable[list[str] | None]],
+        max_depth: int = 2,
+        max_pages: int = 50,
+        include: list[str] | None = None,
+        exclude: list[str] | None = None,
+        concurrency: int | None = None,
+        settings: CrawlSettings | None = None,
+        stats: CrawlStats | None = None,
+    ):
+        """
+        Parameters:
+            process: Coroutine function called with each page URL and its depth, returns the page's
+                absolute links, or None when the page failed
+            max_depth: Links followed from the seed, 0 crawls the seed only
+            max_pages: Pages fetched at most, the seed included
+            include: URL glob patterns, when given a link must match one of them
+            exclude: URL glob patterns, a link matching one of them is skipped
+            concurrency: Pages fetched at once, defaults to settings.concurrency
+        """
+        self.settings = settings or crawl_settings
+        self.stats = stats if stats is not None else crawl_stats
+        self.process = process
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = max(1, concurrency or self.settings.concurrency)
+        self.include = compile_patterns(include)
+        self.exclude = compile_patterns(exclude)
+        if max_pages > self.settings.bloom_after:
+            self.seen = BloomFilter(max_pages * self.settings.links_per_page, self.settings.bloom_error_rate)
+        else:
+            self.seen = set()
+        self.queued = 0
+        self._queue: asyncio.Queue[tuple[str, int]] = asyncio.Queue()
+        self._host_slots: dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(max(1, self.settings.per_host)))
+        self._host_next: dict[str, float] = {}
+
+    def allowed(self, url: str) -> bool:
+        """Whether a link passes the file type check and the include and exclude patterns"""
+        if not is_page_url(url):
+            return False
+        if self.include is not None and not self.include.match(url):
+            return False
+        return self.exclude is None or not self.exclude.match(url)
+
+    def add(self, url: str, depth: int) -> bool:
+        """Queue a URL at depth unless it was seen, is filtered out or the budget is used up"""
+        if self.queued >= self.max_pages:
+            return False
+        url = normalize_url(url)
+        if url in self.seen:
+            self.stats.duplicates += 1
+            return False
+        self.seen.add(url)
+        if depth and not self.allowed(url):
+            # The seed is always crawled
+            self.stats.filtered += 1
+            return False
+        self.queued += 1
+        self._queue.put_nowait((url, depth))
+        return True
+
+    async def _polite(self, host: str) -> None:
+        """Wait until the next request start on host is due"""
+        now = time.monotonic()
+        start = max(now, self._host_next.get(host, now))
+        self._host_next[host] = start + self.settings.host_delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _worker(self) -> None:
+        while True:
+            url, depth = await self._queue.get()
+            try:
+                host = host_of(url)
+                async with self._host_slots[host]:
+                    await self._polite(host)
+                    self.stats.pages += 1
+                    links = await self.process(url, depth)
+                if links is None:
+                    self.stats.failed += 1
+                elif depth < self.max_depth:
+                    for link in links:
+                        if self.queued >= self.max_pages:
+                            break
+                        self.add(link, depth + 1)
+            except Exception:
+                # One page never stops the crawl
+                self.stats.failed += 1
+            finally:
+                self._queue.task_done()
+
+    async def run(self, seed: str) -> None:
+        """Crawl from seed until the queue is drained"""
+        self.stats.crawls += 1
+        self.add(seed, 0)
+        workers = [asyncio.create_task(self._worker()) for _ in range(min(self.concurrency, self.max_pages))]
+        try:
+            await self._queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+# Settings and counters shared by every crawl of the process
+crawl_settings = CrawlSettings()
+crawl_stats = CrawlStats()
@@ -0,0 +1,573 @@
+import os
+import re
+from lxml.html import fromstring, tostring
+
+import convert
+import metrics
+from budget import OutputBudget, block_stats, main_content_root, select_blocks, truncate
+from convert import clean_tree, strip_tree
+from links import LINK_FORMATS, LinkCollector
+
+# Conversion engine: "tree" parses once and emits Markdown from lxml, "legacy" uses the markdownify pipeline
+CONVERT_ENGINE = os.environ.get("SCRAPER_CONVERT_ENGINE", "tree")
+
+
+# Whitespace handling, mirrors markdownify so both pipelines produce the same Markdown
+re_whitespace = re.compile(r"[\t ]+")
+re_all_whitespace = re.compile(r"[\t \r\n]+")
+re_newline_whitespace = re.compile(r"[\t \r\n]*[\r\n][\t \r\n]*")
+re_line_with_content = re.compile(r"^(.*)", flags=re.MULTILINE)
+re_extract_newlines = re.compile(r"^(\n*)((?:.*[^\n])?)(\n*)$", flags=re.DOTALL)
+re_html_heading = re.compile(r"h(\d+)")
+re_backtick_runs = re.compile(r"`+")
+re_pre_lstrip = re.compile(r"^[ \n]*\n")
+re_pre_rstrip = re.compile(r"[ \n]*$")
+
+# Elements whose inner leading/trailing whitespace is dropped
+BLOCK_TAGS = frozenset((
+    "p", "blockquote", "article", "div", "section", "ol", "ul", "li",
+    "dl", "dt", "dd", "table", "thead", "tbody", "tfoot", "tr", "td", "th",
+))
+NOFORMAT_TAGS = frozenset(("pre", "code", "kbd", "samp"))
+BULLETS = "*+-"
+
+# Marker for comment and processing-instruction nodes, which count as siblings but render nothing
+_SKIP = object()
+
+
+def _tag(node) -> str | None:
+    """Tag name of an element node, None for text and comment nodes"""
+    if isinstance(node, str) or node is None or node is _SKIP:
+        return None
+    return node.tag
+
+
+def _remove_inside(name: str | None) -> bool:
+    if not name:
+        return False
+    return name in BLOCK_TAGS or re_html_heading.match(name) is not None
+
+
+def _remove_outside(name: str | None) -> bool:
+    return name == "pre" or _remove_inside(name)
+
+
+def _child_nodes(el) -> list:
+    """Children of an element as a flat node list: text strings, elements and _SKIP markers"""
+    nodes = []
+    if el.text:
+        nodes.append(el.text)
+    for child in el:
+        nodes.append(child if isinstance(child.tag, str) else _SKIP)
+        if child.tail:
+            nodes.append(child.tail)
+    return nodes
+
+
+def _chomp(text: str) -> tuple[str, str, str]:
+    prefix = " " if text and text[0] == " " else ""
+    suffix = " " if text and text[-1] == " " else ""
+    return prefix, suffix, text.strip()
+
+
+def _colspan(el) -> int:
+    colspan = el.get("colspan")
+    if colspan is not None and colspan.isdigit():
+        return max(1, min(1000, int(colspan)))
+    return 1
+
+
+def _preceding_element(el):
+    """First preceding sibling element, skipping comments"""
+    for sibling in el.itersiblings(preceding=True):
+        if isinstance(sibling.tag, str):
+            return sibling
+    return None
+
+
+def _next_block_content_name(el) -> str | None:
+    """
+    Tag name of the next content sibling of el ("" for text), None when there is none
+
+    Whitespace-only text and comments are not content.
+    """
+    if el.tail and el.tail.strip():
+        return ""
+    for sibling in el.itersiblings():
+        if isinstance(sibling.tag, str):
+            return sibling.tag
+        if sibling.tail and sibling.tail.strip():
+            return ""
+    return None
+
+
+class Collector:
+    """Joins child Markdown strings, collapsing newlines at child boundaries to at most two"""
+
+    def __init__(self, in_pre: bool = False):
+        self.in_pre = in_pre
+        self.parts = [""]
+
+    def add(self, string: str) -> None:
+        if not string:
+            return
+        if self.in_pre:
+            self.parts.append(string)
+            return
+        leading, content, trailing = re_extract_newlines.match(string).groups()
+        if self.parts[-1] and leading:
+            previous = self.parts.pop()
+            leading = "\n" * min(2, max(len(previous), len(leading)))
+        self.parts.extend((leading, content, trailing))
+
+    def result(self) -> str:
+        return "".join(self.parts)
+
+
+class MarkdownEmitter:
+    """
+    Converts an lxml HTML tree to Markdown directly, without re-parsing
+
+    The rules follow markdownify's defaults (underlined h1/h2, "*+-" bullets,
+    escaped asterisks and underscores) so the output matches the previous
+    BeautifulSoup-based conversion.
+
+    When limit is set, emission stops once that many characters of text have
+    been rendered; the rest of the tree is never visited.
+    """
+
+    def __init__(self, limit: int = 0):
+        self.limit = limit  # Characters of text to render before stopping, 0 means unlimited
+        self.used = 0
+
+    def convert(self, root) -> str:
+        """Convert a parsed document or fragment root to Markdown"""
+        text = self._collapse([self._process_tag(root, frozenset(("[document]",)))], False)
+        return text.strip("\n")
+
+    def _process_tag(self, el, parent_tags: frozenset) -> str:
+        name = el.tag
+        if name in ("script", "style"):
+            return ""
+        nodes = _child_nodes(el)
+        inside = _remove_inside(name)
+        last = len(nodes) - 1
+        child_tags = self.child_tags(name, parent_tags)
+
+        collector = Collector("pre" in child_tags)
+        for index, node in enumerate(nodes):
+            if node is _SKIP:
+                continue
+            if self.limit and self.used >= self.limit:
+                break
+            if isinstance(node, str):
+                previous_name = _tag(nodes[index - 1]) if index > 0 else None
+                next_name = _tag(nodes[index + 1]) if index < last else None
+                collector.add(self.render_text(node, child_tags, inside, index == 0, index == last, previous_name, next_name))
+            else:
+                collector.add(self._process_tag(node, child_tags))
+        return self.finish(el, collector.result(), parent_tags)
+
+    @staticmethod
+    def child_tags(name: str, parent_tags: frozenset) -> frozenset:
+        """Parent context passed to the children of an element"""
+        child_tags = parent_tags | {name}
+        if re_html_heading.match(name) is not None or name in ("td", "th"):
+            child_tags = child_tags | {"_inline"}
+        if name in NOFORMAT_TAGS:
+            child_tags = child_tags | {"_noformat"}
+        return child_tags
+
+    def finish(self, el, text: str, parent_tags: frozenset) -> str:
+        """Apply the element's own conversion to the joined Markdown of its children"""
+        name = el.tag
+        convert = getattr(self, "convert_" + name, None) if name.isidentifier() else None
+        if convert is not None:
+            return convert(el, text, parent_tags)
+        match = re_html_heading.match(name)
+        if match:
+            return self.convert_hN(int(match.group(1)), text, parent_tags)
+        return text
+
+    def render_text(self, text, parent_tags, parent_inside, is_first, is_last, previous_name, next_name) -> str:
+        """Convert a text node given its position among its siblings"""
+        if text.strip() == "":
+            # Ignore whitespace-only text next to block boundaries
+            if parent_inside and (is_first or is_last):
+                return ""
+            if _remove_outside(previous_name) or _remove_outside(next_name):
+                return ""
+        text = self._process_text(text, parent_tags, parent_inside, is_first, is_last, previous_name, next_name)
+        if self.limit:
+            self.used += len(text)
+        return text
+
+    @staticmethod
+    def _collapse(strings: list[str], in_pre: bool) -> str:
+        """Join child strings, collapsing newlines at child boundaries to at most two"""
+        collector = Collector(in_pre)
+        for string in strings:
+            collector.add(string)
+        return collector.result()
+
+    @staticmethod
+    def _process_text(text, parent_tags, parent_inside, is_first, is_last, previous_name, next_name) -> str:
+        if "pre" not in parent_tags:
+            text = re_newline_whitespace.sub("\n", text)
+            text = re_whitespace.sub(" ", text)
+        if "_noformat" not in parent_tags and text:
+            text = text.replace("*", r"\*").replace("_", r"\_")
+        if _remove_outside(previous_name) or (parent_inside and is_first):
+            text = text.lstrip(" \t\r\n")
+        if _remove_outside(next_name) or (parent_inside and is_last):
+            text = text.rstrip()
+        return text
+
+    # Inline elements
+
+    @staticmethod
+    def _inline(markup: str, text: str, parent_tags) -> str:
+        if "_noformat" in parent_tags:
+            return text
+        prefix, suffix, text = _chomp(text)
+        if not text:
+            return ""
+        return f"{prefix}{markup}{text}{markup}{suffix}"
+
+    def convert_b(self, el, text, parent_tags):
+        return self._inline("**", text, parent_tags)
+
+    convert_strong = convert_b
+
+    def convert_em(self, el, text, parent_tags):
+        return self._inline("*", text, parent_tags)
+
+    convert_i = convert_em
+
+    def convert_del(self, el, text, parent_tags):
+        return self._inline("~~", text, parent_tags)
+
+    convert_s = convert_del
+
+    def convert_sub(self, el, text, parent_tags):
+        return self._inline("", text, parent_tags)
+
+    convert_sup = convert_sub
+
+    def convert_a(self, el, text, parent_tags):
+        if "_noformat" in parent_tags:
+            return text
+        prefix, suffix, text = _chomp(text)
+        if not text:
+            return ""
+        href = el.get("href")
+        title = el.get("title")
+        if text.replace(r"\_", "_") == href and not title:
+            return f"<{href}>"
+        title_part = ' "%s"' % title.replace('"', r"\"") if title else ""
+        return f"{prefix}[{text}]({href}{title_part}){suffix}" if href else text
+
+    def convert_code(self, el, text, parent_tags):
+        if "_noformat" in parent_tags:
+            return text
+        prefix, suffix, text = _chomp(text)
+        if not text:
+            return ""
+        max_backticks = max((len(run) for run in re_backtick_runs.findall(text)), default=0)
+        delimiter = "`" * (max_backticks + 1)
+        if max_backticks > 0:
+            text = " " + text + " "
+        return f"{prefix}{delimiter}{text}{delimiter}{suffix}"
+
+    convert_kbd = convert_code
+    convert_samp = convert_code
+
+    def convert_q(self, el, text, parent_tags):
+        return '"' + text + '"'
+
+    def convert_br(self, el, text, parent_tags):
+        return " " if "_inline" in parent_tags else "  \n"
+
+    def convert_img(self, el, text, parent_tags):
+        alt = el.get("alt") or ""
+        src = el.get("src") or ""
+        title = el.get("title") or ""
+        if "_inline" in parent_tags:
+            return alt
+        title_part = ' "%s"' % title.replace('"', r"\"") if title else ""
+        return f"![{alt}]({src}{title_part})"
+
+    def convert_video(self, el, text, parent_tags):
+        if "_inline" in parent_tags:
+            return text
+        src = el.get("src") or ""
+        if not src:
+            for source in el.iterdescendants("source"):
+                if source.get("src") is not None:
+                    src = source.get("src") or ""
+                    break
+        poster = el.get("poster") or ""
+        if src and poster:
+            return f"[![{text}]({poster})]({src})"
+        if src:
+            return f"[{text}]({src})"
+        if poster:
+            return f"![{text}]({poster})"
+        return text
+
+    # Block elements
+
+    def convert_div(self, el, text, parent_tags):
+        if "_inline" in parent_tags:
+            return " " + text.strip() + " "
+        text = text.strip()
+        return f"\n\n{text}\n\n" if text else ""
+
+    convert_article = convert_div
+    convert_section = convert_div
+    convert_dl = convert_div
+
+    def convert_p(self, el, text, parent_tags):
+        if "_inline" in parent_tags:
+            return " " + text.strip(" \t\r\n") + " "
+        text = text.strip(" \t\r\n")
+        return f"\n\n{text}\n\n" if text else ""
+
+    def convert_blockquote(self, el, text, parent_tags):
+        text = (text or "").strip(" \t\r\n")
+        if "_inline" in parent_tags:
+            return " " + text + " "
+        if not text:
+            return "\n"
+        text = re_line_with_content.sub(lambda m: "> " + m.group(1) if m.group(1) else ">", text)
+        return "\n" + text + "\n\n"
+
+    def convert_hN(self, n, text, parent_tags):
+        if "_inline" in parent_tags:
+            return text
+        n = max(1, min(6, n))
+        text = text.strip()
+        if n <= 2:
+            text = text.rstrip()
+            return "\n\n%s\n%s\n\n" % (text, ("=" if n == 1 else "-") * len(text)) if text else ""
+        text = re_all_whitespace.sub(" ", text)
+        return "\n\n%s %s\n\n" % ("#" * n, text)
+
+    def convert_hr(self, el, text, parent_tags):
+        return "\n\n---\n\n"
+
+    def convert_pre(self, el, text, parent_tags):
+        if not text:
+            return ""
+        text = re_pre_rstrip.sub("", re_pre_lstrip.sub("", text))
+        return f"\n\n```\n{text}\n```\n\n"
+
+    def convert_dt(self, el, text, parent_tags):
+        text = re_all_whitespace.sub(" ", (text or "").strip())
+        if "_inline" in parent_tags:
+            return " " + text + " "
+        if not text:
+            return "\n"
+        return f"\n\n{text}\n"
+
+    def convert_dd(self, el, text, parent_tags):
+        text = (text or "").strip()
+        if "_inline" in parent_tags:
+            return " " + text + " "
+        if not text:
+            return "\n"
+        text = re_line_with_content.sub(lambda m: "    " + m.group(1) if m.group(1) else "", text)
+        return ":" + text[1:] + "\n"
+
+    def next_content_name(self, el) -> str | None:
+        """Tag name of the next content sibling of el, see _next_block_content_name"""
+        return _next_block_content_name(el)
+
+    def convert_list(self, el, text, parent_tags):
+        next_name = self.next_content_name(el)
+        before_paragraph = next_name is not None and next_name not in ("ul", "ol")
+        if "li" in parent_tags:
+            return "\n" + text.rstrip()
+        return "\n\n" + text + ("\n" if before_paragraph else "")
+
+    convert_ul = convert_list
+    convert_ol = convert_list
+
+    def convert_li(self, el, text, parent_tags):
+        text = (text or "").strip()
+        if not text:
+            return "\n"
+        parent = el.getparent()
+        if parent is not None and parent.tag == "ol":
+            start = parent.get("start")
+            start = int(start) if start and start.isnumeric() else 1
+            bullet = "%s." % (start + sum(1 for sibling in el.itersiblings("li", preceding=True)))
+        else:
+            depth = sum(1 for _ in el.iterancestors("ul")) - 1
+            bullet = BULLETS[depth % len(BULLETS)]
+        bullet += " "
+        indent = " " * len(bullet)
+        text = re_line_with_content.sub(lambda m: indent + m.group(1) if m.group(1) else "", text)
+        return bullet + text[len(bullet):] + "\n"
+
+    # Tables
+
+    def convert_table(self, el, text, parent_tags):
+        return "\n\n" + text.strip() + "\n\n"
+
+    def convert_caption(self, el, text, parent_tags):
+        return text.strip() + "\n\n"
+
+    def convert_figcaption(self, el, text, parent_tags):
+        return "\n\n" + text.strip() + "\n\n"
+
+    def convert_td(self, el, text, parent_tags):
+        return " " + text.strip().replace("\n", " ") + " |" * _colspan(el)
+
+    convert_th = convert_td
+
+    def convert_tr(self, el, text, parent_tags):
+        cells = list(el.iterdescendants("td", "th"))
+        parent = el.getparent()
+        parent_name = parent.tag if parent is not None else None
+        is_first_row = _preceding_element(el) is None
+        is_headrow = all(cell.tag == "th" for cell in cells) or (
+            parent_name == "thead" and sum(1 for _ in parent.iterdescendants("tr")) == 1
+        )
+        if parent_name == "tbody":
+            grandparent = parent.getparent()
+            scope = grandparent if grandparent is not None else parent
+            has_thead = any(True for _ in scope.iterdescendants("thead"))
+            is_head_row_missing = is_first_row and not has_thead
+        else:
+            is_head_row_missing = is_first_row
+        full_colspan = sum(_colspan(cell) for cell in cells)
+        overline = underline = ""
+        if is_headrow and is_first_row:
+            underline = "| " + " | ".join(["---"] * full_colspan) + " |\n"
+        elif is_head_row_missing or (
+            is_first_row
+            and (parent_name == "table" or (parent_name == "tbody" and _preceding_element(parent) is None))
+        ):
+            overline = "| " + " | ".join([""] * full_colspan) + " |\n"
+            overline += "| " + " | ".join(["---"] * full_colspan) + " |\n"
+        return overline + "|" + text + "\n" + underline
+
+
+_emitter = MarkdownEmitter()
+
+
+def convert_document(
+    html: str, output_format: str, budget: OutputBudget | None = None, url: str = "", links: dict | None = None,
+) -> str:
+    """
+    Convert an HTML document with a single parse
+
+    The document is parsed once; Markdown is produced by cleaning and
+    stripping the tree in place (as strip_html does) and emitting Markdown
+    from it directly. Links are collected in one incremental pass that
+    never holds the whole tree, or from the parsed tree with main_content.
+
+    With a budget, main_content narrows the tree to the densest content
+    block and conversion stops once max_chars is reached, so the remainder
+    of a large page is never converted. The budget's cleaning profile
+    applies to Markdown output and its link scope to links output.
+
+    Parameters:
+        html: Input HTML string
+        output_format: "html", "links", "links-json", or any other value for Markdown
+        budget: Optional output size, main-content limits, cleaning profile and link scope
+        url: Page URL that links are resolved against
+        links: When given and Markdown is converted from the whole parsed page, filled with the
+            page's "links" and "links-json" outputs (no budget) from the same parse
+
+    Returns:
+        Formatted content string
+    """
+    if budget is None:
+        budget = OutputBudget()
+    if output_format == "html" and not budget.main_content:
+        return truncate(html, budget.max_chars, "\n")
+    if output_format in LINK_FORMATS and not budget.main_content:
+        from streaming import convert_prefix  # streaming builds on this module
+        with metrics.stage_seconds.time(stage="links", format=output_format):
+            return convert_prefix(html, output_format, budget.max_chars, url, budget.link_scope)
+    if budget.max_chars and not budget.main_content and budget.profile == "default" and output_format != "html":
+        # Parse only as much of the page as the budget needs, the prefix converter cleans like the default profile
+        from streaming import convert_prefix
+        with metrics.stage_seconds.time(stage="prefix", format=output_format):
+            return convert_prefix(html, output_format, budget.max_chars)
+    with metrics.stage_seconds.time(stage="parse", format=output_format):
+        tree = fromstring(html)
+    if output_format == "html":
+        root = main_content_root(tree, block_stats(tree))
+        return truncate(tostring(root, encoding="unicode"), budget.max_chars, "\n")
+    if output_format in LINK_FORMATS:
+        with metrics.stage_seconds.time(stage="links", format=output_format):
+            collector = LinkCollector(output_format, url, budget.link_scope, budget.max_chars)
+            collector.add_tree(tree, main_content_root(tree, block_stats(tree)))
+            return collector.render()
+    if links is not None:
+        # Collected before cleaning removes navigation and footers, as the links formats see them
+        with metrics.stage_seconds.time(stage="links", format=output_format):
+            collector = LinkCollector("links", url)
+            collector.add_tree(tree)
+            links["links"] = collector.render()
+            collector.output_format = "links-json"
+            links["links-json"] = collector.render()
+    with metrics.stage_seconds.time(stage="clean", format=output_format):
+        root = clean_tree(tree, budget.profile)
+        strip_tree(root)
+    if not budget.max_chars and not budget.main_content:
+        with metrics.stage_seconds.time(stage="markdown", format=output_format):
+            return _emitter.convert(root)
+    if budget.main_content:
+        stats = block_stats(root)
+        root = main_content_root(root, stats)
+        if budget.max_chars:
+            select_blocks(root, stats, budget.max_chars)
+    with metrics.stage_seconds.time(stage="markdown", format=output_format):
+        return truncate(MarkdownEmitter(budget.max_chars).convert(root), budget.max_chars)
+
+
+def get_content(
+    thor_mcp_content: str, thor_mcp_output_format: str, budget: OutputBudget | None = None, url: str = "",
+) -> str:
+    """
+    Extract content from response and convert to appropriate format using the configured engine
+
+    Parameters:
+        thor_mcp_content: Response content string
+        thor_mcp_output_format: Output format ("html", "links", "links-json", or other formats converted to markdown)
+        budget: Optional output size, main-content limits, cleaning profile and link scope
+        url: Page URL that links are resolved against
+
+    Returns:
+        Formatted content string
+    """
+    if CONVERT_ENGINE == "legacy":
+        # The legacy pipeline converts everything, the budget only truncates its output (JSON is never cut)
+        thor_mcp_result = convert.get_content(
+            thor_mcp_content, thor_mcp_output_format, budget.profile if budget else "default",
+            url, budget.link_scope if budget else "all",
+        )
+        if budget is None or thor_mcp_output_format == "links-json":
+            return thor_mcp_result
+        return truncate(thor_mcp_result, budget.max_chars)
+    return convert_document(thor_mcp_content, thor_mcp_output_format, budget, url)
+
+
+def get_content_and_links(
+    html: str, output_format: str, budget: OutputBudget | None = None, url: str = "",
+) -> tuple[str, dict[str, str]]:
+    """
+    Convert a page like get_content, and return its links outputs from the same parse
+
+    Returns:
+        The converted content, and the "links" and "links-json" outputs by format; the latter is empty
+        when the conversion did not parse the whole page (links formats, prefix conversion, legacy engine)
+    """
+    links: dict[str, str] = {}
+    if CONVERT_ENGINE == "legacy":
+        return get_content(html, output_format, budget, url), links
+    return convert_document(html, output_format, budget, url, links), links
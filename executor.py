@@ -0,0 +1,119 @@
+import os
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable
+
+import engine
+import metrics
+from budget import OutputBudget
+from links import LINK_FORMATS
+
+
+@dataclass
+class ExecutorSettings:
+    """Content processing executor settings, read from environment variables by default"""
+    threads: int = int(os.environ.get("SCRAPER_CONVERT_THREADS", min(8, (os.cpu_count() or 1) + 2)))  # lxml worker threads, 0 runs inline
+    processes: int = int(os.environ.get("SCRAPER_CONVERT_PROCESSES", 0))  # Markdown worker processes, 0 uses the thread pool
+    queue_depth: int = int(os.environ.get("SCRAPER_CONVERT_QUEUE", 64))  # Maximum conversions queued or running at once
+
+
+class ContentExecutor:
+    """
+    Runs HTML post-processing off the event loop
+
+    lxml releases the GIL while parsing and serializing, so "html" and links
+    conversions go to a thread pool. Markdown conversion is dominated by
+    pure-Python Markdown emission and can optionally go to a process pool.
+    Submissions beyond queue_depth wait for a free slot, which bounds memory
+    held by pending pages under load.
+    """
+
+    def __init__(self, settings: ExecutorSettings | None = None):
+        self.settings = settings or ExecutorSettings()
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self.pending = 0
+
+    def _thread_pool(self) -> ThreadPoolExecutor | None:
+        if self.settings.threads <= 0:
+            return None
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.settings.threads, thread_name_prefix="convert")
+        return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor | None:
+        if self.settings.processes <= 0:
+            return None
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.settings.processes)
+        return self._processes
+
+    def executor_for(self, output_format: str) -> Executor | None:
+        """Pick the executor for an output format, None means run inline"""
+        if output_format != "html" and output_format not in LINK_FORMATS:
+            return self._process_pool() or self._thread_pool()
+        return self._thread_pool()
+
+    async def run(self, output_format: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a conversion function on the executor selected for output_format
+
+        Parameters:
+            output_format: Output format being produced, used to select the executor
+            func: Picklable module-level conversion function
+            *args, **kwargs: Arguments passed to func
+
+        Returns:
+            The return value of func
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(1, self.settings.queue_depth))
+        executor = self.executor_for(output_format)
+        self.pending += 1
+        try:
+            async with self._slots:
+                if executor is None:
+                    return func(*args, **kwargs)
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    async def run_in_thread(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func on the thread pool, for stateful work such as feeding a streaming converter"""
+        executor = self._thread_pool()
+        if executor is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(func, *args))
+
+    async def get_content(self, html: str, output_format: str, budget: OutputBudget | None = None, url: str = "") -> str:
+        """Run engine.get_content off the event loop"""
+        if output_format == "html" and budget is None:
+            # Nothing to convert, avoid the executor round trip
+            return html
+        with metrics.convert_seconds.time(format=output_format):
+            return await self.run(output_format, engine.get_content, html, output_format, budget, url)
+
+    async def get_content_and_links(
+        self, html: str, output_format: str, budget: OutputBudget | None = None, url: str = "",
+    ) -> tuple[str, dict[str, str]]:
+        """Run engine.get_content_and_links off the event loop"""
+        with metrics.convert_seconds.time(format=output_format):
+            return await self.run(output_format, engine.get_content_and_links, html, output_format, budget, url)
+
+    def shutdown(self) -> None:
+        """Stop worker threads and processes"""
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+
+# Shared executor instance for the whole process
+content_executor = ContentExecutor()
@@ -0,0 +1,410 @@
+import os
+import re
+import zlib
+import codecs
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from batch import host_of
+
+# Render mode selector whose fetches go to the unlocker, the only one that renders pages
+UNLOCKER = "Unlocker"
+# The unlocker's default page type
+RENDER_TYPE = "html"
+
+re_meta_charset = re.compile(rb"""<meta[^>]+?charset\s*=\s*["']?\s*([A-Za-z0-9_.:\-]+)""", re.IGNORECASE)
+re_invisible = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+re_tag = re.compile(r"<[^>]*>")
+re_word = re.compile(r"\w{2,}")
+
+# Bytes at the start of a body searched for a <meta> charset. Browsers prescan 1024, pages with long heads are common
+META_PRESCAN_BYTES = 4096
+# Byte order marks, they take precedence over any declared charset
+BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+# Labels decoded as their superset, as browsers do
+CHARSET_SUPERSETS = {"ascii": "cp1252", "iso8859-1": "cp1252", "iso8859-9": "cp1254", "gb2312": "gb18030", "gbk": "gb18030"}
+
+
+def _zstd_decompressor_factory():
+    """ZstdDecompressor class of compression.zstd (Python 3.14) or the zstandard package, None without either"""
+    try:
+        from compression.zstd import ZstdDecompressor
+
+        return ZstdDecompressor
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return lambda: zstandard.ZstdDecompressor().decompressobj()
+
+
+def _brotli_decompressor_factory():
+    """Decompressor class of the Brotli or brotlicffi package, None without either"""
+    for name in ("brotli", "brotlicffi"):
+        try:
+            return __import__(name).Decompressor
+        except ImportError:
+            pass
+    return None
+
+
+ZSTD_DECOMPRESSOR = _zstd_decompressor_factory()
+BROTLI_DECOMPRESSOR = _brotli_decompressor_factory()
+
+
+def supported_encodings() -> str:
+    """Accept-Encoding value listing every content coding this process can decode, best first"""
+    encodings = ["gzip", "deflate"]
+    if BROTLI_DECOMPRESSOR is not None:
+        encodings.insert(0, "br")
+    if ZSTD_DECOMPRESSOR is not None:
+        encodings.insert(0, "zstd")
+    return ", ".join(encodings)
+
+
+@dataclass
+class FetchSettings:
+    """Fetch profile settings, read from environment variables by default"""
+    accept_encoding: str = os.environ.get("SCRAPER_ACCEPT_ENCODING", "") or supported_encodings()  # Content codings asked for, "identity" disables compression
+    render_type: str = os.environ.get("SCRAPER_RENDER_TYPE", RENDER_TYPE)  # X-Render-Type sent to the unlocker
+    render_wait: int = int(os.environ.get("SCRAPER_RENDER_WAIT", 10))  # X-Wait-Second for pages that need rendering
+    adaptive: bool = os.environ.get("SCRAPER_RENDER_ADAPTIVE", "1").lower() in ("1", "true", "yes")  # Fetch hosts without a render wait until one of their pages needs it
+    min_words: int = 40  # Pages with scripts and fewer visible words than this need rendering
+    hosts: int = 10000  # Hosts whose render need is remembered
+
+
+@dataclass
+class FetchStats:
+    """Fetch profile counters"""
+    compressed: int = 0  # Responses sent with a content coding
+    uncompressed: int = 0
+    meta_charset: int = 0  # Bodies decoded with the charset of their <meta> tag
+    unknown_charset: int = 0  # Declared charsets Python has no codec for, decoded as UTF-8
+    no_wait: int = 0  # Unlocker fetches sent without a render wait
+    waited: int = 0  # Unlocker fetches sent with a render wait
+    rerendered: int = 0  # Pages fetched again with the render wait because the first answer needed rendering
+    render_hosts: int = 0  # Hosts found to need rendering
+
+
+@dataclass(frozen=True)
+class FetchProfile:
+    """
+    How the unlocker renders a page: page type and seconds it waits for scripts
+
+    wait None leaves the wait to the adaptive render wait (or the configured
+    render_wait when that is off). Regular proxy fetches send neither header.
+    """
+    render_type: str = RENDER_TYPE
+    wait: int | None = None
+
+    @classmethod
+    def from_params(cls, render_wait: int | None = None, render_type: str = RENDER_TYPE) -> "FetchProfile | None":
+        """Profile of a tool call, None when it asks for the defaults"""
+        if render_wait is None and render_type == RENDER_TYPE:
+            return None
+        return cls(render_type, render_wait)
+
+    @property
+    def key(self) -> str:
+        """Suffix of the cache keys of pages fetched with this profile"""
+        return f"|{self.render_type}|wait{'' if self.wait is None else self.wait}"
+
+    def headers(self) -> dict:
+        """Unlocker request headers"""
+        headers = {"X-Render-Type": self.render_type}
+        if self.wait is not None:
+            headers["X-Wait-Second"] = str(self.wait)
+        return headers
+
+
+def fetch_key(render: str, profile: FetchProfile | None = None) -> str:
+    """Render part of the cache and revalidation keys of a page fetched with profile"""
+    return render + profile.key if profile is not None else render
+
+
+def normalize_charset(label: str | bytes | None) -> str | None:
+    """Python codec name of a charset label, None when it is empty or unknown"""
+    if isinstance(label, bytes):
+        label = label.decode("ascii", "ignore")
+    if not label:
+        return None
+    try:
+        name = codecs.lookup(label.strip().strip("\"'")).name
+    except LookupError:
+        return None
+    return CHARSET_SUPERSETS.get(name, name)
+
+
+def body_charset(declared: str | None, head: bytes, stats: "FetchStats | None" = None) -> str:
+    """
+    Codec for a response body, without statistical charset detection
+
+    Follows the order browsers use: a byte order mark, then the
+    Content-Type charset, then a <meta> charset near the start of the body,
+    and UTF-8 when none is found or known.
+
+    Parameters:
+        declared: charset parameter of the Content-Type header
+        head: First bytes of the body
+        stats: Counters to update, defaults to the shared fetch_stats
+    """
+    stats = stats if stats is not None else fetch_stats
+    for bom, codec in BOMS:
+        if head.startswith(bom):
+            return codec
+    charset = normalize_charset(declared)
+    if charset is not None:
+        return charset
+    if declared:
+        stats.unknown_charset += 1
+    match = re_meta_charset.search(head, 0, META_PRESCAN_BYTES)
+    if match is not None:
+        charset = normalize_charset(match.group(1))
+        if charset is not None:
+            stats.meta_charset += 1
+            # A meta tag read as ASCII cannot really declare UTF-16
+            return "utf-8" if charset.startswith("utf-16") else charset
+        stats.unknown_charset += 1
+    return "utf-8"
+
+
+class ContentDecodingError(ValueError):
+    """
+    A response body cannot be decompressed: it is corrupt, or its content coding is not one this process decodes
+
+    Attributes:
+        retryable: False for unsupported codings, which another attempt would send again
+    """
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class _Deflate:
+    """Decompressor of the deflate coding, sent zlib wrapped as specified or raw by some servers"""
+
+    def __init__(self):
+        self._obj = None
+
+    def decompress(self, chunk: bytes) -> bytes:
+        if self._obj is None:
+            # A zlib header: compression method 8 and a check value divisible by 31
+            wrapped = len(chunk) < 2 or chunk[0] & 0x0F == 8 and (chunk[0] << 8 | chunk[1]) % 31 == 0
+            self._obj = zlib.decompressobj(zlib.MAX_WBITS if wrapped else -zlib.MAX_WBITS)
+        return self._obj.decompress(chunk)
+
+
+class _Brotli:
+    """Decompressor of the br coding, over the Brotli or brotlicffi API"""
+
+    def __init__(self):
+        self._obj = BROTLI_DECOMPRESSOR()
+        self._process = getattr(self._obj, "process", None) or self._obj.decompress
+
+    def decompress(self, chunk: bytes) -> bytes:
+        return self._process(chunk)
+
+
+def content_decompressor(coding: str):
+    """Incremental decompressor of a content coding, None for identity and codings this process cannot decode"""
+    if coding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if coding == "deflate":
+        return _Deflate()
+    if coding == "br" and BROTLI_DECOMPRESSOR is not None:
+        return _Brotli()
+    if coding == "zstd" and ZSTD_DECOMPRESSOR is not None:
+        return ZSTD_DECOMPRESSOR()
+    return None
+
+
+class BodyDecoder:
+    """
+    Incremental decoder of a response body whose charset is settled on the first chunk
+
+    Undoes every content coding of the body: sessions are created with
+    aiohttp's own decompression off (see pool.SessionPool), so codings are
+    decoded here once, whichever of them the installed aiohttp supports.
+    Codings listed in Content-Encoding are undone last applied first; a
+    coding it cannot decode fails the body rather than passing compressed
+    bytes on as text.
+    """
+
+    def __init__(self, declared: str | None, content_encoding: str = "", stats: FetchStats | None = None):
+        """
+        Exceptions:
+            ContentDecodingError: Thrown when a coding of content_encoding cannot be decoded, e.g. br without Brotli
+        """
+        self.declared = declared
+        self.stats = stats if stats is not None else fetch_stats
+        self.charset: str | None = None
+        self._decoder = None
+        self._head = b""
+        codings = [coding.strip().lower() for coding in content_encoding.split(",")]
+        codings = [coding for coding in codings if coding and coding != "identity"]
+        self._decompressors = []
+        for coding in reversed(codings):
+            decompressor = content_decompressor(coding)
+            if decompressor is None:
+                raise ContentDecodingError(f"Unsupported content coding: {coding}", retryable=False)
+            self._decompressors.append(decompressor)
+        if codings:
+            self.stats.compressed += 1
+        else:
+            self.stats.uncompressed += 1
+
+    def decompress(self, chunk: bytes) -> bytes:
+        """
+        Undo the content codings of the next chunk of the body
+
+        Exceptions:
+            ContentDecodingError: Thrown when the chunk is not valid for its coding
+        """
+        try:
+            for decompressor in self._decompressors:
+                if not chunk:
+                    break
+                chunk = decompressor.decompress(chunk)
+        except Exception as e:
+            raise ContentDecodingError(f"Cannot decode the body's content coding: {type(e).__name__}") from e
+        return chunk
+
+    def decode(self, chunk: bytes, final: bool = False) -> str:
+        """
+        Decode the next decompressed chunk
+
+        The first META_PRESCAN_BYTES of the body are held back, and "" returned
+        for them, until the charset is settled: a first chunk may be empty (a
+        gzip header alone) or end before the <meta> tag.
+        """
+        if self._decoder is None:
+            self._head += chunk
+            if len(self._head) < META_PRESCAN_BYTES and not final:
+                return ""
+            chunk, self._head = self._head, b""
+            self.charset = body_charset(self.declared, chunk, self.stats)
+            self._decoder = codecs.getincrementaldecoder(self.charset)(errors="replace")
+        return self._decoder.decode(chunk, final)
+
+
+def needs_render(html: str, min_words: int = 40) -> bool:
+    """
+    Whether a page fetched without a render wait looks like an unrendered app shell
+
+    A shell has scripts and hardly any visible text: its content is built in
+    the browser, e.g. an empty <div id="root"> and a bundle.
+    """
+    if "<script" not in html and "<SCRIPT" not in html:
+        return False
+    words = 0
+    for _ in re_word.finditer(re_tag.sub(" ", re_invisible.sub(" ", html))):
+        words += 1
+        if words >= min_words:
+            return False
+    return True
+
+
+class RenderWaits:
+    """
+    Per-host choice between fetching through the unlocker with or without a render wait
+
+    With adaptive on, pages of a host are fetched without X-Wait-Second until
+    one comes back as an unrendered shell (see needs_render); that page is
+    fetched again with render_wait, and so are later pages of the host.
+    Hosts are remembered in an LRU of settings.hosts entries per process.
+    Explicit per-request waits are sent as asked.
+    """
+
+    def __init__(self, settings: FetchSettings | None = None, stats: FetchStats | None = None):
+        self.settings = settings or fetch_settings
+        self.stats = stats if stats is not None else fetch_stats
+        self._render_hosts: OrderedDict[str, None] = OrderedDict()
+
+    def profile(
+        self, url: str, render: str, requested: FetchProfile | None = None, adaptive: bool = True,
+    ) -> FetchProfile | None:
+        """
+        Profile to fetch url with: the wait settled, None for regular proxy fetches
+
+        Parameters:
+            url: Page URL
+            render: Render mode selector, only UNLOCKER fetches are rendered
+            requested: Profile asked for by the caller, None for the defaults
+            adaptive: False when the caller cannot check the body with needs_render, e.g. while streaming it
+
+        Returns:
+            The profile to send, whose wait is never None
+        """
+        if render != UNLOCKER:
+            return None
+        render_type = requested.render_type if requested is not None else self.settings.render_type
+        if requested is not None and requested.wait is not None:
+            wait = requested.wait
+        elif not (adaptive and self.settings.adaptive):
+            wait = self.settings.render_wait
+        else:
+            host = host_of(url)
+            if host in self._render_hosts:
+                self._render_hosts.move_to_end(host)
+                wait = self.settings.render_wait
+            else:
+                wait = 0
+        if wait:
+            self.stats.waited += 1
+        else:
+            self.stats.no_wait += 1
+        return FetchProfile(render_type, wait)
+
+    def checks(self, profile: FetchProfile | None, requested: FetchProfile | None = None) -> bool:
+        """
+        Whether a page fetched with profile is checked with needs_render
+
+        Parameters:
+            profile: Profile the page was fetched with, as returned by profile()
+            requested: Profile asked for by the caller
+        """
+        return (
+            profile is not None and not profile.wait and self.settings.adaptive and self.settings.render_wait > 0
+            and (requested is None or requested.wait is None)
+        )
+
+    def rerender(self, url: str, profile: FetchProfile) -> FetchProfile:
+        """Remember that url's host needs rendering, returns profile with the render wait to fetch the page again"""
+        host = host_of(url)
+        if host not in self._render_hosts:
+            self.stats.render_hosts += 1
+            self._render_hosts[host] = None
+            while len(self._render_hosts) > self.settings.hosts:
+                self._render_hosts.popitem(last=False)
+        self.stats.rerendered += 1
+        self.stats.waited += 1
+        return FetchProfile(profile.render_type, self.settings.render_wait)
+
+    def clear(self) -> None:
+        """Forget which hosts need rendering"""
+        self._render_hosts.clear()
+
+
+def request_headers(profile: FetchProfile | None, conditional: dict | None = None, settings: FetchSettings | None = None) -> dict:
+    """
+    Headers of a fetch: content codings, the unlocker's render headers and conditional headers
+
+    Parameters:
+        profile: Settled profile of an unlocker fetch, None for regular proxy fetches
+        conditional: If-None-Match / If-Modified-Since headers of a revalidation
+    """
+    headers = {"Accept-Encoding": (settings or fetch_settings).accept_encoding}
+    if profile is not None:
+        headers.update(profile.headers())
+    if conditional:
+        headers.update(conditional)
+    return headers
+
+
+# Settings, counters and render waits shared by every fetch of the process
+fetch_settings = FetchSettings()
+fetch_stats = FetchStats()
+render_waits = RenderWaits()
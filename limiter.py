@@ -0,0 +1,257 @@
+import os
+import time
+import asyncio
+import json
+from collections import deque
+from dataclasses import dataclass, field
+
+from batch import host_of
+from retry import FetchError
+from logs import get_logger
+from shared import SharedState, SharedStateError, shared_state
+
+logger = get_logger("limiter")
+
+
+@dataclass
+class LimiterSettings:
+    """Per-domain rate limiter and circuit breaker settings, read from environment variables by default"""
+    rate: float = float(os.environ.get("SCRAPER_DOMAIN_RATE", 10))  # Requests per second per domain when healthy, 0 disables limiting
+    burst: float = float(os.environ.get("SCRAPER_DOMAIN_BURST", 20))  # Requests a domain may receive at once
+    min_rate: float = float(os.environ.get("SCRAPER_DOMAIN_MIN_RATE", 0.2))  # Lowest rate the adaptation backs off to
+    max_wait: float = float(os.environ.get("SCRAPER_DOMAIN_MAX_WAIT", 30))  # Longest wait for a request slot before failing
+    slow_latency: float = float(os.environ.get("SCRAPER_DOMAIN_SLOW_LATENCY", 15))  # Responses slower than this count as overload
+    breaker_threshold: float = float(os.environ.get("SCRAPER_BREAKER_THRESHOLD", 0.5))  # Failure ratio that opens the circuit
+    breaker_min_requests: int = int(os.environ.get("SCRAPER_BREAKER_MIN_REQUESTS", 10))  # Outcomes needed before the circuit can open
+    breaker_window: float = float(os.environ.get("SCRAPER_BREAKER_WINDOW", 60))  # Seconds of outcomes considered
+    breaker_cooldown: float = float(os.environ.get("SCRAPER_BREAKER_COOLDOWN", 30))  # Seconds an open circuit rejects requests
+    backoff_interval: float = 1.0  # Seconds between two rate decreases of a domain
+    sync_interval: float = 1.0  # Seconds between shared state synchronizations
+    max_domains: int = 10000  # Domains tracked at once, least recently used go first
+
+
+@dataclass
+class LimiterStats:
+    """Limiter counters"""
+    throttled: int = 0  # Requests that waited for a slot
+    rejected: int = 0  # Requests failed because the wait would exceed max_wait
+    circuit_open: int = 0  # Requests failed fast by an open circuit
+    backoffs: int = 0  # Rate decreases after errors or slow responses
+
+
+class CircuitOpenError(FetchError):
+    """Raised without contacting the proxy while a domain's circuit is open"""
+
+    def __init__(self, message: str):
+        super().__init__(message, retryable=False)
+
+
+class RateLimitedError(FetchError):
+    """Raised when a domain's request slot is further away than max_wait"""
+
+    def __init__(self, message: str):
+        super().__init__(message, retryable=False)
+
+
+@dataclass
+class DomainState:
+    """Token bucket, adaptive rate and circuit breaker of one domain"""
+    rate: float
+    tokens: float
+    updated: float = field(default_factory=time.monotonic)
+    backed_off: float = 0.0  # Monotonic time of the last rate decrease
+    outcomes: deque = field(default_factory=deque)  # (monotonic time, failed) pairs within the breaker window
+    open_until: float = 0.0  # Wall-clock time until which the circuit is open
+    probe_started: float = 0.0  # Monotonic start of the half-open probe request in flight, 0 when none
+
+
+class DomainLimiter:
+    """
+    Per-domain token bucket with adaptive rate and a circuit breaker
+
+    Each domain starts at rate requests per second with burst capacity.
+    Throttling responses (429, 503) and slow responses halve the domain's
+    rate, down to min_rate; successful responses raise it again additively
+    (AIMD). When the failure ratio over the breaker window reaches the
+    threshold, the circuit opens and requests fail fast for the cooldown;
+    afterwards one probe request is let through and its outcome closes or
+    reopens the circuit.
+
+    With a shared state backend, adapted rates and open circuits are
+    exchanged with other workers about once per sync_interval, each worker
+    adopting the most restrictive state. Token buckets stay per worker.
+    """
+
+    def __init__(self, settings: LimiterSettings | None = None, shared: SharedState | None = None):
+        self.settings = settings or LimiterSettings()
+        self.stats = LimiterStats()
+        self.shared = shared
+        self._domains: dict[str, DomainState] = {}
+        self._dirty: set[str] = set()  # Domains whose rate or circuit changed since the last sync
+        self._active: set[str] = set()  # Domains requested since the last sync
+        self._last_sync = 0.0
+        self._sync_task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.rate > 0
+
+    def state(self, domain: str) -> DomainState:
+        found = self._domains.pop(domain, None)
+        if found is None:
+            found = DomainState(rate=self.settings.rate, tokens=self.settings.burst)
+            if len(self._domains) >= self.settings.max_domains:
+                # Forget the least recently used domain
+                self._domains.pop(next(iter(self._domains)))
+        # Reinsert to keep dict order as recency order
+        self._domains[domain] = found
+        return found
+
+    async def acquire(self, url: str) -> str:
+        """
+        Wait for a request slot for the URL's domain
+
+        Returns:
+            The domain, to be passed to record()
+
+        Exceptions:
+            CircuitOpenError: The domain's circuit is open
+            RateLimitedError: The next slot is further away than max_wait
+        """
+        domain = host_of(url)
+        if not self.enabled:
+            return domain
+        self._maybe_sync()
+        state = self.state(domain)
+        self._active.add(domain)
+
+        now = time.time()
+        clock = time.monotonic()
+        if state.open_until > now:
+            self.stats.circuit_open += 1
+            raise CircuitOpenError(f"Circuit open for {domain} after repeated failures, retry in {state.open_until - now:.0f}s")
+        # Cooldown over: the circuit is half-open and lets a single probe through,
+        # or another one if the previous probe never reported back
+        probe = bool(state.open_until)
+        if probe and clock - state.probe_started <= self.settings.breaker_cooldown:
+            self.stats.circuit_open += 1
+            raise CircuitOpenError(f"Circuit half-open for {domain}, waiting for a probe request")
+
+        # Refill, then reserve a token; a negative balance is the wait until the slot
+        state.tokens = min(self.settings.burst, state.tokens + (clock - state.updated) * state.rate)
+        state.updated = clock
+        wait = (1 - state.tokens) / state.rate if state.tokens < 1 else 0.0
+        if wait > self.settings.max_wait:
+            self.stats.rejected += 1
+            raise RateLimitedError(f"Rate limit for {domain} reached, next request slot in {wait:.0f}s")
+        state.tokens -= 1
+        if probe:
+            state.probe_started = clock
+        if wait:
+            self.stats.throttled += 1
+            await asyncio.sleep(wait)
+        return domain
+
+    def record(self, domain: str, status: int | None, latency: float, failed: bool) -> None:
+        """
+        Record the outcome of a request to a domain
+
+        Parameters:
+            domain: Domain returned by acquire()
+            status: HTTP status, None for network errors and timeouts
+            latency: Seconds the request took
+            failed: Whether the outcome counts against the circuit breaker
+        """
+        if not self.enabled:
+            return
+        state = self.state(domain)
+        settings = self.settings
+        clock = time.monotonic()
+
+        # Adapt the rate: multiplicative decrease on overload, additive increase otherwise
+        if status in (429, 503) or status is None and failed or latency > settings.slow_latency:
+            # At most once per interval, so a burst of failures counts as one overload signal
+            if clock - state.backed_off >= settings.backoff_interval:
+                state.rate = max(settings.min_rate, state.rate / 2)
+                state.backed_off = clock
+                self.stats.backoffs += 1
+                self._dirty.add(domain)
+        elif not failed and state.rate < settings.rate:
+            state.rate = min(settings.rate, state.rate + settings.rate / 20)
+
+        state.outcomes.append((clock, failed))
+        while state.outcomes and state.outcomes[0][0] < clock - settings.breaker_window:
+            state.outcomes.popleft()
+
+        if state.probe_started:
+            state.probe_started = 0.0
+            if failed:
+                self._open(domain, state)
+            else:
+                # Recovered: close the circuit and resume at no less than half the configured rate
+                state.open_until = 0.0
+                state.rate = max(state.rate, settings.rate / 2)
+                state.outcomes.clear()
+                self._dirty.add(domain)
+            return
+        failures = sum(1 for _, outcome in state.outcomes if outcome)
+        if len(state.outcomes) >= settings.breaker_min_requests and failures / len(state.outcomes) >= settings.breaker_threshold:
+            self._open(domain, state)
+
+    def _open(self, domain: str, state: DomainState) -> None:
+        state.open_until = time.time() + self.settings.breaker_cooldown
+        state.outcomes.clear()
+        # Drop reservations made before the circuit opened, the bucket refills during the cooldown
+        state.tokens = min(state.tokens, 0.0)
+        state.updated = time.monotonic()
+        self._dirty.add(domain)
+
+    # Shared state
+
+    def _maybe_sync(self) -> None:
+        if self.shared is None or time.monotonic() - self._last_sync < self.settings.sync_interval:
+            return
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        self._sync_task = asyncio.get_running_loop().create_task(self.sync())
+
+    async def sync(self) -> None:
+        """Publish changed domain states to the shared state and adopt what other workers stored"""
+        if self.shared is None:
+            return
+        self._last_sync = time.monotonic()
+        updates = {
+            domain: (self._domains[domain].rate, self._domains[domain].open_until)
+            for domain in self._dirty if domain in self._domains
+        }
+        active = [domain for domain in self._active if domain in self._domains]
+        self._dirty.clear()
+        self._active.clear()
+        try:
+            shared = await asyncio.to_thread(self._exchange, updates, active)
+        except SharedStateError as e:
+            logger.warning("Failed to sync shared limiter state", extra={"error": str(e)})
+            return
+        now = time.time()
+        for domain, (rate, open_until) in shared.items():
+            state = self._domains.get(domain)
+            if state is None:
+                continue
+            # Adopt the most restrictive view of the domain
+            state.rate = min(state.rate, rate)
+            if open_until > now and open_until > state.open_until:
+                state.open_until = open_until
+
+    def _exchange(self, updates: dict[str, tuple[float, float]], active: list[str]) -> dict[str, tuple[float, float]]:
+        """Write local changes and read the shared state of the domains used since the last sync"""
+        now = time.time()
+        for domain, (rate, open_until) in updates.items():
+            # Shared rate reductions fade out after a breaker window without updates
+            ttl = max(self.settings.breaker_window, open_until - now)
+            self.shared.set("limits", domain, json.dumps([rate, open_until]).encode(), ttl)
+        found = self.shared.get_many("limits", active)
+        return {domain: tuple(json.loads(value)) for domain, value in found.items()}
+
+
+# Shared per-domain limiter for the whole process
+domain_limiter = DomainLimiter(shared=shared_state)
@@ -0,0 +1,190 @@
+import json
+import re
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from budget import truncate
+
+# Output formats listing the page's links: "[text] URL" lines, or a JSON array of link objects
+LINK_FORMATS = frozenset(("links", "links-json"))
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+re_space = re.compile(r"\s+")
+# Characters urlsplit removes or treats specially in the host part, URLs with them take the slow path
+re_unsafe = re.compile(r"[\t\r\n\\]")
+re_special_authority = re.compile(r"[@:\[?#A-Z]")
+
+
+def _normalize(url: str) -> tuple[str, str]:
+    """Normalized URL and its lowercase host ("" when it has none), see normalize_url"""
+    scheme, separator, rest = url.partition("://")
+    if separator and scheme in DEFAULT_PORTS and not re_unsafe.search(url):
+        authority, slash, path = rest.partition("/")
+        if authority and not re_special_authority.search(authority):
+            # Lowercase host without port or user info: already normalized but for the path and fragment
+            return f"{scheme}://{authority}/{path.partition('#')[0]}", authority
+    try:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = parts.hostname or ""
+        if scheme not in DEFAULT_PORTS or not host:
+            return url.partition("#")[0] or url, host
+        port = parts.port
+    except ValueError:
+        # Malformed host or port, keep the URL as written
+        return url, ""
+    netloc = f"[{host}]" if ":" in host else host  # IPv6 literal
+    if port not in (None, DEFAULT_PORTS[scheme]):
+        netloc = f"{netloc}:{port}"
+    if parts.username is not None:
+        netloc = parts.netloc.rpartition("@")[0] + "@" + netloc
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, "")), host
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize an absolute http(s) URL so equivalent spellings compare equal
+
+    Lowercases the scheme and host, drops default ports and the fragment, and
+    turns an empty path into "/". Other URLs (mailto:, relative URLs when
+    there is nothing to resolve them against) only lose their fragment.
+    """
+    return _normalize(url)[0]
+
+
+def _site(host: str) -> str:
+    return host[4:] if host.startswith("www.") else host
+
+
+def site_of(url: str) -> str:
+    """Host of a URL without a leading "www.", "" for relative URLs"""
+    try:
+        return _site(urlsplit(url).hostname or "")
+    except ValueError:
+        return ""
+
+
+class LinkCollector:
+    """
+    Collects a page's links in document order as its anchors are found
+
+    hrefs are resolved against the page URL, or the first <base href> once
+    one has been seen, with urljoin semantics, then normalized; each URL is
+    kept once, with the text of its first anchor. In-page anchors,
+    javascript: links and anchors without text are skipped. Collection stops
+    once max_chars of output is reached.
+    """
+
+    def __init__(self, output_format: str = "links", page_url: str = "", scope: str = "all", max_chars: int = 0):
+        self.output_format = output_format
+        self.page_url = page_url
+        self.base = page_url
+        self.scope = scope
+        self.max_chars = max_chars
+        self.links: list[tuple[str, str, bool]] = []  # URL, text, internal
+        self.size = 0
+        self.duplicates = 0
+        self.full = False
+        self._seen: set[str] = set()
+        self._resolved: dict[str, tuple[str, str]] = {}
+        self._site = site_of(page_url)
+        self._base_seen = False
+        self._origin = ""
+        self._directory = ""
+        self._host = ""
+        self._set_origin()
+
+    def _set_origin(self) -> None:
+        """Split the normalized base into scheme://host and directory, simple relative hrefs are appended to them"""
+        base, host = _normalize(self.base) if self.base else ("", "")
+        scheme, _, rest = base.partition("://")
+        if host and scheme in DEFAULT_PORTS:
+            self._origin = f"{scheme}://{rest.partition('/')[0]}"
+            self._directory = base.partition("?")[0].rpartition("/")[0] + "/"
+        else:
+            self._origin = self._directory = ""
+        self._host = host
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the output budget is filled"""
+        return self.full or bool(self.max_chars) and self.size > self.max_chars
+
+    def set_base(self, href: str | None) -> None:
+        """Apply a <base href>; like browsers, only the first one counts"""
+        if self._base_seen or not href or not href.strip():
+            return
+        self._base_seen = True
+        self.base = urljoin(self.page_url, href.strip())
+        self._resolved.clear()
+        self._set_origin()
+
+    def _resolve(self, href: str) -> tuple[str, str]:
+        """
+        Absolute, normalized URL of an href and its host
+
+        Paths without dot segments are appended to the base's origin or
+        directory, which is what urljoin would return, without parsing.
+        """
+        if href[:7].lower() == "http://" or href[:8].lower() == "https://":
+            return _normalize(href)
+        if self._origin and "/." not in href and ":" not in href.partition("/")[0]:
+            path = href
+            while path.startswith("./"):
+                path = path[2:]
+            if path[:1] == "/" and path[1:2] != "/":
+                return self._origin + (path.partition("#")[0] or "/"), self._host
+            if not path or (path[0] not in "/?#." and "\\" not in path):
+                return self._directory + path.partition("#")[0], self._host
+        return _normalize(urljoin(self.base, href) if self.base else href)
+
+    def add(self, href: str | None, text: str) -> None:
+        """Add an anchor's href and text content"""
+        if self.exhausted or not href:
+            return
+        href = href.strip()
+        text = re_space.sub(" ", text).strip()
+        if not href or not text or href.startswith("#") or href[:11].lower() == "javascript:":
+            return
+        resolved = self._resolved.get(href)
+        if resolved is None:
+            resolved = self._resolved[href] = self._resolve(href)
+        url, host = resolved
+        if url in self._seen:
+            self.duplicates += 1
+            return
+        self._seen.add(url)
+        internal = _site(host) == self._site if host else ":" not in url.partition("/")[0]
+        if (self.scope == "internal" and not internal) or (self.scope == "external" and internal):
+            return
+        if self.output_format == "links-json":
+            size = len(json.dumps({"url": url, "text": text, "internal": internal}, ensure_ascii=False)) + 2
+            if self.max_chars and self.size + size > self.max_chars:
+                # JSON is never cut mid-way, the link that does not fit ends the list
+                self.full = True
+                return
+        else:
+            size = len(url) + len(text) + 4
+        self.links.append((url, text, internal))
+        self.size += size
+
+    def add_tree(self, tree, root=None) -> None:
+        """Add the anchors under root (default tree), resolving against the first <base> in tree"""
+        for base in tree.iter("base"):
+            if base.get("href"):
+                self.set_base(base.get("href"))
+                break
+        for anchor in (tree if root is None else root).iter("a"):
+            if self.exhausted:
+                break
+            href = anchor.get("href")
+            if href:
+                self.add(href, anchor.text_content())
+
+    def render(self) -> str:
+        """The collected links in the output format"""
+        if self.output_format == "links-json":
+            return json.dumps(
+                [{"url": url, "text": text, "internal": internal} for url, text, internal in self.links],
+                ensure_ascii=False,
+            )
+        return truncate("\n".join(f"[{text}] {url}" for url, text, _ in self.links), self.max_chars, "\n")
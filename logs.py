@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import time
+import logging
+from dataclasses import dataclass
+
+# Record attributes set by logging itself, everything else came in through extra=
+_RESERVED = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+# Field names whose values are never logged
+SENSITIVE_KEYS = frozenset((
+    "password", "login", "authorization", "proxy_auth", "proxy-authorization", "cookie", "set-cookie",
+    "config", "token", "api_key", "apikey", "secret",
+    "unlocker_proxy_login", "unlocker_proxy_password", "default_proxy_login", "default_proxy_password",
+))
+REDACTED = "[redacted]"
+
+# user:password@ in URLs, and sensitive query parameters
+re_userinfo = re.compile(r"(?<=//)[^/@\s:]+:[^/@\s]*@")
+re_secret_param = re.compile(r"(?i)\b(config|token|api_key|apikey|key|password|secret)=[^&\s\"']+")
+
+
+@dataclass
+class LogSettings:
+    """Logging settings, read from environment variables by default"""
+    level: str = os.environ.get("SCRAPER_LOG_LEVEL", "INFO").upper()  # DEBUG, INFO, WARNING or ERROR
+    format: str = os.environ.get("SCRAPER_LOG_FORMAT", "json")  # "json" lines or human readable "text"
+    access_log: bool = os.environ.get("SCRAPER_ACCESS_LOG", "0").lower() in ("1", "true", "yes")  # Log every HTTP request
+
+
+def redact(value):
+    """Strip credentials from a logged value: URL userinfo, secret query parameters, sensitive dict keys"""
+    if isinstance(value, str):
+        if "@" in value:
+            value = re_userinfo.sub(REDACTED + "@", value)
+        if "=" in value:
+            value = re_secret_param.sub(lambda match: f"{match.group(1)}={REDACTED}", value)
+        return value
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """Redacts the message, its arguments and extra fields of every record before it is formatted"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, str):
+            record.msg = redact(record.msg)
+        if record.args:
+            record.args = tuple(redact(arg) for arg in record.args) if isinstance(record.args, tuple) else redact(record.args)
+        for key, value in list(record.__dict__.items()):
+            if key in _RESERVED:
+                continue
+            record.__dict__[key] = REDACTED if key.lower() in SENSITIVE_KEYS else redact(value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human readable lines with extra= fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = " ".join(f"{key}={value}" for key, value in record.__dict__.items() if key not in _RESERVED)
+        return f"{line} {extra}" if extra else line
+
+
+def configure_logging(settings: LogSettings | None = None) -> LogSettings:
+    """
+    Install the redacting structured handler on the root logger
+
+    uvicorn's loggers propagate to the root logger, so server and access logs
+    share the same format, level and redaction.
+
+    Returns:
+        The settings used, for passing log_level and access_log to uvicorn
+    """
+    settings = settings or LogSettings()
+    handler = logging.StreamHandler()
+    handler.addFilter(RedactingFilter())
+    handler.setFormatter(JsonFormatter() if settings.format == "json" else TextFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(settings.level)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger = logging.getLogger(name)
+        logger.handlers[:] = []
+        logger.propagate = True
+    return settings
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger of a scraper component"""
+    return logging.getLogger(f"scraper.{name}")
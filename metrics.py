@@ -0,0 +1,253 @@
+import os
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Iterable
+
+# Default latency buckets in seconds, from sub-millisecond conversions to long proxy fetches
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Body size buckets in bytes, 1 KB to 50 MB
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 52428800)
+# Attempts per fetch
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 8)
+
+
+@dataclass
+class MetricsSettings:
+    """Metrics settings, read from environment variables by default"""
+    enabled: bool = os.environ.get("SCRAPER_METRICS", "1").lower() in ("1", "true", "yes")  # Serve /metrics and record measurements
+    loop_lag_interval: float = float(os.environ.get("SCRAPER_LOOP_LAG_INTERVAL", 0.5))  # Seconds between event-loop lag probes, 0 disables
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base of labelled metrics; observations may come from worker threads"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: tuple, value: Any) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            found = self._values.get(key)
+            if found is None:
+                # Per-bucket counts, then sum and count
+                found = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = found[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            found[1] += value
+            found[2] += 1
+
+    def time(self, **labels: str) -> "_Timer":
+        """Context manager observing the seconds spent inside it"""
+        return _Timer(self, labels)
+
+    def _render_value(self, key: tuple, value: Any) -> list[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            bucket = _labels(self.label_names, key, f'le="{_number(bound)}"')
+            lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+        labels = _labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Registry:
+    """
+    Process-wide set of metrics rendered in the Prometheus text format
+
+    Metrics are recorded as they happen; collectors are called at scrape
+    time to export counters that other components already keep in their
+    stats dataclasses, so those components need no metrics code.
+    """
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], list[str]]] = []
+        self._stats: dict[str, tuple[str, list[tuple[str, Any]]]] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def collector(self, collect: Callable[[], list[str]]) -> None:
+        """Add a function returning exposition lines at scrape time"""
+        self._collectors.append(collect)
+
+    def stats(self, name: str, documentation: str, component: str, stats: Any) -> None:
+        """Export every numeric field of a stats dataclass as {name}{component=..., event=field}"""
+        self._stats.setdefault(name, (documentation, []))[1].append((component, stats))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, (documentation, sources) in self._stats.items():
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} counter"]
+            for component, stats in sources:
+                for item in fields(stats):
+                    lines.append(f'{name}{{component="{component}",event="{item.name}"}} {getattr(stats, item.name)}')
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a periodic sleep wakes up
+
+    Lag grows when something blocks the loop (a synchronous parse, a large
+    JSON encode), delaying every in-flight request at once.
+    """
+
+    def __init__(self, histogram: Histogram, gauge: Gauge, interval: float):
+        self.histogram = histogram
+        self.gauge = gauge
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.histogram.observe(lag)
+            self.gauge.set(lag)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+settings = MetricsSettings()
+registry = Registry()
+
+# Fetching
+fetch_seconds = registry.histogram("scraper_fetch_seconds", "Proxy fetch attempt duration", ("outcome",))
+fetch_attempts = registry.histogram("scraper_fetch_attempts", "Attempts used per fetch, including retries", buckets=COUNT_BUCKETS)
+response_bytes = registry.histogram("scraper_response_bytes", "Received response body size", buckets=SIZE_BUCKETS)
+
+# Conversion
+convert_seconds = registry.histogram("scraper_convert_seconds", "Conversion duration per output format, including queueing", ("format",))
+stage_seconds = registry.histogram(
+    "scraper_convert_stage_seconds", "Duration of conversion stages (parse, clean, strip, markdown, links) per output format",
+    ("stage", "format"),
+)
+
+# Load
+inflight = registry.gauge("scraper_inflight_requests", "Scrape requests being processed", ("tool",))
+loop_lag_seconds = registry.histogram("scraper_event_loop_lag_seconds", "Event-loop wake-up delay")
+loop_lag = registry.gauge("scraper_event_loop_lag_last_seconds", "Most recent event-loop wake-up delay")
+loop_lag_monitor = LoopLagMonitor(loop_lag_seconds, loop_lag, settings.loop_lag_interval)
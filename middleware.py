@@ -1,29 +1,71 @@
-import json
-import base64
-from urllib.parse import parse_qs, unquote
+from urllib.parse import parse_qs
+
+from sessions import SessionConfigStore, session_configs
+from logs import get_logger
+
+logger = get_logger("middleware")
+
+SESSION_HEADER = b"mcp-session-id"
+
 
 class SmitheryConfigMiddleware:
-    def __init__(self, app,set_api_key):
+    """
+    Binds the ?config= proxy configuration to the MCP session it belongs to
+
+    Requests of a session whose config is already bound pass straight
+    through without decoding. Otherwise the config is decoded (memoized by
+    its raw value) and bound to the request's mcp-session-id, or, for the
+    initialize request, to the session id the server returns in its
+    response headers. Tools read the config through their Context.
+    """
+
+    def __init__(self, app, store: SessionConfigStore = session_configs):
         self.app = app
-        self.set_api_key = set_api_key 
+        self.store = store
 
     async def __call__(self, scope, receive, send):
-        if scope.get('type') == 'http':
-            query = scope.get('query_string', b'').decode()
-            print(f"query1: {query}")
-            
-            if 'config=' in query:
-                try:
-                    config_b64 = unquote(parse_qs(query)['config'][0])
-                    config = json.loads(base64.b64decode(config_b64))
-                    print(f"config2: {config}")
-                    
-                    self.set_api_key(config)
-                except Exception as e:
-                    print(f"SmitheryConfigMiddleware: Error parsing config: {e}")
-                    config=None
-                    self.set_api_key(config)
-            else:
-                    self.set_api_key(config)
-        
-        await self.app(scope, receive, send)  
+        if scope.get('type') != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        session_id = None
+        for name, value in scope.get('headers', ()):
+            if name == SESSION_HEADER:
+                session_id = value.decode('latin-1')
+                break
+
+        if session_id and scope.get('method') == 'DELETE':
+            # The client is terminating its session
+            await self.store.drop(session_id)
+            await self.app(scope, receive, send)
+            return
+
+        if session_id and await self.store.lookup(session_id) is not None:
+            # Config already bound to this session, skip decoding
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get('query_string', b'').decode()
+        config = None
+        if 'config=' in query:
+            try:
+                config = self.store.decode(parse_qs(query)['config'][0])
+            except (KeyError, ValueError) as e:
+                logger.warning("Invalid session config", extra={"error": str(e)})
+
+        if config is None:
+            await self.app(scope, receive, send)
+        elif session_id:
+            await self.store.bind(session_id, config)
+            await self.app(scope, receive, send)
+        else:
+            # New session: bind the config to the session id assigned in the response
+            async def send_binding_session(message):
+                if message['type'] == 'http.response.start':
+                    for name, value in message.get('headers', ()):
+                        if name.lower() == SESSION_HEADER:
+                            await self.store.bind(value.decode('latin-1'), config)
+                            break
+                await send(message)
+
+            await self.app(scope, receive, send_binding_session)
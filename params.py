@@ -1,6 +1,6 @@
 from typing import Annotated, Literal  
 
-from pydantic import Field  
+from pydantic import BaseModel, Field  
 
 
 URL = Annotated[
@@ -19,13 +19,98 @@ OUTPUT_FORMAT = Annotated[  # Define an Annotated type named OUTPUT_FORMAT
         "links",  # Allow "links"
         "Markdown",  # Allow "Markdown"
         "html",  # Allow "html"
+        "links-json",  # Allow "links-json"
+        "Markdown-diff",  # Allow "Markdown-diff"
     ],
     Field(  # And add a Field
         description=""" # Describes the output format.
         Output format:
-            - links - When you need links or navigation from the page.
+            - links - When you need links or navigation from the page, one "[text] URL" line per unique link.
+            - links-json - Like links, as a JSON array of {"url", "text", "internal"} objects.
             - Markdown - When you need the page in readable MarkDown format.
+            - Markdown-diff - When you re-check a page you fetched before: only the Markdown blocks that are new or changed since the last Markdown-diff fetch, the whole page the first time.
             - html - When you need the page in pure HTML format.
         """
     ),
 ]
+
+
+MAX_OUTPUT = Annotated[
+    int,
+    Field(description="Maximum size of the returned content in max_output_unit units, 0 means unlimited. Conversion stops once it is reached.", ge=0),
+]
+
+MAX_OUTPUT_UNIT = Annotated[
+    Literal["chars", "tokens"],
+    Field(description="Unit of max_output: characters, or approximate LLM tokens (about 4 characters each)."),
+]
+
+MAIN_CONTENT = Annotated[
+    bool,
+    Field(description="Return only the main content block of the page, dropping navigation, sidebars and other boilerplate."),
+]
+
+CLEANING = Annotated[
+    Literal["default", "aggressive", "article-only", "keep-forms"],
+    Field(description="""How the page is cleaned before Markdown conversion:
+        - default - Drop scripts, styles, navigation, footers and forms.
+        - aggressive - Text only: also drop headers, sidebars, widgets, media, hidden elements and ad, cookie or share blocks.
+        - article-only - Keep only the page's main or article element when it has one.
+        - keep-forms - Like default, but keep forms and their labels.
+        """),
+]
+
+LINK_SCOPE = Annotated[
+    Literal["all", "internal", "external"],
+    Field(description="Links returned by the links formats: all, only links within the page's site, or only links leaving it."),
+]
+
+
+RENDER_WAIT = Annotated[
+    int,
+    Field(description="Seconds the unlocker waits for the page's scripts before returning it. Leave unset to wait only on sites whose pages need rendering; 0 for static pages.", ge=0, le=60),
+]
+
+
+class BatchItem(BaseModel):
+    """A single page in a batch scrape"""
+    url: URL
+    render: RENDER = ""
+    output_format: OUTPUT_FORMAT = "Markdown"
+    max_output: MAX_OUTPUT = 0
+    max_output_unit: MAX_OUTPUT_UNIT = "chars"
+    main_content: MAIN_CONTENT = False
+    cleaning: CLEANING = "default"
+    link_scope: LINK_SCOPE = "all"
+    render_wait: RENDER_WAIT | None = None
+
+
+BATCH_ITEMS = Annotated[
+    list[BatchItem],
+    Field(description="The pages to scrape, each with its own url, render and output_format.", min_length=1, max_length=200),
+]
+
+CONCURRENCY = Annotated[
+    int,
+    Field(description="Maximum number of pages scraped at the same time.", ge=1, le=50),
+]
+
+MAX_DEPTH = Annotated[
+    int,
+    Field(description="Number of links followed away from the start URL; 0 scrapes the start URL only.", ge=0, le=5),
+]
+
+MAX_PAGES = Annotated[
+    int,
+    Field(description="Maximum number of pages crawled, the start URL included. The server may cap it lower.", ge=1),
+]
+
+URL_PATTERNS = Annotated[
+    list[str],
+    Field(description='URL patterns with shell wildcards matched against the whole URL, e.g. "*/blog/*" or "https://docs.example.com/*".'),
+]
+
+SAME_SITE = Annotated[
+    bool,
+    Field(description="Follow only links within the start URL's site (ignoring www.)."),
+]
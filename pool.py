@@ -0,0 +1,91 @@
+import os
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+@dataclass
+class PoolSettings:
+    """Connection pool settings, read from environment variables by default"""
+    limit: int = int(os.environ.get("SCRAPER_POOL_LIMIT", 100))  # Total connections per session
+    limit_per_host: int = int(os.environ.get("SCRAPER_POOL_LIMIT_PER_HOST", 20))  # Connections per proxy host
+    keepalive_timeout: float = float(os.environ.get("SCRAPER_POOL_KEEPALIVE", 30))  # Idle keep-alive seconds
+    dns_cache_ttl: int = int(os.environ.get("SCRAPER_POOL_DNS_TTL", 300))  # DNS cache lifetime in seconds
+    total_timeout: float = float(os.environ.get("SCRAPER_POOL_TIMEOUT", 120))  # Per-request total timeout
+
+
+class SessionPool:
+    """
+    Process-wide pool of aiohttp sessions, one per (proxy_url, login, render) key
+
+    Each session owns a keep-alive TCPConnector, so repeated requests through the
+    same proxy reuse already-established connections instead of paying a new
+    TCP+TLS handshake on every attempt.
+    """
+
+    def __init__(self, settings: PoolSettings | None = None):
+        self.settings = settings or PoolSettings()
+        self._sessions: dict[tuple[str, str, str], aiohttp.ClientSession] = {}
+        self._lock = asyncio.Lock()
+
+    def _create_session(self) -> "aiohttp.ClientSession":
+        # Imported on first use, aiohttp is a large share of the server's import time
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.settings.limit,
+            limit_per_host=self.settings.limit_per_host,
+            keepalive_timeout=self.settings.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.settings.dns_cache_ttl,
+        )
+        # Content codings and the unlocker's render headers are sent per request, see fetching.request_headers
+        return aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.settings.total_timeout),
+            connector=connector,
+            max_field_size=32768,
+            # Bodies are decompressed by fetching.BodyDecoder alone, whichever codings this aiohttp version decodes
+            auto_decompress=False,
+        )
+
+    async def get(self, proxy_url: str, login: str, render: str = "") -> "aiohttp.ClientSession":
+        """
+        Get the shared session for a proxy configuration, creating it on first use
+
+        Parameters:
+            proxy_url: Proxy server URL
+            login: Proxy login name
+            render: Render mode selector ("Unlocker" or regular proxy)
+
+        Returns:
+            An open aiohttp.ClientSession owned by the pool
+        """
+        key = (proxy_url, login, render)
+        session = self._sessions.get(key)
+        if session is not None and not session.closed:
+            return session
+        async with self._lock:
+            # Re-check after acquiring the lock, another task may have created it
+            session = self._sessions.get(key)
+            if session is None or session.closed:
+                session = self._create_session()
+                self._sessions[key] = session
+            return session
+
+    async def close(self) -> None:
+        """Close every pooled session and its connector"""
+        async with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            await session.close()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# Shared pool instance for the whole process
+session_pool = SessionPool()
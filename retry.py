@@ -0,0 +1,252 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+
+import metrics
+
+T = TypeVar("T")
+
+# Statuses worth retrying: timeouts, rate limiting and transient server or proxy failures
+RETRYABLE_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524))
+
+
+@dataclass
+class RetrySettings:
+    """Retry policy settings, read from environment variables by default"""
+    attempts: int = int(os.environ.get("SCRAPER_RETRY_ATTEMPTS", 3))  # Maximum attempts per fetch
+    deadline: float = float(os.environ.get("SCRAPER_RETRY_DEADLINE", 90))  # Total seconds for all attempts and waits
+    base_wait: float = float(os.environ.get("SCRAPER_RETRY_BASE_WAIT", 0.5))  # First backoff ceiling in seconds, doubled per retry
+    max_wait: float = float(os.environ.get("SCRAPER_RETRY_MAX_WAIT", 5))  # Largest backoff ceiling in seconds
+    max_retry_after: float = float(os.environ.get("SCRAPER_RETRY_AFTER_MAX", 30))  # Longest Retry-After honored, longer ones fail fast
+    hedge: bool = os.environ.get("SCRAPER_HEDGE", "0").lower() in ("1", "true", "yes")  # Fire a second request when the first is slow
+    hedge_quantile: float = float(os.environ.get("SCRAPER_HEDGE_QUANTILE", 0.95))  # Latency quantile after which the hedge fires
+    hedge_min_delay: float = float(os.environ.get("SCRAPER_HEDGE_MIN_DELAY", 1.0))  # Never hedge earlier than this many seconds
+    hedge_min_samples: int = 20  # Successful fetches observed before hedging starts
+
+
+@dataclass
+class RetryStats:
+    """Retry policy counters"""
+    attempts: int = 0
+    retries: int = 0
+    terminal: int = 0  # Failures not retried because they cannot succeed
+    exhausted: int = 0  # Failures after all attempts or the deadline were used up
+    hedges: int = 0  # Hedged second requests started
+    hedge_wins: int = 0  # Hedged requests that answered first
+
+
+class FetchError(Exception):
+    """
+    A failed fetch attempt, classified for the retry policy
+
+    Attributes:
+        status: HTTP status code, None for network errors and timeouts
+        retryable: Whether another attempt may succeed
+        retry_after: Seconds the server asked to wait, None when not given
+        timeout: Whether the attempt timed out
+        proxy: Whether the proxy failed (refused the tunnel or its credentials, could not be reached), not the target site
+    """
+
+    def __init__(
+        self, message: str, status: int | None = None, retryable: bool = True, retry_after: float | None = None,
+        timeout: bool = False, proxy: bool = False,
+    ):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.proxy = proxy
+
+    @classmethod
+    def from_status(cls, status: int, message: str, retry_after: str | None = None, proxy: bool = False) -> "FetchError":
+        """Classify a non-success HTTP status"""
+        return cls(
+            message, status=status, retryable=status in RETRYABLE_STATUSES, retry_after=parse_retry_after(retry_after), proxy=proxy,
+        )
+
+    @property
+    def target_failure(self) -> bool:
+        """Whether the failure says the target site is struggling: it answered 429 or 5xx, or the attempt timed out"""
+        if self.proxy:
+            return False
+        if self.status is None:
+            return self.timeout
+        return self.status == 429 or self.status >= 500
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header given as seconds or an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """Recent successful fetch latencies, used to derive the hedge delay"""
+
+    def __init__(self, size: int = 256):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# Start time of the running attempt, in a list so attempt_started can move it from inside the attempt
+_attempt_started: ContextVar[list[float] | None] = ContextVar("attempt_started", default=None)
+
+
+def attempt_started() -> None:
+    """
+    Start the running attempt's latency clock now
+
+    Called by an attempt once it is through its own queues (e.g. a rate
+    limiter granted its slot), so waiting there does not inflate the
+    latency samples the hedge delay is computed from.
+    """
+    started = _attempt_started.get()
+    if started is not None:
+        started[0] = time.monotonic()
+
+
+class RetryPolicy:
+    """
+    Runs fetch attempts with classified retries under a total deadline
+
+    Terminal errors (most 4xx statuses) fail immediately. Retryable errors
+    (429, 5xx, timeouts, connection errors) are retried with full-jitter
+    exponential backoff, waiting at least as long as Retry-After asks,
+    while the total deadline allows it. Exceptions other than FetchError
+    are never retried. With hedging on, a second request is started when
+    the first has not answered within the observed latency quantile, and
+    whichever succeeds first is used.
+    """
+
+    def __init__(self, settings: RetrySettings | None = None):
+        self.settings = settings or RetrySettings()
+        self.stats = RetryStats()
+        self.latency = LatencyTracker()
+
+    def backoff(self, retry: int, retry_after: float | None = None) -> float:
+        """Wait before the given retry (1-based): full jitter, at least retry_after"""
+        ceiling = min(self.settings.max_wait, self.settings.base_wait * 2 ** (retry - 1))
+        wait = random.uniform(0, ceiling)
+        if retry_after is not None:
+            wait = max(wait, retry_after)
+        return wait
+
+    def hedge_delay(self) -> float | None:
+        """Seconds after which a hedged request fires, None when hedging is off or not yet calibrated"""
+        if not self.settings.hedge or len(self.latency) < self.settings.hedge_min_samples:
+            return None
+        return max(self.settings.hedge_min_delay, self.latency.quantile(self.settings.hedge_quantile))
+
+    async def run(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run attempt until it succeeds, fails terminally, or attempts or deadline run out
+
+        Parameters:
+            attempt: Coroutine function performing one fetch, raising FetchError on failure
+
+        Returns:
+            The result of the first successful attempt
+        """
+        deadline = time.monotonic() + self.settings.deadline
+        retry = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                async with asyncio.timeout(max(0.0, remaining)):
+                    result = await self._attempt(attempt)
+                metrics.fetch_attempts.observe(retry + 1)
+                return result
+            except TimeoutError:
+                error = FetchError(f"Retry deadline of {self.settings.deadline:g}s exceeded")
+                self.stats.exhausted += 1
+                metrics.fetch_attempts.observe(retry + 1)
+                raise error from None
+            except FetchError as e:
+                if not e.retryable:
+                    self.stats.terminal += 1
+                    metrics.fetch_attempts.observe(retry + 1)
+                    raise
+                retry += 1
+                wait = self.backoff(retry, e.retry_after)
+                if e.retry_after is not None and e.retry_after > self.settings.max_retry_after:
+                    self.stats.exhausted += 1
+                    metrics.fetch_attempts.observe(retry)
+                    raise
+                if retry >= self.settings.attempts or time.monotonic() + wait >= deadline:
+                    self.stats.exhausted += 1
+                    metrics.fetch_attempts.observe(retry)
+                    raise
+                self.stats.retries += 1
+                await asyncio.sleep(wait)
+
+    async def _attempt(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(attempt)
+        return await self._hedged(attempt, delay)
+
+    async def _timed(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        self.stats.attempts += 1
+        started = [time.monotonic()]
+        token = _attempt_started.set(started)
+        try:
+            result = await attempt()
+        finally:
+            _attempt_started.reset(token)
+        self.latency.observe(time.monotonic() - started[0])
+        return result
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[T]], delay: float) -> T:
+        primary = asyncio.ensure_future(self._timed(attempt))
+        hedge = None
+        pending = {primary}
+        error = None
+        try:
+            while pending:
+                timeout = delay if hedge is None else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The first request is slower than usual, race a second one against it
+                    self.stats.hedges += 1
+                    hedge = asyncio.ensure_future(self._timed(attempt))
+                    pending.add(hedge)
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+# Shared retry policy for proxy fetches
+retry_policy = RetryPolicy()
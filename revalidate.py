@@ -0,0 +1,240 @@
+import os
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+
+from cache import LRUStore, cache_key, content_hash
+
+# Output format returning only the Markdown blocks that changed since the last fetch of the page
+DIFF_FORMAT = "Markdown-diff"
+# Returned in DIFF_FORMAT when the page's Markdown did not change
+NO_CHANGES = "[no changes since last fetch]"
+
+re_blank_lines = re.compile(r"\n\s*\n")
+
+
+@dataclass
+class RevalidationSettings:
+    """Revalidation store settings, read from environment variables by default"""
+    ttl: float = float(os.environ.get("SCRAPER_REVALIDATE_TTL", 24 * 3600))  # Seconds a page's validators are kept, 0 disables revalidation
+    max_bytes: int = int(os.environ.get("SCRAPER_REVALIDATE_MAX_BYTES", 64 * 1024 * 1024))  # In-memory byte budget
+
+
+@dataclass
+class RevalidationStats:
+    """Revalidation counters"""
+    conditional: int = 0  # Fetches sent with If-None-Match or If-Modified-Since
+    not_modified: int = 0  # 304 answers, served from the stored page
+    unchanged: int = 0  # Full answers whose content hash matched the stored page
+    changed: int = 0  # Full answers with new content
+    reused: int = 0  # Conversions skipped by reusing the output of an unchanged page
+    saved_bytes: int = 0  # Page characters not transferred thanks to 304 answers
+    evictions: int = 0
+    expirations: int = 0
+
+
+@dataclass
+class _Page:
+    """Last fetched version of a page"""
+    digest: str  # content_hash of the body
+    body: bytes  # zlib compressed body
+    length: int  # Body length in characters
+    etag: str = ""
+    last_modified: str = ""
+    outputs: dict = field(default_factory=dict)  # Converted outputs of this body by conversion key
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(key) + len(value) for key, value in self.outputs.items())
+
+
+class Conditional:
+    """
+    Validators of the stored page sent with a fetch, and what the answer said about them
+
+    Attributes:
+        not_modified: Set by the fetch when the server answered 304
+        etag, last_modified: Validators of the answer, empty when it sent none
+    """
+
+    def __init__(self, page: _Page | None = None):
+        self.page = page
+        self.not_modified = False
+        self.etag = ""
+        self.last_modified = ""
+        self.digest: str | None = None
+
+    def request_headers(self) -> dict | None:
+        """Conditional request headers, None when there is nothing to revalidate"""
+        if self.page is None:
+            return None
+        headers = {}
+        if self.page.etag:
+            headers["If-None-Match"] = self.page.etag
+        if self.page.last_modified:
+            headers["If-Modified-Since"] = self.page.last_modified
+        return headers or None
+
+    def update(self, headers) -> None:
+        """Read the validators of a response"""
+        self.etag = headers.get("ETag", "")
+        self.last_modified = headers.get("Last-Modified", "")
+
+
+def split_blocks(markdown: str) -> list[str]:
+    """Blocks of a Markdown document, separated by blank lines"""
+    return [block.strip("\n") for block in re_blank_lines.split(markdown) if block.strip()]
+
+
+def markdown_diff(previous: str, current: str) -> str:
+    """
+    Blocks of current that previous does not have, in document order
+
+    Blocks are compared whole, so an edited paragraph is returned in its new
+    form; repeated blocks count once per occurrence. Removed and moved blocks
+    are not reported.
+    """
+    remaining = Counter(split_blocks(previous))
+    changed = []
+    for block in split_blocks(current):
+        if remaining[block]:
+            remaining[block] -= 1
+        else:
+            changed.append(block)
+    return "\n\n".join(changed)
+
+
+class RevalidationStore:
+    """
+    Validators, content hash and converted outputs of the last fetch of each page
+
+    Keyed like the response cache by (normalized URL, render mode), but kept
+    much longer: once a response cache entry expires, the next fetch of the
+    page is sent with If-None-Match / If-Modified-Since, and a 304 answer is
+    served from the stored, compressed body. When the server ignores the
+    validators, a body with the same content hash counts as unchanged. Either
+    way the outputs converted from that body are returned again without
+    converting. The Markdown returned by DIFF_FORMAT requests is kept as the
+    baseline of the next one by the same caller, so clients monitoring the
+    same page each get their own changes. State is per process.
+    """
+
+    def __init__(self, settings: RevalidationSettings | None = None):
+        self.settings = settings or RevalidationSettings()
+        self.stats = RevalidationStats()
+        self._memory = LRUStore(self.settings.max_bytes, self.stats)
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.ttl > 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._memory.size_bytes
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _page(self, key: str) -> _Page | None:
+        return self._memory.get(key) if self.enabled else None
+
+    def _store(self, key: str, page: _Page) -> None:
+        self._memory.put(key, page, self.settings.ttl, page.size)
+
+    def conditional(self, url: str, render: str = "") -> Conditional:
+        """Validators to send with the next fetch of a page"""
+        conditional = Conditional(self._page(cache_key(url, render)))
+        if conditional.request_headers():
+            self.stats.conditional += 1
+        return conditional
+
+    def record(self, url: str, render: str, conditional: Conditional, body: str) -> str:
+        """
+        Record the answer to a fetch sent with conditional
+
+        Parameters:
+            url: Page URL
+            render: Render mode selector, part of the key
+            conditional: The Conditional the fetch was sent with
+            body: The fetched body, empty on a 304 answer
+
+        Returns:
+            The page body: the fetched one, or the stored one on a 304 answer
+        """
+        page = conditional.page
+        if conditional.not_modified and page is not None:
+            self.stats.not_modified += 1
+            self.stats.saved_bytes += page.length
+            conditional.digest = page.digest
+            # A 304 may carry updated validators
+            page.etag = conditional.etag or page.etag
+            page.last_modified = conditional.last_modified or page.last_modified
+            self._store(cache_key(url, render), page)
+            return zlib.decompress(page.body).decode("utf-8", "surrogatepass")
+        if not body or not self.enabled:
+            return body
+        conditional.digest = content_hash(body)
+        if page is not None and page.digest == conditional.digest:
+            self.stats.unchanged += 1
+            page.etag, page.last_modified = conditional.etag, conditional.last_modified
+        else:
+            if page is not None:
+                self.stats.changed += 1
+            page = _Page(
+                conditional.digest, zlib.compress(body.encode("utf-8", "surrogatepass"), 1), len(body),
+                conditional.etag, conditional.last_modified,
+            )
+        self._store(cache_key(url, render), page)
+        return body
+
+    def output(self, url: str, render: str, digest: str, key: str) -> str | None:
+        """Output converted earlier from the page body with this digest, None when there is none"""
+        page = self._page(cache_key(url, render))
+        if page is None or page.digest != digest:
+            return None
+        value = page.outputs.get(key)
+        if value is not None:
+            self.stats.reused += 1
+        return value
+
+    def keep_output(self, url: str, render: str, digest: str, key: str, value: str) -> None:
+        """Keep an output converted from the page body with this digest"""
+        page_key = cache_key(url, render)
+        page = self._page(page_key)
+        if page is None or page.digest != digest or not value:
+            return
+        page.outputs[key] = value
+        self._store(page_key, page)
+
+    def diff(self, url: str, render: str, variant: str, markdown: str, caller: str = "") -> str:
+        """
+        Markdown blocks changed since the caller's last DIFF_FORMAT request for the page
+
+        The first request returns the whole Markdown. markdown becomes the
+        baseline of the caller's next request.
+
+        Parameters:
+            url: Page URL
+            render: Render mode selector, part of the key
+            variant: Conversion options the Markdown was produced with, baselines are kept per variant
+            markdown: Current Markdown of the page
+            caller: Identifies who asks, e.g. the MCP session ID; baselines are kept per caller
+        """
+        key = f"{cache_key(url, render)}|diff{variant}|{caller}"
+        previous = self._memory.get(key) if self.enabled else None
+        if self.enabled:
+            self._memory.put(key, markdown, self.settings.ttl)
+        if previous is None:
+            return markdown
+        if previous == markdown:
+            return NO_CHANGES
+        return markdown_diff(previous, markdown) or NO_CHANGES
+
+    def clear(self) -> None:
+        """Drop every page and baseline"""
+        self._memory.clear()
+
+
+# Shared revalidation store instance for the whole process
+revalidation_store = RevalidationStore()
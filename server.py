@@ -1,43 +1,75 @@
 import os  # Import operating system interface module
 import uvicorn  # Import ASGI server for running FastAPI/Starlette applications
 from starlette.middleware.cors import CORSMiddleware  # Import CORS middleware for handling cross-origin requests
+import time
 import asyncio
-import traceback
+import logging
 import json
-from dataclasses import dataclass
-from typing import Any
-import aiohttp
-import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+import hashlib
+import shutil
+import atexit
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
 from fastmcp import FastMCP, Context
 from mcp.types import ToolAnnotations
 from fastmcp.exceptions import ToolError
-from aiohttp import ClientTimeout
-from markdownify import markdownify
-from lxml.html import defs, fromstring, tostring
-from lxml.html.clean import Cleaner
-from datetime import datetime
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
 from pydantic import BaseModel, Field
-from smithery.decorators import smithery
-from smithery.utils.config import parse_config_from_query_string
 import params as params
 from middleware import SmitheryConfigMiddleware  # Import custom Smithery configuration middleware
-
-
-from typing import Optional
-
-current_config: Optional[dict] = None
-
-def set_api_key(config: dict) -> None:
-    global current_config
-    current_config = config
+from pool import session_pool  # Import process-wide proxy session pool
+import engine  # Import single-parse conversion engine
+from executor import content_executor  # Import off-loop content processing executor
+from cache import response_cache, conversion_cache, content_hash  # Import response and converted output caches
+from revalidate import revalidation_store, Conditional, DIFF_FORMAT  # Import per-page validators and Markdown diffs
+from batch import run_bounded, BATCH_CONCURRENCY, BATCH_PER_HOST  # Import bounded, host-fair task runner
+from crawl import Crawler, crawl_settings, crawl_stats  # Import bounded site crawler
+from budget import OutputBudget, truncate  # Import output size budget
+from links import LINK_FORMATS  # Import link output formats
+from snapshot import snapshot_store  # Import background page snapshot writer
+from streaming import StreamingConverter, BodyTooLargeError, MAX_BODY_BYTES, STREAMING_ENABLED, CHUNK_SIZE  # Import incremental converter
+from sessions import session_configs  # Import per-session proxy configuration store
+from retry import FetchError, attempt_started, retry_policy  # Import classified retry policy
+from fetching import BodyDecoder, ContentDecodingError, FetchProfile, fetch_key, fetch_settings, fetch_stats, needs_render, render_waits, request_headers  # Import compression, charset and render wait profiles
+from limiter import domain_limiter  # Import per-domain rate limiter and circuit breaker
+import metrics  # Import Prometheus-style metrics registry
+from logs import configure_logging, get_logger  # Import structured, redacted logging
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = get_logger("server")
+
+# Worker processes serving the app, each converting pages on its own core
+WORKERS = int(os.environ.get("SCRAPER_WORKERS", 1))
+# Stateless HTTP keeps no MCP session in the worker, so any worker can answer any request of a session.
+# On by default with several workers; turn it off only behind a load balancer with mcp-session-id affinity
+STATELESS_HTTP = os.environ.get("SCRAPER_STATELESS_HTTP", "1" if WORKERS > 1 else "0").lower() in ("1", "true", "yes")
+# Markdown-diff needs to recognize the caller's next request, see diff_caller
+DIFF_NO_CALLER = (
+    "Markdown-diff needs a stateful MCP session or a ?config= proxy configuration to keep the page's baseline per client"
+)
+# Load the fetch and conversion code in the background once the server is listening, see warm_up
+WARM_UP = os.environ.get("SCRAPER_WARM_UP", "1").lower() in ("1", "true", "yes")
+# Page converted by warm_up
+WARM_UP_PAGE = "<html><head><title>warm up</title></head><body><h1>Warm up</h1><p>Warm <a href='/'>up</a></p></body></html>"
 
 """Create and return FastMCP server instance"""
 # Create FastMCP server instance
 mcp = FastMCP(
     name="Scrape",
     instructions="""
-        The parse_with_ai_selectors method uses proxy or unlocker to crawl and parse web pages according to user needs, with output format options: "html", "links", "Markdown"
+        The parse_with_ai_selectors method uses proxy or unlocker to crawl and parse web pages according to user needs, with output format options: "html", "links", "links-json", "Markdown", "Markdown-diff"
+        The parse_many_with_ai_selectors method scrapes many pages concurrently in one call and returns a per-URL success or error result
+        The crawl_with_ai_selectors method crawls a site from a start URL up to max_depth links and max_pages pages, with include/exclude URL patterns, in one call
+        Both accept max_output (characters or approximate tokens) and main_content to keep responses small; conversion stops once the budget is reached
+        Both accept cleaning ("default", "aggressive", "article-only", "keep-forms") to choose what Markdown output keeps
+        Links are resolved to absolute URLs and deduplicated; link_scope ("all", "internal", "external") filters them
+        "Markdown-diff" returns only the Markdown blocks that changed since the session last fetched the page in that format
+        render_wait sets the seconds the unlocker waits for a page's scripts; by default it waits only on sites whose pages need rendering
     """
 )
 
@@ -50,15 +82,39 @@ class ProxyConfig:
     password: str
     
 
-class ScrapeRetryException(Exception):
-    """Web scraping retry exception, used to trigger retry mechanism when scraping fails"""
+class ScrapeRetryException(FetchError):
+    """Web scraping exception, classified as retryable or terminal for the retry policy"""
     pass
 
+class CrawlResult(BaseModel):
+    """Result of a single page in a site crawl"""
+    url: str = Field(description="The URL that was scraped")
+    depth: int = Field(description="Number of links between the start URL and this page")
+    ok: bool = Field(description="Whether the page was scraped and converted successfully")
+    content: str | None = Field(default=None, description="Converted page content when ok is true")
+    error: str | None = Field(default=None, description="Error message when ok is false")
+
+
+class BatchResult(BaseModel):
+    """Result of a single URL in a batch scrape"""
+    url: str = Field(description="The URL that was scraped")
+    ok: bool = Field(description="Whether the URL was scraped and converted successfully")
+    content: str | None = Field(default=None, description="Converted page content when ok is true")
+    error: str | None = Field(default=None, description="Error message when ok is false")
+
+
 @mcp.tool(annotations=ToolAnnotations(readOnlyHint=True), enabled=True, meta={"author": "tom", "version": "v1.0"})
 async def parse_with_ai_selectors( 
                                     url: params.URL,
                                     render: params.RENDER, 
                                     output_format: params.OUTPUT_FORMAT,
+                                    ctx: Context,
+                                    max_output: params.MAX_OUTPUT = 0,
+                                    max_output_unit: params.MAX_OUTPUT_UNIT = "chars",
+                                    main_content: params.MAIN_CONTENT = False,
+                                    cleaning: params.CLEANING = "default",
+                                    link_scope: params.LINK_SCOPE = "all",
+                                    render_wait: params.RENDER_WAIT | None = None,
                                     ) -> str:
     """
     Use proxy or unlocker to crawl and parse web pages
@@ -66,16 +122,327 @@ async def parse_with_ai_selectors(
     Parameters:
         url: The URL of the web page to parse
         render: Proxy configuration selector ("Unlocker" for unlocker, other values for regular proxy)
-        output_format: Output format ("html", "links", "MarkDown")
+        output_format: Output format ("html", "links", "links-json", "Markdown", "Markdown-diff")
+        ctx: FastMCP context, identifies the session whose proxy configuration is used
+        max_output: Maximum size of the returned content, 0 means unlimited
+        max_output_unit: Unit of max_output ("chars" or approximate "tokens")
+        main_content: Return only the densest content block of the page
+        cleaning: Cleaning profile applied before Markdown conversion
+        link_scope: Links returned by the links formats ("all", "internal" or "external")
+        render_wait: Seconds the unlocker waits for the page's scripts, None adapts it to the site
         
     """
-    
-    
-    print("current_config:", current_config)
-    # try:
-       
-        # Get proxy configuration from session configuration
-    if current_config is None:
+    thor_mcp_budget = OutputBudget.from_params(max_output, max_output_unit, main_content, cleaning, link_scope)
+    thor_mcp_config = await session_config(ctx)
+    metrics.inflight.inc(tool="parse_with_ai_selectors")
+    try:
+        return await scrape_and_convert(
+            url, render, output_format, thor_mcp_budget, thor_mcp_config, FetchProfile.from_params(render_wait),
+            diff_caller(ctx, thor_mcp_config),
+        )
+    finally:
+        metrics.inflight.dec(tool="parse_with_ai_selectors")
+
+
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True), enabled=True, meta={"author": "tom", "version": "v1.0"})
+async def parse_many_with_ai_selectors(
+                                    items: params.BATCH_ITEMS,
+                                    ctx: Context,
+                                    concurrency: params.CONCURRENCY = BATCH_CONCURRENCY,
+                                    ) -> list[BatchResult]:
+    """
+    Use proxy or unlocker to crawl and parse many web pages concurrently
+
+    Parameters:
+        items: Pages to scrape, each with its own url, render and output_format
+        ctx: FastMCP context, used to report progress as each page finishes and to find the session's proxy configuration
+        concurrency: Maximum number of pages scraped at the same time
+
+    Returns:
+        One result per item in input order; a failing URL does not fail the batch
+    """
+    thor_mcp_config = await session_config(ctx)
+    thor_mcp_session = diff_caller(ctx, thor_mcp_config)
+    thor_mcp_results: list[BatchResult | None] = [None] * len(items)
+    thor_mcp_done = 0
+
+    async def thor_mcp_worker(index: int, item: params.BatchItem) -> None:
+        nonlocal thor_mcp_done
+        try:
+            thor_mcp_budget = OutputBudget.from_params(
+                item.max_output, item.max_output_unit, item.main_content, item.cleaning, item.link_scope,
+            )
+            thor_mcp_content = await scrape_and_convert(
+                item.url, item.render, item.output_format, thor_mcp_budget, thor_mcp_config,
+                FetchProfile.from_params(item.render_wait), thor_mcp_session,
+            )
+            thor_mcp_results[index] = BatchResult(url=item.url, ok=True, content=thor_mcp_content)
+        except Exception as e:
+            thor_mcp_results[index] = BatchResult(url=item.url, ok=False, error=str(e) or type(e).__name__)
+        thor_mcp_done += 1
+        # Stream per-item status to the client as soon as the page finishes
+        thor_mcp_status = "ok" if thor_mcp_results[index].ok else f"error: {thor_mcp_results[index].error}"
+        await ctx.report_progress(thor_mcp_done, len(items), f"{item.url} {thor_mcp_status}")
+
+    metrics.inflight.inc(tool="parse_many_with_ai_selectors")
+    try:
+        await run_bounded(
+            items,
+            thor_mcp_worker,
+            lambda item: item.url,
+            concurrency=concurrency,
+            per_host=BATCH_PER_HOST,
+        )
+    finally:
+        metrics.inflight.dec(tool="parse_many_with_ai_selectors")
+    return thor_mcp_results
+
+
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True), enabled=True, meta={"author": "tom", "version": "v1.0"})
+async def crawl_with_ai_selectors(
+                                    url: params.URL,
+                                    render: params.RENDER,
+                                    ctx: Context,
+                                    output_format: params.OUTPUT_FORMAT = "Markdown",
+                                    max_depth: params.MAX_DEPTH = 2,
+                                    max_pages: params.MAX_PAGES = 50,
+                                    include: params.URL_PATTERNS | None = None,
+                                    exclude: params.URL_PATTERNS | None = None,
+                                    same_site: params.SAME_SITE = True,
+                                    max_output: params.MAX_OUTPUT = 0,
+                                    max_output_unit: params.MAX_OUTPUT_UNIT = "chars",
+                                    main_content: params.MAIN_CONTENT = False,
+                                    cleaning: params.CLEANING = "default",
+                                    concurrency: params.CONCURRENCY = crawl_settings.concurrency,
+                                    render_wait: params.RENDER_WAIT | None = None,
+                                    ) -> list[CrawlResult]:
+    """
+    Use proxy or unlocker to crawl a site from a start URL, following its links
+
+    Parameters:
+        url: The URL the crawl starts from
+        render: Proxy configuration selector ("Unlocker" for unlocker, other values for regular proxy)
+        ctx: FastMCP context, used to report progress as each page finishes and to find the session's proxy configuration
+        output_format: Output format of every page ("html", "links", "links-json", "Markdown", "Markdown-diff")
+        max_depth: Number of links followed away from the start URL
+        max_pages: Maximum number of pages crawled, capped at SCRAPER_CRAWL_MAX_PAGES
+        include: URL patterns a followed link must match one of, all links when empty
+        exclude: URL patterns of links never followed
+        same_site: Follow only links within the start URL's site
+        max_output: Maximum size of each page's content, 0 means unlimited
+        max_output_unit: Unit of max_output ("chars" or approximate "tokens")
+        main_content: Return only the densest content block of each page
+        cleaning: Cleaning profile applied before Markdown conversion
+        concurrency: Maximum number of pages scraped at the same time
+        render_wait: Seconds the unlocker waits for each page's scripts, None adapts it to the site
+
+    Returns:
+        One result per crawled page in the order they finished; a failing page does not fail the crawl
+    """
+    thor_mcp_config = await session_config(ctx)
+    thor_mcp_proxy = proxy_config_for(render, thor_mcp_config)
+    thor_mcp_budget = OutputBudget.from_params(max_output, max_output_unit, main_content, cleaning)
+    # Links to follow are extracted by the links engine: resolved, normalized and deduplicated
+    thor_mcp_links_budget = OutputBudget(link_scope="internal" if same_site else "all")
+    thor_mcp_profile = FetchProfile.from_params(render_wait)
+    thor_mcp_render = fetch_key(render, thor_mcp_profile)
+    thor_mcp_session = diff_caller(ctx, thor_mcp_config)
+    if output_format == DIFF_FORMAT and thor_mcp_session is None:
+        raise ToolError(DIFF_NO_CALLER)
+    thor_mcp_results: list[CrawlResult] = []
+    thor_mcp_crawler = None
+
+    async def thor_mcp_page(page_url: str, depth: int) -> list[str] | None:
+        thor_mcp_links = None
+        try:
+            thor_mcp_html, thor_mcp_digest = await fetch_page(page_url, render, thor_mcp_proxy, thor_mcp_profile)
+            thor_mcp_content = await convert_page(
+                page_url, thor_mcp_render, thor_mcp_html, output_format, thor_mcp_budget, thor_mcp_digest, thor_mcp_session,
+            )
+            thor_mcp_links = []
+            if depth < max_depth:
+                thor_mcp_json = await convert_page(
+                    page_url, thor_mcp_render, thor_mcp_html, "links-json", thor_mcp_links_budget, thor_mcp_digest,
+                )
+                thor_mcp_links = [link["url"] for link in json.loads(thor_mcp_json)]
+            thor_mcp_result = CrawlResult(url=page_url, depth=depth, ok=True, content=thor_mcp_content)
+        except Exception as e:
+            thor_mcp_result = CrawlResult(url=page_url, depth=depth, ok=False, error=str(e) or type(e).__name__)
+        thor_mcp_results.append(thor_mcp_result)
+        # Stream per-page status to the client as soon as the page finishes; the total grows as links are found
+        thor_mcp_status = "ok" if thor_mcp_result.ok else f"error: {thor_mcp_result.error}"
+        await ctx.report_progress(len(thor_mcp_results), thor_mcp_crawler.queued, f"{page_url} {thor_mcp_status}")
+        return thor_mcp_links
+
+    thor_mcp_crawler = Crawler(
+        thor_mcp_page,
+        max_depth=max_depth,
+        max_pages=min(max_pages, crawl_settings.max_pages),
+        include=include,
+        exclude=exclude,
+        concurrency=concurrency,
+    )
+    metrics.inflight.inc(tool="crawl_with_ai_selectors")
+    try:
+        await thor_mcp_crawler.run(url)
+    finally:
+        metrics.inflight.dec(tool="crawl_with_ai_selectors")
+    return thor_mcp_results
+
+
+@mcp.custom_route("/metrics", methods=["GET"], include_in_schema=False)
+async def metrics_endpoint(request: Request) -> Response:
+    """
+    Prometheus scrape endpoint
+
+    Returns:
+        All metrics in the Prometheus text exposition format, 404 when SCRAPER_METRICS is off
+    """
+    if not metrics.settings.enabled:
+        return PlainTextResponse("Metrics are disabled\n", status_code=404)
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def collect_cache_ratios() -> list[str]:
+    """Hit ratio of the response and conversion caches, joined in-flight requests counted as hits"""
+    thor_mcp_lines = [
+        "# HELP scraper_cache_hit_ratio Share of lookups answered without fetching or converting",
+        "# TYPE scraper_cache_hit_ratio gauge",
+    ]
+    for thor_mcp_name, thor_mcp_cache in (("response", response_cache), ("conversion", conversion_cache)):
+        thor_mcp_lines.append(f'scraper_cache_hit_ratio{{cache="{thor_mcp_name}"}} {thor_mcp_cache.stats.hit_ratio}')
+    thor_mcp_lines += [
+        "# HELP scraper_convert_pending Conversions queued or running on the content executor",
+        "# TYPE scraper_convert_pending gauge",
+        f"scraper_convert_pending {content_executor.pending}",
+    ]
+    return thor_mcp_lines
+
+
+# Export the counters the shared components already keep
+metrics.registry.stats("scraper_events_total", "Component event counters", "response_cache", response_cache.stats)
+metrics.registry.stats("scraper_events_total", "Component event counters", "conversion_cache", conversion_cache.stats)
+metrics.registry.stats("scraper_events_total", "Component event counters", "revalidation", revalidation_store.stats)
+metrics.registry.stats("scraper_events_total", "Component event counters", "crawl", crawl_stats)
+metrics.registry.stats("scraper_events_total", "Component event counters", "fetch", fetch_stats)
+metrics.registry.stats("scraper_events_total", "Component event counters", "retry", retry_policy.stats)
+metrics.registry.stats("scraper_events_total", "Component event counters", "limiter", domain_limiter.stats)
+metrics.registry.stats("scraper_events_total", "Component event counters", "snapshot", snapshot_store.stats)
+metrics.registry.stats("scraper_events_total", "Component event counters", "sessions", session_configs.stats)
+metrics.registry.collector(collect_cache_ratios)
+
+
+async def session_config(ctx: Context) -> dict | None:
+    """
+    Proxy configuration of the MCP session making the request
+
+    Parameters:
+        ctx: FastMCP context of the tool call
+
+    Returns:
+        The config bound to the session by SmitheryConfigMiddleware, falling back to the
+        ?config= parameter of the current HTTP request, or None when neither exists
+    """
+    thor_mcp_config = await session_configs.lookup(ctx.session_id)
+    if thor_mcp_config is not None:
+        return thor_mcp_config
+    # Not bound to a session (e.g. stateless HTTP), read the current request instead
+    thor_mcp_request = ctx.request_context.request
+    thor_mcp_raw = thor_mcp_request.query_params.get("config") if thor_mcp_request is not None else None
+    if not thor_mcp_raw:
+        return None
+    try:
+        return session_configs.decode(thor_mcp_raw)
+    except ValueError:
+        return None
+
+
+def diff_caller(ctx: Context, config: dict | None) -> str | None:
+    """
+    Stable identity of the calling client, the key of its Markdown-diff baselines
+
+    Stateless HTTP (the default with several workers) gives every request a new
+    session ID, under which no baseline would ever be found again, so its
+    requests are told apart by their proxy configuration instead.
+
+    Parameters:
+        ctx: FastMCP context of the tool call
+        config: Proxy configuration of the calling session, see session_config
+
+    Returns:
+        The session ID of a stateful HTTP or stdio session; for a request without an
+        mcp-session-id, a hash of its proxy configuration, or None when it has none
+    """
+    thor_mcp_request = ctx.request_context.request
+    if thor_mcp_request is None or thor_mcp_request.headers.get("mcp-session-id"):
+        return ctx.session_id
+    if not config:
+        return None
+    return "config:" + hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+async def scrape_and_convert(
+    url: str, render: str, output_format: str, budget: OutputBudget | None = None, config: dict | None = None,
+    profile: FetchProfile | None = None, caller: str | None = "",
+) -> str:
+    """
+    Scrape a single page through the configured proxy and convert it to the requested format
+
+    Parameters:
+        url: The URL of the web page to parse
+        render: Proxy configuration selector ("Unlocker" for unlocker, other values for regular proxy)
+        output_format: Output format ("html", "links", "links-json", "Markdown", "Markdown-diff")
+        budget: Optional output size, main-content limits, cleaning profile and link scope
+        config: Proxy configuration of the calling session
+        profile: Unlocker render profile, None for the defaults (adaptive render wait)
+        caller: Identity of the caller (see diff_caller), Markdown-diff baselines are kept per caller;
+            None when it has no stable identity, which Markdown-diff needs
+
+    Returns:
+        Converted page content, raises ToolError on failure
+    """
+    if output_format == DIFF_FORMAT and caller is None:
+        raise ToolError(DIFF_NO_CALLER)
+    thor_mcp_myProxyConfig = proxy_config_for(render, config)
+
+    if (
+        STREAMING_ENABLED and output_format not in ("html", DIFF_FORMAT)
+        and not (budget and (budget.main_content or budget.profile != "default" or budget.link_scope != "all"))
+    ):
+        # Convert while the body downloads, the raw page is never held in memory
+        try:
+            thor_mcp_result = await scrape(
+                url, thor_mcp_myProxyConfig, render,
+                stream_format=output_format, max_chars=budget.max_chars if budget else 0,
+                # A streamed body is converted before it could be checked for an app shell, so the wait is not adaptive
+                profile=render_waits.profile(url, render, profile, adaptive=False),
+            )
+        except BodyTooLargeError as e:
+            raise ToolError(str(e))
+        if not thor_mcp_result:
+            raise ToolError(f"Web scraping failed, unable to get content")
+        return thor_mcp_result
+
+    thor_mcp_html, thor_mcp_digest = await fetch_page(url, render, thor_mcp_myProxyConfig, profile)
+    return await convert_page(url, fetch_key(render, profile), thor_mcp_html, output_format, budget, thor_mcp_digest, caller)
+
+
+def proxy_config_for(render: str, config: dict | None) -> ProxyConfig:
+    """
+    Proxy configuration selected by render from a session's configuration
+
+    Parameters:
+        render: Proxy configuration selector ("Unlocker" for unlocker, other values for regular proxy)
+        config: Proxy configuration of the calling session
+
+    Returns:
+        The unlocker or regular proxy configuration
+
+    Exceptions:
+        ToolError: Thrown when the selected proxy's URL, login or password is missing
+    """
+    # Get proxy configuration from session configuration
+    if config is None:
         unlocker_proxy_url = None
         unlocker_proxy_login = None
         unlocker_proxy_password = None
@@ -83,12 +450,12 @@ async def parse_with_ai_selectors(
         default_proxy_login = None
         default_proxy_password = None
     else:
-        unlocker_proxy_url = current_config.get("unlocker_proxy_url")
-        unlocker_proxy_login = current_config.get("unlocker_proxy_login")
-        unlocker_proxy_password = current_config.get("unlocker_proxy_password")
-        default_proxy_url = current_config.get("default_proxy_url")
-        default_proxy_login = current_config.get("default_proxy_login")
-        default_proxy_password = current_config.get("default_proxy_password")
+        unlocker_proxy_url = config.get("unlocker_proxy_url")
+        unlocker_proxy_login = config.get("unlocker_proxy_login")
+        unlocker_proxy_password = config.get("unlocker_proxy_password")
+        default_proxy_url = config.get("default_proxy_url")
+        default_proxy_login = config.get("default_proxy_login")
+        default_proxy_password = config.get("default_proxy_password")
     
  
 
@@ -119,80 +486,123 @@ async def parse_with_ai_selectors(
     # Verify proxy configuration parameters cannot be empty
     if not thor_mcp_myProxyConfig.proxy_url or not thor_mcp_myProxyConfig.login or not thor_mcp_myProxyConfig.password:
         raise ToolError(f"Proxy configuration parameters cannot be empty, note: unlocker and proxy accounts are not interchangeable;")
-    thor_mcp_html = ""
-    thor_mcp_isCatch=False # Default cache disabled, cache is only for debugging use, as feedback on AI is unstable
-    if thor_mcp_isCatch:
-        # First check if there is an HTML file for today
-        thor_mcp_today = datetime.now().strftime("%Y%m%d")
-        thor_mcp_save_dir = "html_snapshots"
-        os.makedirs(thor_mcp_save_dir, exist_ok=True)
-        # Clean special characters from URL and limit filename length
-        thor_mcp_clean_url = url.split("//")[-1]
-        for char in [
-            "?", ",", "/", "\\", ":", "*", '"', "<", ">", "|", 
-            "%", "=", "&", "+", ";", "@", "#", "$", "^", "`", 
-            "{", "}", "[", "]", "'",
-        ]:
-            thor_mcp_clean_url = thor_mcp_clean_url.replace(char, "_")
-        # Limit total filename length to 200 characters
-        thor_mcp_max_length = 200 - len(thor_mcp_today) - 1  # Subtract date and separator length
-        thor_mcp_htmlName = f"{thor_mcp_today}_{thor_mcp_clean_url[:thor_mcp_max_length]}"
-        thor_mcp_filename = f"{thor_mcp_save_dir}/{thor_mcp_htmlName}.html"
-
-        if os.path.exists(thor_mcp_filename):
-            try:
-                with open(thor_mcp_filename, "r", encoding="utf-8") as f:
-                    thor_mcp_html = f.read()
-                print(f"Read HTML from local cache: {thor_mcp_filename}")
-            except IOError as e:
-                raise ToolError(f"Failed to read cache file")
-
-        else:
-            thor_mcp_html = await scrape(url, thor_mcp_myProxyConfig)
-            if not thor_mcp_html:
-                raise ToolError(f"Web scraping failed, unable to get content")
-            
-            try:
-                with open(thor_mcp_filename, "w", encoding="utf-8") as f:
-                    f.write(thor_mcp_html)
-                print(f"HTML saved to {thor_mcp_filename}")
-            except IOError as e:
-                raise ToolError(f"Failed to save HTML file")
 
-    else:
-        # When cache is disabled, still save HTML but use different directory and second-level timestamp filename
-        thor_mcp_now = datetime.now().strftime("%Y%m%d%H%M%S")
-        thor_mcp_save_dir = "html_temp"
-        os.makedirs(thor_mcp_save_dir, exist_ok=True)
-        # Clean special characters from URL and limit filename length
-        thor_mcp_clean_url = url.split("//")[-1]
-        for char in [
-            "?", ",", "/", "\\", ":", "*", '"', "<", ">", "|", 
-            "%", "=", "&", "+", ";", "@", "#", "$", "^", "`", 
-            "{", "}", "[", "]", "'",
-        ]:
-            thor_mcp_clean_url = thor_mcp_clean_url.replace(char, "_")
-        # Limit total filename length to 200 characters
-        thor_mcp_max_length = 200 - len(thor_mcp_now) - 1  # Subtract timestamp and separator length
-        thor_mcp_htmlName = f"{thor_mcp_now}_{thor_mcp_clean_url[:thor_mcp_max_length]}"
-        thor_mcp_filename = f"{thor_mcp_save_dir}/{thor_mcp_htmlName}.html"
-
-        thor_mcp_html = await scrape(url, thor_mcp_myProxyConfig)
-        if not thor_mcp_html:
-            raise ToolError(f"Web scraping failed, unable to get content")
-        
-        try:
-            with open(thor_mcp_filename, "w", encoding="utf-8") as f:
-                f.write(thor_mcp_html)
-            print(f"HTML temporarily saved to {thor_mcp_filename}")
-        except IOError as e:
-            raise ToolError(f"Failed to save temporary HTML file")
-    
+    return thor_mcp_myProxyConfig
+
+
+async def fetch_page(
+    url: str, render: str, myProxyConfig: ProxyConfig, profile: FetchProfile | None = None,
+) -> tuple[str, str | None]:
+    """
+    Fetch a page through the response cache, revalidating its last fetched version
+
+    Unlocker pages fetched without a render wait (see RenderWaits) that come
+    back as unrendered app shells are fetched again with the wait.
+
+    Parameters:
+        url: The URL of the web page
+        render: Render mode selector, part of the cache keys
+        myProxyConfig: Proxy configuration object
+        profile: Unlocker render profile asked for, None for the defaults; part of the cache keys
+
+    Returns:
+        The page body, and its content hash when this call already computed it (else None)
+
+    Exceptions:
+        ToolError: Thrown when the page cannot be fetched or is empty
+    """
+    thor_mcp_fetched = False
+    thor_mcp_digest = None
+    thor_mcp_key = fetch_key(render, profile)
+
+    async def thor_mcp_fetch() -> str:
+        nonlocal thor_mcp_fetched, thor_mcp_digest
+        thor_mcp_profile = render_waits.profile(url, render, profile)
+        # Revalidate the last fetched version of the page, a 304 answer is served from the stored body
+        thor_mcp_conditional = revalidation_store.conditional(url, thor_mcp_key)
+        thor_mcp_body = await scrape(url, myProxyConfig, render, conditional=thor_mcp_conditional, profile=thor_mcp_profile)
+        # Scanned on the worker threads, a large page takes a while
+        if (
+            thor_mcp_body and render_waits.checks(thor_mcp_profile, profile)
+            and await content_executor.run_in_thread(needs_render, thor_mcp_body, fetch_settings.min_words)
+        ):
+            # An app shell: fetch it again with the render wait, unconditionally as the stored page is not the shell
+            thor_mcp_conditional = Conditional()
+            thor_mcp_body = await scrape(
+                url, myProxyConfig, render, conditional=thor_mcp_conditional, profile=render_waits.rerender(url, thor_mcp_profile),
+            )
+        thor_mcp_body = revalidation_store.record(url, thor_mcp_key, thor_mcp_conditional, thor_mcp_body)
+        thor_mcp_fetched = not thor_mcp_conditional.not_modified
+        thor_mcp_digest = thor_mcp_conditional.digest
+        return thor_mcp_body
+
+    # Serve repeated URLs from the response cache, concurrent identical requests share one fetch
+    try:
+        thor_mcp_html = await response_cache.get_or_fetch(url, thor_mcp_key, thor_mcp_fetch)
+    except BodyTooLargeError as e:
+        raise ToolError(str(e))
+    if not thor_mcp_html:
+        raise ToolError(f"Web scraping failed, unable to get content")
+
+    if thor_mcp_fetched:
+        # Queue a sampled, compressed snapshot of the fresh page, written in the background
+        snapshot_store.submit(url, thor_mcp_html)
+
+    return thor_mcp_html, thor_mcp_digest
+
+
+async def convert_page(
+    url: str, render: str, html: str, output_format: str, budget: OutputBudget | None = None, digest: str | None = None,
+    caller: str = "",
+) -> str:
+    """
+    Convert a fetched page, reusing earlier conversions of the same body
+
+    Parameters:
+        url: The URL the page was fetched from
+        render: Render mode selector the page was fetched with, with its fetch profile (see fetch_key)
+        html: Page body
+        output_format: Output format ("html", "links", "links-json", "Markdown", "Markdown-diff")
+        budget: Optional output size, main-content limits, cleaning profile and link scope
+        digest: content_hash(html) when already known
+        caller: Identity of the caller (see diff_caller), Markdown-diff baselines are kept per caller
+
+    Returns:
+        Converted page content, raises ToolError on failure
+    """
+    # The diff format converts the whole page to Markdown, the budget applies to the diff
+    thor_mcp_format = "Markdown" if output_format == DIFF_FORMAT else output_format
+    thor_mcp_budget = budget
+    if output_format == DIFF_FORMAT and budget is not None:
+        thor_mcp_budget = replace(budget, max_chars=0)
+        if thor_mcp_budget == OutputBudget():
+            thor_mcp_budget = None
+    # Links are resolved against the page URL, so the same body at another URL converts differently
+    thor_mcp_variant = (thor_mcp_budget.key if thor_mcp_budget else "") + (f"|{url}" if output_format in LINK_FORMATS else "")
+
     # Process content and return result
     try:
-        thor_mcp_result = get_content(thor_mcp_html, output_format)
+        if digest is None:
+            digest = content_hash(html)
+        # An unchanged page returns the output converted from it last time
+        thor_mcp_result = revalidation_store.output(url, render, digest, thor_mcp_format + thor_mcp_variant)
+        if thor_mcp_result is None:
+            # Reuse earlier conversions of the same body, otherwise convert on the worker pool
+            thor_mcp_result = await conversion_cache.get_or_convert(
+                html,
+                thor_mcp_format,
+                lambda: convert_sharing_links(html, thor_mcp_format, thor_mcp_budget, url, digest),
+                variant=thor_mcp_variant,
+                digest=digest,
+            )
+            if thor_mcp_format != "html" or thor_mcp_variant:
+                revalidation_store.keep_output(url, render, digest, thor_mcp_format + thor_mcp_variant, thor_mcp_result)
         if not thor_mcp_result:
             raise ToolError(f"Content processing failed: Unable to convert content to {output_format} format")
+        if output_format == DIFF_FORMAT:
+            thor_mcp_result = truncate(
+                revalidation_store.diff(url, render, thor_mcp_variant, thor_mcp_result, caller), budget.max_chars if budget else 0,
+            )
         return thor_mcp_result
     except Exception as e:
         raise ToolError(f"Error occurred during content processing")
@@ -202,27 +612,156 @@ async def parse_with_ai_selectors(
     #     # Catch other unexpected exceptions
     #     raise ToolError(f"Unexpected error occurred while parsing web page")
 
-@retry(
-        reraise=True,
-        # Maximum of 3 attempts
-        stop=stop_after_attempt(3),
-        # Exponential backoff algorithm, multiplier 1, minimum wait time 4 seconds, maximum wait time 10 seconds
-        wait=wait_exponential(multiplier=1, min=4, max= 5),
-    )
-async def scrape_with_retry(url: str, myProxyConfig: ProxyConfig) -> str:
+async def convert_sharing_links(html: str, output_format: str, budget: OutputBudget | None, url: str, digest: str) -> str:
     """
-    Web scraping method with retry mechanism, records detailed information for each retry
+    Convert a page on the worker pool; a Markdown conversion also caches the page's links outputs
+
+    The links are collected from the tree parsed for Markdown, so a later links
+    or links-json request for the page (without a budget) is a conversion cache
+    hit instead of a second parse. Skipped when both are cached already.
+    """
+    thor_mcp_variant = f"|{url}"
+    if (
+        output_format in LINK_FORMATS or output_format == "html" or not url
+        or all(conversion_cache.contains(html, thor_mcp_links, thor_mcp_variant, digest) for thor_mcp_links in LINK_FORMATS)
+    ):
+        return await content_executor.get_content(html, output_format, budget, url)
+    thor_mcp_result, thor_mcp_links = await content_executor.get_content_and_links(html, output_format, budget, url)
+    for thor_mcp_links_format, thor_mcp_output in thor_mcp_links.items():
+        conversion_cache.put(html, thor_mcp_links_format, thor_mcp_output, thor_mcp_variant, digest)
+    return thor_mcp_result
+
+
+async def read_body(response: "aiohttp.ClientResponse", consume: Callable[[str], Awaitable[Any]] | None = None) -> str:
+    """
+    Read and decode a response body chunk by chunk, aborting once it exceeds MAX_BODY_BYTES
+
+    Parameters:
+        response: Successful aiohttp response
+        consume: Optional coroutine function receiving each decoded chunk; when given the body is not kept,
+            and reading stops early once it returns True
+
+    Returns:
+        The decoded body, or an empty string when chunks were passed to consume
+
+    Exceptions:
+        BodyTooLargeError: Thrown when the declared or received size exceeds MAX_BODY_BYTES
+    """
+    if MAX_BODY_BYTES and response.content_length and response.content_length > MAX_BODY_BYTES:
+        # Reject oversized bodies before downloading them
+        raise BodyTooLargeError(f"Response body of {response.content_length} bytes exceeds {MAX_BODY_BYTES} bytes")
+    # Charset from the BOM, Content-Type or <meta> tag, no statistical detection
+    decoder = BodyDecoder(response.charset, response.headers.get("Content-Encoding", ""))
+    thor_mcp_chunks = []
+    thor_mcp_received = 0
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        chunk = decoder.decompress(chunk)
+        thor_mcp_received += len(chunk)
+        if MAX_BODY_BYTES and thor_mcp_received > MAX_BODY_BYTES:
+            raise BodyTooLargeError(f"Response body exceeds {MAX_BODY_BYTES} bytes")
+        if consume is None:
+            thor_mcp_chunks.append(chunk)
+            continue
+        # Empty while the decoder holds the start of the body back to settle its charset
+        thor_mcp_text = decoder.decode(chunk)
+        if thor_mcp_text and await consume(thor_mcp_text):
+            # The consumer needs no more input, drop the rest of the body
+            return ""
+    metrics.response_bytes.observe(thor_mcp_received)
+    if consume is None:
+        return decoder.decode(b"".join(thor_mcp_chunks), final=True)
+    await consume(decoder.decode(b"", final=True))
+    return ""
+
+
+async def scrape_with_retry(
+    url: str, myProxyConfig: ProxyConfig, render: str = "", stream_format: str | None = None, max_chars: int = 0,
+    conditional: Conditional | None = None, profile: FetchProfile | None = None,
+) -> str:
+    """
+    Web scraping method with retry mechanism
+
+    Attempts run under retry_policy: terminal statuses (most 4xx) fail at once, while
+    429, 5xx, timeouts and connection errors are retried with jittered backoff that
+    honors Retry-After, within a total deadline and optionally hedged.
 
     Parameters:
         url: URL address to scrape
         myProxyConfig: Proxy configuration object
+        render: Render mode selector, used to pick the pooled session
+        stream_format: When set ("links", "links-json" or "Markdown"), convert the body while it downloads and return the converted output
+        max_chars: Output budget for stream_format, the download stops once it is filled
+        conditional: Validators of the last fetch to revalidate, its not_modified is set on a 304 answer
+        profile: Settled unlocker render profile (see RenderWaits.profile), None for regular proxy fetches
 
     Returns:
-        Returns web page content text on success, throws ScrapeRetryException on failure
+        Returns web page content text on success (empty on a 304 answer), throws ScrapeRetryException on failure
+
+    Exceptions:
+        ScrapeRetryException: Thrown with the last attempt's status and detail when all attempts fail
+        BodyTooLargeError: Thrown when the body exceeds MAX_BODY_BYTES, never retried
+    """
+    return await retry_policy.run(lambda: scrape_once(url, myProxyConfig, render, stream_format, max_chars, conditional, profile))
+
+
+async def scrape_once(
+    url: str, myProxyConfig: ProxyConfig, render: str = "", stream_format: str | None = None, max_chars: int = 0,
+    conditional: Conditional | None = None, profile: FetchProfile | None = None,
+) -> str:
+    """
+    Single fetch attempt gated by the target domain's rate limit and circuit breaker
+
+    The outcome and latency of the attempt are reported back to domain_limiter, which
+    adapts the domain's rate and opens its circuit when failures pile up.
 
     Exceptions:
-        ScrapeRetryException: Thrown when request fails
+        CircuitOpenError: Thrown without fetching while the domain's circuit is open
+        RateLimitedError: Thrown when the domain's next request slot is too far away
+        ScrapeRetryException: Thrown when the attempt fails, classified as retryable or terminal
     """
+    thor_mcp_domain = await domain_limiter.acquire(url)
+    # Waiting for the domain's slot is not fetch latency, for the hedge delay either
+    attempt_started()
+    thor_mcp_started = time.monotonic()
+    try:
+        thor_mcp_result = await fetch_once(url, myProxyConfig, render, stream_format, max_chars, conditional, profile)
+    except ScrapeRetryException as e:
+        thor_mcp_elapsed = time.monotonic() - thor_mcp_started
+        # Proxy failures say nothing about the domain; of the others only throttling, 5xx and timeouts count against it
+        if not e.proxy:
+            domain_limiter.record(thor_mcp_domain, e.status, thor_mcp_elapsed, failed=e.target_failure)
+        metrics.fetch_seconds.observe(thor_mcp_elapsed, outcome="retryable" if e.retryable else "terminal")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Fetch attempt failed", extra={"url": url, "status": e.status, "error": str(e), "seconds": round(thor_mcp_elapsed, 3)})
+        raise
+    except BodyTooLargeError:
+        thor_mcp_elapsed = time.monotonic() - thor_mcp_started
+        domain_limiter.record(thor_mcp_domain, 200, thor_mcp_elapsed, failed=False)
+        metrics.fetch_seconds.observe(thor_mcp_elapsed, outcome="too_large")
+        raise
+    thor_mcp_elapsed = time.monotonic() - thor_mcp_started
+    domain_limiter.record(thor_mcp_domain, 200, thor_mcp_elapsed, failed=False)
+    metrics.fetch_seconds.observe(thor_mcp_elapsed, outcome="ok")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Fetched", extra={
+            "url": url, "render": render, "wait": profile.wait if profile else None, "seconds": round(thor_mcp_elapsed, 3),
+        })
+    return thor_mcp_result
+
+
+async def fetch_once(
+    url: str, myProxyConfig: ProxyConfig, render: str = "", stream_format: str | None = None, max_chars: int = 0,
+    conditional: Conditional | None = None, profile: FetchProfile | None = None,
+) -> str:
+    """
+    Single fetch attempt through the proxy, see scrape_with_retry for the parameters
+
+    Exceptions:
+        ScrapeRetryException: Thrown when the attempt fails, classified as retryable or terminal
+    """
+
+    # Loaded on the first fetch (or by warm_up) rather than at import, it is a large share of the import time
+    import aiohttp
 
     # Get proxy URL from proxy configuration object
     proxy = myProxyConfig.proxy_url
@@ -231,228 +770,175 @@ async def scrape_with_retry(url: str, myProxyConfig: ProxyConfig) -> str:
         login=myProxyConfig.login,
         password=myProxyConfig.password,
     )
-    headers = {"X-Render-Type": "html", "X-Wait-Second": "10"}
-    timeout = ClientTimeout(total=120)
-
-    # Create asynchronous HTTP client session
-    async with aiohttp.ClientSession(
-        headers=headers,  
-        timeout=timeout, 
-        connector=aiohttp.TCPConnector(),  
-        max_field_size=32768,  
-    ) as session:
-        try:
-            # Use session to initiate GET request
-            async with session.get(
-                url,  # Target URL
-                proxy=proxy,  # Use proxy
-                proxy_auth=proxy_auth,  # Use proxy authentication
-                ssl=False,  # Disable SSL verification
-            ) as response:
-                # Check if response status code is 200 (success)
-                if response.status == 200:
+
+    thor_mcp_conditional_headers = conditional.request_headers() if conditional is not None else None
+    # Reuse the pooled keep-alive session for this proxy configuration
+    session = await session_pool.get(myProxyConfig.proxy_url, myProxyConfig.login, render)
+    try:
+        # Use session to initiate GET request
+        async with session.get(
+            url,  # Target URL
+            proxy=proxy,  # Use proxy
+            proxy_auth=proxy_auth,  # Use proxy authentication
+            ssl=False,  # Disable SSL verification
+            # Content codings, the unlocker's page type and render wait, and validators of the stored page
+            headers=request_headers(profile, thor_mcp_conditional_headers),
+        ) as response:
+            if response.status == 304 and thor_mcp_conditional_headers:
+                # The stored page is still current, the caller serves it
+                conditional.update(response.headers)
+                conditional.not_modified = True
+                return ""
+            # Check if response status code is 200 (success)
+            if response.status == 200:
+                if conditional is not None:
+                    conditional.update(response.headers)
+                if stream_format is None:
                     # Return response text content
-                    return await response.text()
-                else:
-                    # Construct error message containing status code and URL
-                    error_msg = f"Status code: {response.status}, URL: {url}"
-                    # Throw retry exception
-                    raise ScrapeRetryException(error_msg)
-
-        except aiohttp.ClientError as e:
-            error_msg = f"HTTP client error"
-            raise ScrapeRetryException(error_msg)
-
-        except asyncio.TimeoutError:
-            error_msg = (
-                f"Request timeout: 60 seconds"
-            )
-            raise ScrapeRetryException(error_msg)
+                    return await read_body(response)
+                # Feed chunks to a fresh converter on the worker threads, one per attempt
+                thor_mcp_converter = StreamingConverter(stream_format, max_bytes=0, max_chars=max_chars, url=url)
+                await read_body(response, lambda chunk: content_executor.run_in_thread(thor_mcp_converter.feed, chunk))
+                return await content_executor.run_in_thread(thor_mcp_converter.close)
+            else:
+                # Construct error message containing status code and URL
+                error_msg = f"Status code: {response.status}, URL: {url}"
+                # Classify the status: 429/5xx are retried, other statuses fail at once
+                raise ScrapeRetryException.from_status(response.status, error_msg, response.headers.get("Retry-After"))
+
+    except (BodyTooLargeError, ScrapeRetryException):
+        raise
+
+    except aiohttp.InvalidURL as e:
+        # The URL will not get any better on another attempt
+        error_msg = f"Invalid URL: {e}"
+        raise ScrapeRetryException(error_msg, retryable=False)
+
+    except aiohttp.ClientResponseError as e:
+        # Statuses raised by aiohttp itself, e.g. a proxy answering CONNECT with 407: classified like response statuses
+        error_msg = f"HTTP client error: {type(e).__name__}, Status code: {e.status}, URL: {url}"
+        thor_mcp_proxy = isinstance(e, aiohttp.ClientHttpProxyError)
+        if not e.status:
+            raise ScrapeRetryException(error_msg, proxy=thor_mcp_proxy)
+        raise ScrapeRetryException.from_status(e.status, error_msg, proxy=thor_mcp_proxy)
+
+    except aiohttp.ClientProxyConnectionError as e:
+        error_msg = f"Proxy connection error: {type(e).__name__}"
+        raise ScrapeRetryException(error_msg, proxy=True)
+
+    except asyncio.TimeoutError:
+        # Before ClientError: aiohttp's ServerTimeoutError is both
+        error_msg = (
+            f"Request timeout"
+        )
+        raise ScrapeRetryException(error_msg, timeout=True)
 
-        except Exception as e:
-            error_msg = f"Unknown error:"
-            raise ScrapeRetryException(error_msg)
+    except aiohttp.ClientError as e:
+        error_msg = f"HTTP client error: {type(e).__name__}"
+        raise ScrapeRetryException(error_msg)
+
+    except ContentDecodingError as e:
+        # A corrupt or truncated body may decode on another attempt, as with aiohttp's ClientPayloadError; an unsupported coding comes back
+        raise ScrapeRetryException(str(e), retryable=e.retryable)
 
-async def scrape(url: str, myProxyConfig: ProxyConfig) -> str:
+    except Exception as e:
+        error_msg = f"Unknown error: {type(e).__name__}"
+        raise ScrapeRetryException(error_msg, retryable=False)
+
+async def scrape(
+    url: str, myProxyConfig: ProxyConfig, render: str = "", stream_format: str | None = None, max_chars: int = 0,
+    conditional: Conditional | None = None, profile: FetchProfile | None = None,
+) -> str:
     """
     Web scraping method
 
     Parameters:
         url: URL address to scrape
         myProxyConfig: Proxy configuration object
+        render: Render mode selector, used to pick the pooled session
+        stream_format: Optional output format converted while the body downloads
+        max_chars: Output budget for stream_format
+        conditional: Validators of the last fetch to revalidate
+        profile: Settled unlocker render profile
 
     Returns:
-        Returns web page content text on success, returns empty string on failure
+        Returns web page content text on success, empty when conditional was answered with 304
+
+    Exceptions:
+        ToolError: Thrown with the final failure detail when scraping fails
     """
     try:
-        result = await scrape_with_retry(url, myProxyConfig)
+        result = await scrape_with_retry(url, myProxyConfig, render, stream_format, max_chars, conditional, profile)
         return result
-    except ScrapeRetryException:
-        return ""
-
-def clean_html(html: str) -> str:
-    """Clean HTML string"""
-    cleaner = Cleaner(
-        scripts=True,
-        kill_tags=["nav", "svg", "footer", "noscript", "script", "form"],
-        style=True,
-        remove_tags=[],
-        safe_attrs=list(defs.safe_attrs) + ["idx"],
-        inline_style=True,
-        links=True,
-        meta=False,
-        embedded=True,
-        frames=False,
-        forms=False,
-        annoying_tags=False,
-        page_structure=False,
-        javascript=True,
-        comments=True,
-    )
-    return cleaner.clean_html(html)
+    except FetchError as e:
+        logger.info("Scrape failed", extra={"url": url, "status": e.status, "error": str(e)})
+        raise ToolError(f"Web scraping failed: {e}")
 
-def strip_html(thor_mcp_html: str) -> str:
-    """Simplify HTML string, remove unnecessary elements, attributes and redundant content"""
-    
-    import re
-    
-    # Call clean_html function for initial cleaning (assuming the function is already defined externally)
-    thor_mcp_cleaned_html = clean_html(thor_mcp_html)
-    
-    # Parse the cleaned HTML string into XML tree structure
-    thor_mcp_html_tree = fromstring(thor_mcp_cleaned_html)
 
-    # Traverse all elements in the HTML tree (including nested descendant elements)
-    for thor_mcp_element in thor_mcp_html_tree.iter():
-        # Remove style attribute (inline styles) from all elements
-        if "style" in thor_mcp_element.attrib:
-            del thor_mcp_element.attrib["style"]  # Use del statement to delete element attribute
+def warm_up() -> None:
+    """
+    Load the fetch and conversion code paths before the first tool call needs them
 
-        
-        if (
-            (
-                not thor_mcp_element.attrib  # No attributes
-                or (len(thor_mcp_element.attrib) == 1 and "idx" in thor_mcp_element.attrib)  # Or only contains idx attribute
-            )
-            and not thor_mcp_element.getchildren()  # No child elements
-            and (not thor_mcp_element.text or not thor_mcp_element.text.strip())  # No text or blank text
-            and (not thor_mcp_element.tail or not thor_mcp_element.tail.strip())  # No tail text or blank tail
-        ):
-            # Get parent element (may be None if it's the root element)
-            thor_mcp_parent = thor_mcp_element.getparent()
-            
-            # Only remove if parent element exists
-            if thor_mcp_parent is not None:
-                # Remove current element from parent's tree structure
-                thor_mcp_parent.remove(thor_mcp_element)
-
-        # Convert processed XML tree back to HTML string
-        return tostring(thor_mcp_html_tree, encoding='unicode')
-
-    # Remove elements containing "footer" or "hidden" in class or id
-    thor_mcp_xpath_query = (
-        ".//*[contains(@class, 'footer') or contains(@id, 'footer') or "
-        "contains(@class, 'hidden') or contains(@id, 'hidden')]"
-    )
-    # Use XPath query to find all elements that need to be removed
-    thor_mcp_elements_to_remove = thor_mcp_html_tree.xpath(thor_mcp_xpath_query)
-    # Traverse all elements that need to be removed
-    for thor_mcp_element in thor_mcp_elements_to_remove:
-        # Get the parent element of the current element
-        thor_mcp_parent = thor_mcp_element.getparent()
-        # Only perform removal if parent element exists
-        if thor_mcp_parent is not None:
-            # Remove current element from parent element
-            thor_mcp_parent.remove(thor_mcp_element)
-
-    # Reserialize HTML tree to string
-    thor_mcp_stripped_html = tostring(thor_mcp_html_tree, encoding="unicode")
-    # Replace multiple spaces with single space
-    thor_mcp_stripped_html = re.sub(r"\s{2,}", " ", thor_mcp_stripped_html)
-    # Replace consecutive newlines with empty string
-    thor_mcp_stripped_html = re.sub(r"\n{2,}", "", thor_mcp_stripped_html)
-    return thor_mcp_stripped_html
-
-def extract_links_with_text(thor_mcp_html: str, thor_mcp_base_url: str | None = None) -> list[str]:
-    """
-    Extract links with display text from HTML
-    
-    Parameters:
-        thor_mcp_html (str): Input HTML string
-        thor_mcp_base_url (str | None): Base URL for converting relative URLs to absolute URLs
-                            If None, relative URLs remain unchanged
-    
-    Returns:
-        list[str]: List of links in format [display text] URL
+    Runs on a worker thread once the server is listening, while clients are still
+    initializing their sessions: imports aiohttp and converts a small page to
+    Markdown and links with the configured engine, which loads the engine's
+    dependencies and builds the shared Cleaner.
     """
-    # Use lxml's fromstring function to parse HTML string into XML tree structure
-    thor_mcp_html_tree = fromstring(thor_mcp_html)
-    
-    # Initialize empty list to store formatted links
-    thor_mcp_links = []
-
-    # Traverse all <a> tags containing href attribute (XPath selector)
-    for thor_mcp_link in thor_mcp_html_tree.xpath("//a[@href]"):
-        # Get value of href attribute (link target address)
-        thor_mcp_href = thor_mcp_link.get("href")
-        # Get all text content within the tag (including child tag text), and remove leading/trailing whitespace
-        thor_mcp_text = thor_mcp_link.text_content().strip()
-
-        # Only process when both href and text exist (filter empty links or empty text)
-        if thor_mcp_href and thor_mcp_text:
-            # Skip empty text or pure whitespace text (although strip() is used, prevent special whitespace characters)
-            if not thor_mcp_text:
-                continue
-
-            # Skip in-page anchor links (starting with #)
-            if thor_mcp_href.startswith("#"):
-                continue
-
-            # Skip JavaScript pseudo-links
-            if thor_mcp_href.startswith("javascript:"):
-                continue
-
-            # Convert URL when base_url is provided and it's a relative path (starting with /)
-            if thor_mcp_base_url and thor_mcp_href.startswith("/"):
-                # Remove trailing slash from base_url to avoid double slash issue
-                thor_mcp_base = thor_mcp_base_url.rstrip("/")
-                # Concatenate into absolute URL
-                thor_mcp_href = f"{thor_mcp_base}{thor_mcp_href}"
-
-            # Add formatted link to result list: [text] URL
-            thor_mcp_links.append(f"[{thor_mcp_text}] {thor_mcp_href}")
-
-    # Return list of all qualified links
-    return thor_mcp_links
-
-def get_content(thor_mcp_content: str, thor_mcp_output_format: str) -> str:
-    """
-    Extract content from response and convert to appropriate format
-    
-    Parameters:
-        thor_mcp_content: Response content string
-        thor_mcp_output_format: Output format ("html", "links", or other formats converted to markdown) 
-    
-    Returns:
-        Formatted content string
+    started = time.perf_counter()
+    import aiohttp  # noqa: F401
+
+    for thor_mcp_format in ("Markdown", "links"):
+        engine.get_content(WARM_UP_PAGE, thor_mcp_format)
+    logger.debug("Warmed up", extra={"seconds": round(time.perf_counter() - started, 3)})
+
+
+def with_shared_resources(app):
     """
-    
-    if thor_mcp_output_format == "html": 
-        return thor_mcp_content
-    if thor_mcp_output_format == "links":
-        thor_mcp_links = extract_links_with_text(thor_mcp_content)
-        return "\n".join(thor_mcp_links)
-    
-    thor_mcp_stripped_html = strip_html(thor_mcp_content)  # Simplify HTML content
-    return markdownify(thor_mcp_stripped_html) 
-    # For other formats, return original content string
+    Chain process-wide resource cleanup onto the ASGI app lifespan
 
+    Parameters:
+        app: Starlette application returned by mcp.streamable_http_app()
 
+    Returns:
+        The same application, whose lifespan now releases shared resources on shutdown
+    """
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(scope_app):
+        async with app_lifespan(scope_app) as state:
+            if metrics.settings.enabled:
+                # Sample event-loop lag for /metrics
+                metrics.loop_lag_monitor.start()
+            # Off the critical path: the server starts listening without waiting for it
+            thor_mcp_warm_up = asyncio.create_task(asyncio.to_thread(warm_up)) if WARM_UP else None
+            try:
+                yield state
+            finally:
+                if thor_mcp_warm_up is not None:
+                    await asyncio.gather(thor_mcp_warm_up, return_exceptions=True)
+                await metrics.loop_lag_monitor.stop()
+                # Flush queued page snapshots
+                await snapshot_store.close()
+                # Close pooled proxy sessions and their keep-alive connections
+                await session_pool.close()
+                # Stop content processing worker threads and processes
+                content_executor.shutdown()
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def build_app():
+    """
+    Build the ASGI application served by uvicorn
 
-# Main program entry point (when running this script directly)
-if __name__ == "__main__":  # If current script is the main program entry
+    Returns:
+        The streamable HTTP app wrapped with shared resource cleanup, CORS and session config middleware
+    """
     # Get the Starlette app and add CORS middleware
-    app = mcp.streamable_http_app()  # Get streamable HTTP application instance
+    app = mcp.http_app(transport="streamable-http", stateless_http=STATELESS_HTTP)  # Get streamable HTTP application instance
+    app = with_shared_resources(app)  # Close shared sessions when the server shuts down
     
     # Add CORS middleware with proper header exposure for MCP session management
     app.add_middleware(  # Add CORS middleware to application
@@ -465,14 +951,48 @@ if __name__ == "__main__":  # If current script is the main program entry
         max_age=86400,  # Preflight request cache time (seconds)
     )
 
-    app = SmitheryConfigMiddleware(app, set_api_key)
+    # Bind each session's proxy configuration to its mcp-session-id
+    return SmitheryConfigMiddleware(app, session_configs)
+
+
+def build_worker_app():
+    """
+    App factory run by each uvicorn worker process in multi-worker mode
+
+    Returns:
+        The application from build_app, after installing logging in the worker
+    """
+    configure_logging()
+    return build_app()
+
+
+# Main program entry point (when running this script directly)
+if __name__ == "__main__":  # If current script is the main program entry
+    # Structured, redacted logs at SCRAPER_LOG_LEVEL, shared with uvicorn
+    log_settings = configure_logging()
     # Use PORT environment variable
     port = int(os.environ.get("PORT", 8081))  # Get port number from environment variable, default to 8081
 
+    if WORKERS > 1:
+        # Workers share the response cache, limiter and session configs through a local SQLite file by default,
+        # in a directory only this user can enter, since the file holds proxy credentials
+        if not os.environ.get("SCRAPER_SHARED_STATE"):
+            state_directory = tempfile.mkdtemp(prefix=f"scraper-state-{port}-")
+            atexit.register(shutil.rmtree, state_directory, ignore_errors=True)
+            os.environ["SCRAPER_SHARED_STATE"] = os.path.join(state_directory, "state.sqlite")
+        # Worker processes import this module and build their own app
+        app = "server:build_worker_app"
+    else:
+        app = build_app()
+
     # Run the MCP server with HTTP transport using uvicorn
     uvicorn.run(  # Run server using uvicorn
-        app,  # Application instance to run
+        app,  # Application instance, or factory import string for multiple workers
+        factory=WORKERS > 1,  # The import string names an app factory
+        workers=WORKERS if WORKERS > 1 else None,  # Worker processes
         host="0.0.0.0",  # Listen on all network interfaces, suitable for containerized deployment
         port=port,  # Use configured port number
-        log_level="debug"  # Set log level to debug
+        log_level=log_settings.level.lower(),  # Log level from SCRAPER_LOG_LEVEL
+        log_config=None,  # Keep the handler installed by configure_logging
+        access_log=log_settings.access_log,  # Per-request access logs only when SCRAPER_ACCESS_LOG is set
     )
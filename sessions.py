@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import asyncio
+import base64
+import binascii
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import unquote
+
+from logs import get_logger
+from shared import SharedState, SharedStateError, shared_state
+
+logger = get_logger("sessions")
+
+
+@dataclass
+class SessionSettings:
+    """Session configuration store settings, read from environment variables by default"""
+    ttl: float = float(os.environ.get("SCRAPER_SESSION_TTL", 3600))  # Idle time in seconds before a session's config is forgotten
+    max_sessions: int = int(os.environ.get("SCRAPER_SESSION_MAX", 10000))  # Sessions kept at once, least recently used go first
+    max_decoded: int = 1024  # Distinct raw config strings kept decoded
+
+
+@dataclass
+class SessionStats:
+    """Session store counters"""
+    hits: int = 0  # Lookups answered from a bound session
+    remote_hits: int = 0  # Sessions bound by another worker, found in the shared state
+    decodes: int = 0  # Raw config strings actually decoded
+    decode_errors: int = 0
+    evictions: int = 0
+
+
+def decode_config(raw: str) -> dict:
+    """
+    Decode the base64 JSON config passed in the ?config= query parameter
+
+    Raises:
+        ValueError: When raw is not base64 encoded JSON object
+    """
+    try:
+        config = json.loads(base64.b64decode(unquote(raw)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid config: {e}") from e
+    if not isinstance(config, dict):
+        raise ValueError("Invalid config: expected a JSON object")
+    return config
+
+
+class SessionConfigStore:
+    """
+    Proxy configuration per MCP session, keyed by mcp-session-id
+
+    Each session's config is decoded once and bound to its session id, so
+    concurrent sessions with different credentials never see each other's
+    config. Sessions expire after ttl seconds without use and the least
+    recently used ones are evicted beyond max_sessions. Decoded configs are
+    also memoized by their raw string, so a repeated ?config= value is
+    never decoded twice.
+
+    With a shared state backend, bindings are also published there, so a
+    worker that receives a request for a session bound elsewhere finds its
+    config with lookup().
+    """
+
+    def __init__(self, settings: SessionSettings | None = None, shared: SharedState | None = None):
+        self.settings = settings or SessionSettings()
+        self.stats = SessionStats()
+        self.shared = shared
+        self._sessions: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._decoded: OrderedDict[str, dict] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str | None) -> dict | None:
+        """Config bound to a session, or None"""
+        if not session_id:
+            return None
+        found = self._sessions.get(session_id)
+        if found is None:
+            return None
+        config, expires = found
+        now = time.monotonic()
+        if expires <= now:
+            del self._sessions[session_id]
+            return None
+        self._sessions[session_id] = (config, now + self.settings.ttl)
+        self._sessions.move_to_end(session_id)
+        self.stats.hits += 1
+        return config
+
+    async def lookup(self, session_id: str | None) -> dict | None:
+        """Config bound to a session by this or, through the shared state, another worker"""
+        config = self.get(session_id)
+        if config is not None or self.shared is None or not session_id:
+            return config
+        try:
+            data = await asyncio.to_thread(self.shared.get, "sessions", session_id)
+        except SharedStateError as e:
+            logger.warning("Failed to read shared session config", extra={"error": str(e)})
+            return None
+        if data is None:
+            return None
+        config = json.loads(data)
+        self._remember(session_id, config)
+        self.stats.remote_hits += 1
+        return config
+
+    async def bind(self, session_id: str, config: dict) -> None:
+        """Bind a decoded config to a session, publishing it to the shared state when configured"""
+        self._remember(session_id, config)
+        if self.shared is not None:
+            try:
+                await asyncio.to_thread(self.shared.set, "sessions", session_id, json.dumps(config).encode(), self.settings.ttl)
+            except SharedStateError as e:
+                logger.warning("Failed to publish session config", extra={"error": str(e)})
+
+    def _remember(self, session_id: str, config: dict) -> None:
+        self._sessions[session_id] = (config, time.monotonic() + self.settings.ttl)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.settings.max_sessions:
+            self._sessions.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def drop(self, session_id: str) -> None:
+        """Forget a terminated session"""
+        self._sessions.pop(session_id, None)
+        if self.shared is not None:
+            try:
+                await asyncio.to_thread(self.shared.delete, "sessions", session_id)
+            except SharedStateError as e:
+                logger.warning("Failed to drop shared session config", extra={"error": str(e)})
+
+    def decode(self, raw: str) -> dict:
+        """
+        Decode a raw ?config= value, reusing earlier decodes of the same string
+
+        Raises:
+            ValueError: When raw is not base64 encoded JSON object
+        """
+        config = self._decoded.get(raw)
+        if config is not None:
+            self._decoded.move_to_end(raw)
+            return config
+        try:
+            config = decode_config(raw)
+        except ValueError:
+            self.stats.decode_errors += 1
+            raise
+        self.stats.decodes += 1
+        self._decoded[raw] = config
+        if len(self._decoded) > self.settings.max_decoded:
+            self._decoded.popitem(last=False)
+        return config
+
+
+# Shared session configuration store for the whole process
+session_configs = SessionConfigStore(shared=shared_state)
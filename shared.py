@@ -0,0 +1,264 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from urllib.parse import unquote, urlsplit
+
+from logs import get_logger
+
+logger = get_logger("shared")
+
+
+@dataclass
+class SharedSettings:
+    """Shared state backend settings, read from environment variables by default"""
+    url: str = os.environ.get("SCRAPER_SHARED_STATE", "")  # sqlite:///path, a file path, or redis://host:port/db; empty keeps state per process
+    timeout: float = float(os.environ.get("SCRAPER_SHARED_TIMEOUT", 2.0))  # Seconds a backend call may block before failing
+    prune_every: int = 512  # SQLite writes between removals of expired entries
+
+
+class SharedStateError(Exception):
+    """A shared state backend call failed; callers fall back to their local state"""
+
+
+class SharedState(ABC):
+    """
+    Key-value store with per-entry expiry, shared by every worker process
+
+    Values are bytes, grouped by namespace ("response", "limits",
+    "sessions"). Calls block, so async callers run them with
+    asyncio.to_thread. Failures raise SharedStateError and never lose
+    local state: the store only lets workers see each other's work.
+    """
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> bytes | None:
+        """Value stored under key, None when missing or expired"""
+
+    def get_many(self, namespace: str, keys: list[str]) -> dict[str, bytes]:
+        return {key: value for key in keys if (value := self.get(namespace, key)) is not None}
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: bytes, ttl: float) -> None:
+        """Store value under key for ttl seconds"""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove key, missing keys are ignored"""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteState(SharedState):
+    """
+    Shared state in a local SQLite file, for workers on the same host
+
+    Uses WAL mode so readers never wait for writers, one connection per
+    thread, and removes expired rows every prune_every writes. The file is
+    created readable by its owner only, since session configs hold proxy
+    credentials.
+    """
+
+    def __init__(self, path: str, timeout: float = 2.0, prune_every: int = 512):
+        self.path = path
+        self.timeout = timeout
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        try:
+            # Never follow a link planted at the path, nor take over a file someone else created
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_NOFOLLOW", 0), 0o600))
+        except FileExistsError:
+            if os.path.islink(path):
+                raise SharedStateError(f"shared state path {path} is a symbolic link")
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state (namespace TEXT, key TEXT, value BLOB, expires REAL, "
+                "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace: str, key: str) -> bytes | None:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM shared_state WHERE namespace = ? AND key = ? AND expires > ?",
+                (namespace, key, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            raise SharedStateError(str(e)) from e
+        return row[0] if row else None
+
+    def get_many(self, namespace: str, keys: list[str]) -> dict[str, bytes]:
+        found = {}
+        try:
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._connection().execute(
+                    f"SELECT key, value FROM shared_state WHERE namespace = ? AND expires > ? "
+                    f"AND key IN ({','.join('?' * len(batch))})",
+                    (namespace, time.time(), *batch),
+                ).fetchall()
+                found.update(rows)
+        except sqlite3.Error as e:
+            raise SharedStateError(str(e)) from e
+        return found
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?, ?)", (namespace, key, value, now + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                connection.execute("DELETE FROM shared_state WHERE expires <= ?", (now,))
+        except sqlite3.Error as e:
+            raise SharedStateError(str(e)) from e
+
+    def delete(self, namespace: str, key: str) -> None:
+        try:
+            self._connection().execute("DELETE FROM shared_state WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            raise SharedStateError(str(e)) from e
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class RedisState(SharedState):
+    """
+    Shared state in a Redis-compatible server, for workers on several hosts
+
+    Speaks the subset of the Redis protocol it needs (AUTH, SELECT, GET,
+    MGET, SET with PX, DEL) over one connection per thread, so any server
+    implementing those commands works without a client library.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.database = int(parts.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> tuple[socket.socket, object]:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        reader = sock.makefile("rb")
+        self._local.connection = (sock, reader)
+        if self.password:
+            self._command("AUTH", self.password)
+        if self.database:
+            self._command("SELECT", str(self.database))
+        return sock, reader
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server")
+        kind, payload = line[:1], line[1:-2]
+        if kind in (b"+", b":"):
+            return payload
+        if kind == b"-":
+            raise SharedStateError(payload.decode("utf-8", "replace"))
+        if kind == b"$":
+            length = int(payload)
+            return None if length < 0 else reader.read(length + 2)[:-2]
+        if kind == b"*":
+            count = int(payload)
+            return None if count < 0 else [self._read(reader) for _ in range(count)]
+        raise SharedStateError(f"Unexpected reply {line[:20]!r}")
+
+    def _command(self, *args: str | bytes):
+        connection = getattr(self._local, "connection", None)
+        for attempt in range(2):
+            try:
+                sock, reader = connection or self._connect()
+                parts = [f"*{len(args)}\r\n".encode()]
+                for arg in args:
+                    data = arg if isinstance(arg, bytes) else str(arg).encode()
+                    parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+                sock.sendall(b"".join(parts))
+                return self._read(reader)
+            except (OSError, ConnectionError) as e:
+                # Reconnect once: the server may have closed an idle connection
+                self.close()
+                connection = None
+                if attempt:
+                    raise SharedStateError(str(e)) from e
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"scraper:{namespace}:{key}"
+
+    def get(self, namespace: str, key: str) -> bytes | None:
+        return self._command("GET", self._key(namespace, key))
+
+    def get_many(self, namespace: str, keys: list[str]) -> dict[str, bytes]:
+        if not keys:
+            return {}
+        values = self._command("MGET", *(self._key(namespace, key) for key in keys))
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float) -> None:
+        self._command("SET", self._key(namespace, key), value, "PX", str(max(1, int(ttl * 1000))))
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._command("DEL", self._key(namespace, key))
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            sock, reader = connection
+            reader.close()
+            sock.close()
+            self._local.connection = None
+
+
+def open_shared_state(settings: SharedSettings | None = None) -> SharedState | None:
+    """
+    Open the backend named by settings.url
+
+    Returns:
+        The backend, or None when no shared state is configured
+
+    Exceptions:
+        ValueError: The URL scheme is not supported
+    """
+    settings = settings or SharedSettings()
+    url = settings.url
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://")):
+        if url.startswith("rediss://"):
+            raise ValueError("TLS Redis URLs (rediss://) are not supported")
+        return RedisState(url, settings.timeout)
+    if url.startswith("sqlite://"):
+        url = url[len("sqlite://"):]
+    elif "://" in url:
+        raise ValueError(f"Unsupported shared state URL {url!r}, expected sqlite:///path or redis://host:port/db")
+    return SQLiteState(url, settings.timeout, settings.prune_every)
+
+
+# Shared state backend for the whole process, None when state stays per process
+shared_state = open_shared_state()
@@ -0,0 +1,203 @@
+import os
+import gzip
+import json
+import time
+import random
+import asyncio
+from dataclasses import dataclass
+
+from cache import content_hash
+from logs import get_logger
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, gzip is used without it
+    zstandard = None
+
+logger = get_logger("snapshot")
+
+
+@dataclass
+class SnapshotSettings:
+    """Page snapshot settings, read from environment variables by default"""
+    sample_rate: float = float(os.environ.get("SCRAPER_SNAPSHOT_RATE", 0))  # Fraction of fetched pages saved, 0 disables snapshots
+    directory: str = os.environ.get("SCRAPER_SNAPSHOT_DIR", "html_temp")  # Snapshot directory
+    compression: str = os.environ.get("SCRAPER_SNAPSHOT_COMPRESSION", "gzip")  # "zstd", "gzip" or "none"
+    max_bytes: int = int(os.environ.get("SCRAPER_SNAPSHOT_MAX_BYTES", 512 * 1024 * 1024))  # Total size kept on disk
+    max_age: float = float(os.environ.get("SCRAPER_SNAPSHOT_MAX_AGE", 7 * 24 * 3600))  # Snapshot lifetime in seconds
+    queue_size: int = int(os.environ.get("SCRAPER_SNAPSHOT_QUEUE", 256))  # Pages waiting to be written, extra pages are dropped
+    batch_size: int = 32  # Pages written per background batch
+    prune_interval: float = 60.0  # Seconds between retention passes
+
+
+@dataclass
+class SnapshotStats:
+    """Snapshot counters"""
+    written: int = 0
+    deduplicated: int = 0  # Pages whose content was already on disk
+    dropped: int = 0  # Pages skipped because the write queue was full
+    errors: int = 0
+    evicted: int = 0
+
+
+class SnapshotStore:
+    """
+    Sampled, compressed snapshots of fetched pages for debugging
+
+    submit() never touches the disk: pages are queued and a background task
+    writes them in batches on a worker thread. Files are named by content
+    hash, so identical pages are stored once, and an index-<date>.jsonl file
+    records which URL produced which snapshot. A periodic retention pass
+    removes snapshots older than max_age and then the oldest ones until the
+    directory fits max_bytes. Snapshot failures never fail a scrape.
+    """
+
+    def __init__(self, settings: SnapshotSettings | None = None):
+        self.settings = settings or SnapshotSettings()
+        self.stats = SnapshotStats()
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._last_prune = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.sample_rate > 0
+
+    @property
+    def extension(self) -> str:
+        compression = self.settings.compression
+        if compression == "zstd" and zstandard is not None:
+            return ".html.zst"
+        if compression in ("gzip", "zstd"):
+            return ".html.gz"
+        return ".html"
+
+    def _compress(self, data: bytes) -> bytes:
+        extension = self.extension
+        if extension == ".html.zst":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        if extension == ".html.gz":
+            return gzip.compress(data, compresslevel=6)
+        return data
+
+    def submit(self, url: str, html: str) -> bool:
+        """
+        Queue a fetched page for a snapshot, subject to sampling
+
+        Returns:
+            True when the page was queued
+        """
+        if not self.enabled or not html:
+            return False
+        if self.settings.sample_rate < 1 and random.random() >= self.settings.sample_rate:
+            return False
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=max(1, self.settings.queue_size))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        try:
+            self._queue.put_nowait((time.time(), url, html))
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+            return False
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.settings.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: list[tuple[float, str, str]]) -> None:
+        directory = self.settings.directory
+        index_lines = []
+        for fetched_at, url, html in batch:
+            data = html.encode("utf-8")
+            key = content_hash(html)
+            name = os.path.join(key[:2], key + self.extension)
+            path = os.path.join(directory, name)
+            try:
+                if os.path.exists(path):
+                    # Same content already stored, refresh its age instead of writing it again
+                    os.utime(path)
+                    self.stats.deduplicated += 1
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    # Write to a temporary file and rename so readers never see partial content
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(self._compress(data))
+                    os.replace(tmp_path, path)
+                    self.stats.written += 1
+                index_lines.append(json.dumps({"time": fetched_at, "url": url, "file": name, "bytes": len(data)}))
+            except OSError as e:
+                self.stats.errors += 1
+                logger.warning("Failed to write snapshot", extra={"error": str(e)})
+        if index_lines:
+            index_path = os.path.join(directory, time.strftime("index-%Y%m%d.jsonl"))
+            try:
+                with open(index_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(index_lines) + "\n")
+            except OSError as e:
+                self.stats.errors += 1
+                logger.warning("Failed to write snapshot index", extra={"error": str(e)})
+        if time.monotonic() - self._last_prune >= self.settings.prune_interval:
+            self._last_prune = time.monotonic()
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Apply age and size retention to the snapshot directory
+
+        Returns:
+            Number of files removed
+        """
+        now = time.time()
+        files = []
+        for root, _, names in os.walk(self.settings.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((info.st_mtime, info.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            # Oldest first: drop expired files, then keep dropping until the directory fits
+            if now - mtime < self.settings.max_age and total <= self.settings.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.stats.evicted += removed
+        return removed
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Flush queued snapshots, waiting at most timeout seconds, and stop the writer"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropped pending snapshots on shutdown", extra={"pending": self._queue.qsize()})
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+
+# Shared snapshot store for the whole process
+snapshot_store = SnapshotStore()
@@ -0,0 +1,335 @@
+import os
+from dataclasses import dataclass, field
+
+import lxml.html
+from lxml import etree
+from lxml.html import defs
+
+from budget import truncate
+from convert import get_cleaner, is_footer_or_hidden, strip_tree
+from engine import BLOCK_TAGS, Collector, MarkdownEmitter
+from links import LINK_FORMATS, LinkCollector
+
+# Elements dropped as soon as they close, matching the Cleaner's kill list
+KILL_TAGS = frozenset(("nav", "svg", "footer", "noscript", "script", "form", "style", "link", "applet"))
+# Wrapper elements whose children are converted and released one at a time
+STREAM_CONTAINERS = frozenset(("html", "body", "main", "div", "section", "article", "header", "aside"))
+# Containers the Cleaner unwraps because lxml does not know them, their children join the parent
+UNWRAP_TAGS = frozenset(tag for tag in STREAM_CONTAINERS if tag not in defs.tags)
+# Anchors between releases of everything before the current one in links mode
+PRUNE_EVERY = 256
+# Lists are converted once their next sibling is known, it decides their trailing newline
+DEFERRED_TAGS = frozenset(("ul", "ol"))
+
+# Largest response body accepted, in bytes; 0 disables the limit
+MAX_BODY_BYTES = int(os.environ.get("SCRAPER_MAX_BODY_BYTES", 50 * 1024 * 1024))
+# Convert links and Markdown responses while they download instead of after
+STREAMING_ENABLED = os.environ.get("SCRAPER_STREAMING", "0").lower() in ("1", "true", "yes")
+# Size of the response chunks read from the network
+CHUNK_SIZE = int(os.environ.get("SCRAPER_STREAM_CHUNK", 64 * 1024))
+
+
+def _killed(el) -> bool:
+    """Whether an element is dropped with its content, by the Cleaner or as a footer or hidden element"""
+    return el.tag in KILL_TAGS or is_footer_or_hidden(el)
+
+
+class BodyTooLargeError(Exception):
+    """Raised when a response body exceeds the configured maximum size"""
+    pass
+
+
+@dataclass
+class _Frame:
+    """Conversion state of a streamed container element"""
+    el: object
+    parent_tags: frozenset
+    child_tags: frozenset
+    inside: bool
+    collector: Collector = field(default_factory=Collector)
+    texts: list = field(default_factory=list)  # Text seen since the last kept child
+    seen_node: bool = False  # Whether any child node has been emitted yet
+    previous_name: str | None = None  # Tag of the last kept child
+    deferred: object = None  # Closed list element waiting for its next sibling
+    closed_child: object = None  # Last closed child, its tail is still being parsed
+    unwrapped: list = field(default_factory=list)  # Open unwrapped containers whose children join this frame
+
+
+class _StreamEmitter(MarkdownEmitter):
+    """MarkdownEmitter whose next-sibling lookup can be answered by the stream"""
+
+    def __init__(self, limit: int = 0):
+        super().__init__(limit)
+        self.resolved = None
+        self.resolved_next = None
+
+    def next_content_name(self, el):
+        if el is self.resolved:
+            return self.resolved_next
+        return super().next_content_name(el)
+
+
+class StreamingConverter:
+    """
+    Incremental HTML to Markdown/links converter fed with response chunks
+
+    Chunks go into an lxml HTMLPullParser. Killed subtrees (nav, footer,
+    script, svg, ...) are released as soon as they close. Children of
+    wrapper elements (body, div, section, ...) are cleaned, converted and
+    released one at a time, so memory is bounded by the largest single
+    block rather than the page. In links mode the parser only reports
+    anchors and <base>; each anchor goes to a LinkCollector, and it and
+    everything before it are released at once.
+
+    Output matches engine.convert_document: blocks are cleaned with the same
+    Cleaner before conversion, and wrappers the Cleaner would unwrap are
+    treated as transparent.
+
+    With max_chars set, feed() reports when the output budget is filled so
+    the caller can stop reading; the rest of the page is never parsed.
+    """
+
+    def __init__(
+        self, output_format: str, max_bytes: int = MAX_BODY_BYTES, max_chars: int = 0, url: str = "",
+        link_scope: str = "all",
+    ):
+        self.output_format = output_format
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.received = 0
+        self.links = LinkCollector(output_format, url, link_scope, max_chars)
+        if output_format in LINK_FORMATS:
+            # Plain etree elements: links mode needs no HtmlElement methods, and their lookup costs a call per node
+            self._parser = etree.HTMLPullParser(
+                events=("end",), tag=("a", "base"), remove_comments=True, remove_pis=True,
+            )
+        else:
+            self._parser = etree.HTMLPullParser(events=("start", "end"), remove_comments=True, remove_pis=True)
+            self._parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        self._anchors = 0
+        self._cleaner = get_cleaner()
+        self._emitter = _StreamEmitter(max_chars)
+        self._frames: list[_Frame] = []
+        self._markdown = ""
+        self._pending = ""
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the output budget is filled"""
+        if not self.max_chars:
+            return False
+        if self.output_format in LINK_FORMATS:
+            return self.links.exhausted
+        return self._emitter.used >= self.max_chars
+
+    def feed(self, chunk: str | bytes) -> bool:
+        """
+        Feed the next chunk of the response body
+
+        Returns:
+            True once the output budget is filled and no more input is needed
+        """
+        if self.exhausted:
+            return True
+        self.received += len(chunk)
+        if self.max_bytes and self.received > self.max_bytes:
+            raise BodyTooLargeError(f"Response body exceeds {self.max_bytes} bytes")
+        # libxml2's push parser loses raw text elements whose end tag is split
+        # between two chunks, so only ever feed up to the last complete tag
+        data = self._pending + chunk if self._pending else chunk
+        cut = data.rfind(">" if isinstance(data, str) else b">") + 1
+        self._pending = data[cut:]
+        if cut:
+            self._parser.feed(data[:cut])
+            self._drain()
+        return self.exhausted
+
+    def close(self) -> str:
+        """Finish parsing and return the converted output"""
+        if self._pending and not self.exhausted:
+            self._parser.feed(self._pending)
+            self._pending = ""
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            # Empty or unparseable document
+            pass
+        self._drain()
+        if self.output_format in LINK_FORMATS:
+            return self.links.render()
+        return truncate(self._markdown.strip("\n"), self.max_chars)
+
+    def _drain(self) -> None:
+        handle = self._links_event if self.output_format in LINK_FORMATS else self._markdown_event
+        for event, el in self._parser.read_events():
+            handle(event, el)
+
+    # Links mode
+
+    def _links_event(self, event: str, el) -> None:
+        if el.tag == "base":
+            self.links.set_base(el.get("href"))
+            return
+        self.links.add(el.get("href"), "".join(el.itertext()))
+        # Release the anchor and its earlier siblings, and every PRUNE_EVERY anchors also
+        # the earlier siblings of its ancestors, so only a bounded part of the page is kept
+        el.clear(keep_tail=True)
+        self._anchors += 1
+        node = el
+        parent = node.getparent()
+        while parent is not None:
+            while node.getprevious() is not None:
+                del parent[0]
+            if self._anchors % PRUNE_EVERY:
+                break
+            node, parent = parent, parent.getparent()
+
+    # Markdown mode
+
+    def _markdown_event(self, event: str, el) -> None:
+        parent = el.getparent()
+        frame = self._frames[-1] if self._frames else None
+        is_child = frame is not None and (parent is frame.el or any(parent is u for u in frame.unwrapped))
+        if event == "start":
+            if frame is None and parent is None:
+                self._push(el, frozenset(("[document]",)))
+            elif is_child and el.tag in UNWRAP_TAGS and not _killed(el):
+                self._unwrap_start(frame, el)
+            elif is_child:
+                self._child_start(frame, el)
+                if el.tag in STREAM_CONTAINERS and not _killed(el):
+                    self._push(el, frame.child_tags)
+            return
+
+        if _killed(el):
+            # Release killed subtrees as soon as they close
+            el.clear(keep_tail=True)
+        if frame is not None and el is frame.el:
+            self._frames.pop()
+            text = self._pop(frame)
+            if self._frames:
+                outer = self._frames[-1]
+                outer.collector.add(text)
+                outer.previous_name = el.tag
+                outer.seen_node = True
+                outer.closed_child = el
+            else:
+                self._markdown = text
+        elif frame is not None and frame.unwrapped and el is frame.unwrapped[-1]:
+            self._unwrap_end(frame, el)
+        elif is_child:
+            self._child_end(frame, el)
+
+    def _push(self, el, parent_tags: frozenset) -> None:
+        name = el.tag
+        self._frames.append(_Frame(
+            el=el,
+            parent_tags=parent_tags,
+            child_tags=self._emitter.child_tags(name, parent_tags),
+            inside=name in BLOCK_TAGS,
+        ))
+
+    def _collect_text(self, frame: _Frame, first_child) -> None:
+        """Move text that became final into the frame's pending text"""
+        if frame.closed_child is not None:
+            if frame.closed_child.tail:
+                frame.texts.append(frame.closed_child.tail)
+            frame.closed_child = None
+        elif first_child is not None and first_child.getprevious() is None and first_child.getparent().text:
+            frame.texts.append(first_child.getparent().text)
+
+    def _flush_text(self, frame: _Frame, next_name: str | None, is_last: bool) -> None:
+        text = "".join(frame.texts)
+        frame.texts.clear()
+        if frame.deferred is not None:
+            # The next content sibling of a deferred list is now known
+            next_content = "" if text.strip() else next_name
+            self._emit_child(frame, frame.deferred, next_content)
+            frame.deferred = None
+        if not text:
+            return
+        frame.collector.add(self._emitter.render_text(
+            text, frame.child_tags, frame.inside, not frame.seen_node, is_last, frame.previous_name, next_name,
+        ))
+        frame.seen_node = True
+        frame.previous_name = None
+
+    def _child_start(self, frame: _Frame, el) -> None:
+        self._collect_text(frame, el)
+        if _killed(el):
+            # Text around killed elements joins into one node, as after cleaning
+            return
+        self._flush_text(frame, el.tag, False)
+        self._release_previous(el)
+
+    @staticmethod
+    def _release_previous(el) -> None:
+        """Release siblings of el that were already converted"""
+        parent = el.getparent()
+        while el.getprevious() is not None:
+            del parent[0]
+
+    def _unwrap_start(self, frame: _Frame, el) -> None:
+        # Text keeps running into the unwrapped element, so nothing is flushed here
+        self._collect_text(frame, el)
+        self._release_previous(el)
+        frame.unwrapped.append(el)
+
+    def _unwrap_end(self, frame: _Frame, el) -> None:
+        self._collect_text(frame, None)
+        if len(el) == 0 and el.text:
+            frame.texts.append(el.text)
+        frame.unwrapped.pop()
+        frame.closed_child = el
+
+    def _child_end(self, frame: _Frame, el) -> None:
+        frame.closed_child = el
+        if _killed(el):
+            return
+        self._cleaner(el)
+        strip_tree(el)
+        if el.tag in DEFERRED_TAGS:
+            frame.deferred = el
+        else:
+            self._emit_child(frame, el, None)
+        frame.previous_name = el.tag
+        frame.seen_node = True
+
+    def _emit_child(self, frame: _Frame, el, next_content: str | None) -> None:
+        self._emitter.resolved = el
+        self._emitter.resolved_next = next_content
+        frame.collector.add(self._emitter._process_tag(el, frame.child_tags))
+        self._emitter.resolved = None
+        el.clear(keep_tail=True)
+
+    def _pop(self, frame: _Frame) -> str:
+        """Finish a streamed container and return its Markdown"""
+        self._collect_text(frame, None)
+        if not frame.seen_node and frame.el.text and len(frame.el) == 0:
+            frame.texts.append(frame.el.text)
+        self._flush_text(frame, None, True)
+        text = frame.collector.result()
+        if frame.el.tag in ("script", "style"):
+            return ""
+        return self._emitter.finish(frame.el, text, frame.parent_tags)
+
+
+def convert_prefix(html: str, output_format: str, max_chars: int, url: str = "", link_scope: str = "all") -> str:
+    """
+    Convert only as much of an HTML string as needed to fill max_chars
+
+    Parameters:
+        html: Input HTML string
+        output_format: "links", "links-json", or any other value for Markdown
+        max_chars: Output budget in characters, 0 converts the whole string
+        url: Page URL that links are resolved against
+        link_scope: Links kept: "all", "internal" or "external"
+
+    Returns:
+        Formatted content string, truncated to max_chars
+    """
+    converter = StreamingConverter(output_format, max_bytes=0, max_chars=max_chars, url=url, link_scope=link_scope)
+    for start in range(0, len(html), CHUNK_SIZE):
+        if converter.feed(html[start:start + CHUNK_SIZE]):
+            break
+    return converter.close()